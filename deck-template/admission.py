@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Memory-aware admission control for deck rendering
+
+Each render job gets a memory estimate from its template size and slide
+count. Jobs run while the sum of live estimates fits the worker's budget;
+excess jobs wait in a bounded FIFO queue, and are rejected with a
+Retry-After hint when the queue is full (429) or the wait times out (503).
+"""
+
+import asyncio
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """Raised when a job cannot be admitted; carries the HTTP status to return."""
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ('estimate', 'future', 'loop')
+
+    def __init__(self, estimate: int, future: asyncio.Future, loop: asyncio.AbstractEventLoop):
+        self.estimate = estimate
+        self.future = future
+        self.loop = loop
+
+
+class MemoryAdmissionController:
+    """
+    Tracks estimated live memory of in-flight renders against a budget.
+
+    A job bigger than the whole budget is still admitted when nothing else is
+    running, so oversized templates degrade to running alone instead of
+    failing forever.
+    """
+
+    def __init__(self, budget_bytes: int, max_queue: int = 16, queue_timeout: float = 30.0,
+                 base_bytes: int = 8 * 1024 * 1024, template_factor: float = 5.0,
+                 per_slide_bytes: int = 64 * 1024):
+        """
+        Args:
+            budget_bytes: Memory the worker may spend on concurrent renders
+            max_queue: Jobs allowed to wait before new ones get 429
+            queue_timeout: Seconds a job may wait before it gets 503
+            base_bytes: Fixed per-job overhead
+            template_factor: Multiple of the template file size held while rendering
+                (the template is parsed more than once and XML expands when parsed)
+            per_slide_bytes: Additional memory per generated slide
+        """
+        self.budget_bytes = budget_bytes
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.base_bytes = base_bytes
+        self.template_factor = template_factor
+        self.per_slide_bytes = per_slide_bytes
+
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._running = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._admitted_total = 0
+        self._rejected_total = 0
+        # Smoothed job duration, used for Retry-After hints
+        self._avg_duration = 1.0
+
+    @classmethod
+    def from_env(cls) -> 'MemoryAdmissionController':
+        """Build a controller from RENDER_* environment variables."""
+        return cls(
+            budget_bytes=int(float(os.getenv('RENDER_MEMORY_BUDGET_MB', '1024')) * 1024 * 1024),
+            max_queue=int(os.getenv('RENDER_MAX_QUEUE', '16')),
+            queue_timeout=float(os.getenv('RENDER_QUEUE_TIMEOUT_SECONDS', '30')),
+            base_bytes=int(float(os.getenv('RENDER_MEMORY_BASE_MB', '8')) * 1024 * 1024),
+            template_factor=float(os.getenv('RENDER_MEMORY_TEMPLATE_FACTOR', '5')),
+            per_slide_bytes=int(float(os.getenv('RENDER_MEMORY_PER_SLIDE_KB', '64')) * 1024),
+        )
+
+    def estimate(self, template_bytes: int, slide_count: int, workers: int = 0) -> int:
+        """
+        Estimate peak memory of rendering `slide_count` slides from a template.
+
+        Args:
+            template_bytes: Template file size
+            slide_count: Slides in the deck
+            workers: Render worker processes that each parse the template
+                as well (see parallel_render.workers_for)
+        """
+        return int(self.base_bytes + template_bytes * self.template_factor * (1 + workers)
+                   + slide_count * self.per_slide_bytes)
+
+    def _fits(self, estimate: int) -> bool:
+        return self._running == 0 or self._in_use + estimate <= self.budget_bytes
+
+    def _retry_after(self) -> int:
+        backlog = len(self._waiters) + 1
+        return max(1, math.ceil(self._avg_duration * backlog / max(1, self._running)))
+
+    def _admit(self, estimate: int):
+        self._in_use += estimate
+        self._running += 1
+        self._admitted_total += 1
+
+    async def acquire(self, estimate: int):
+        """
+        Wait until `estimate` bytes fit in the budget.
+
+        Raises:
+            AdmissionRejected: Queue full (429) or queue wait timed out (503)
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # FIFO: only bypass the queue when nobody is waiting ahead
+            if not self._waiters and self._fits(estimate):
+                self._admit(estimate)
+                return
+            if len(self._waiters) >= self.max_queue:
+                self._rejected_total += 1
+                raise AdmissionRejected(429, "Render queue is full", self._retry_after())
+            waiter = _Waiter(estimate, loop.create_future(), loop)
+            self._waiters.append(waiter)
+
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                if waiter not in self._waiters:
+                    # Admitted just as the timeout fired; keep the slot
+                    return
+                self._waiters.remove(waiter)
+                self._rejected_total += 1
+                retry_after = self._retry_after()
+            raise AdmissionRejected(503, "Timed out waiting for render capacity", retry_after)
+        except asyncio.CancelledError:
+            # Client went away while queued; give back the slot if it was granted
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                    return_slot = False
+                else:
+                    return_slot = True
+            if return_slot:
+                self.release(estimate)
+            raise
+
+    def release(self, estimate: int, duration: Optional[float] = None):
+        """
+        Return a job's reservation and admit queued jobs that now fit.
+
+        Safe to call from any thread.
+        """
+        with self._lock:
+            self._in_use -= estimate
+            self._running -= 1
+            if duration is not None:
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+
+            while self._waiters and self._fits(self._waiters[0].estimate):
+                waiter = self._waiters.popleft()
+                self._admit(waiter.estimate)
+                waiter.loop.call_soon_threadsafe(_grant, waiter.future)
+
+    @asynccontextmanager
+    async def reserve(self, template_bytes: int, slide_count: int, workers: int = 0):
+        """Hold a reservation for one render job for the duration of the block."""
+        estimate = self.estimate(template_bytes, slide_count, workers)
+        await self.acquire(estimate)
+        started = time.monotonic()
+        try:
+            yield estimate
+        finally:
+            self.release(estimate, time.monotonic() - started)
+
+    def status(self) -> Dict[str, Any]:
+        """Current usage and queue depth."""
+        with self._lock:
+            return {
+                'budget_bytes': self.budget_bytes,
+                'in_use_bytes': self._in_use,
+                'available_bytes': max(0, self.budget_bytes - self._in_use),
+                'running': self._running,
+                'queue_depth': len(self._waiters),
+                'max_queue': self.max_queue,
+                'admitted_total': self._admitted_total,
+                'rejected_total': self._rejected_total,
+                'avg_job_seconds': round(self._avg_duration, 3),
+            }
+
+
+def _grant(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark the pipeline export's extraction backends
+
+Seeds `deals` with synthetic rows and measures how fast each backend in
+deal_reader turns the export query into DataFrames: the server-side cursor
+(`cursor`) and `COPY ... TO STDOUT` (`copy`, PostgreSQL only). Only
+extraction is timed, not writing the workbook.
+
+    python benchmarks/bench_export_extract.py --database-url postgresql://localhost/virgil_bench
+    python benchmarks/bench_export_extract.py --rows 50000 200000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from local_stack import StackConfig, configure_export_api, make_engine
+from synthetic_deals import create_schema, seed_deals
+
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results', 'export_extract.json')
+DEFAULT_ROW_COUNTS = [10_000, 100_000]
+BACKENDS = ['cursor', 'copy']
+
+
+def measure(engine, query: str, backend: str, repeat: int) -> Dict[str, Any]:
+    """Median extraction time of `query` with one backend."""
+    from deal_reader import iter_export_chunks
+
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = sum(len(chunk) for chunk in iter_export_chunks(engine, query, backend=backend))
+        timings.append(time.perf_counter() - started)
+    seconds = statistics.median(timings)
+    return {
+        'backend': backend,
+        'rows': rows,
+        'seconds': round(seconds, 4),
+        'rows_per_second': round(rows / seconds) if seconds else None
+    }
+
+
+def run_benchmarks(engine, row_counts: List[int], backends: List[str], repeat: int) -> Dict[str, Any]:
+    from export_pivot_api import DEALS_QUERY
+
+    create_schema(engine)
+    if engine.dialect.name != 'postgresql' and 'copy' in backends:
+        print("⚠️ COPY needs PostgreSQL; measuring the cursor backend only")
+        backends = [backend for backend in backends if backend != 'copy']
+
+    cases = []
+    for row_count in row_counts:
+        print(f"🔧 Seeding {row_count} deals")
+        seed_deals(engine, row_count)
+        for backend in backends:
+            case = measure(engine, DEALS_QUERY, backend, repeat)
+            cases.append(case)
+            print(f"  {backend:>6}: {case['seconds']:.3f}s, {case['rows_per_second']} rows/s")
+
+    return {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'database': engine.dialect.name,
+        'repeat': repeat,
+        'cases': cases
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare export extraction backends")
+    parser.add_argument('--database-url', help="SQLAlchemy URL (default: SQLite in a temp dir)")
+    parser.add_argument('--rows', nargs='+', type=int, default=DEFAULT_ROW_COUNTS,
+                        help="Table sizes to measure")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        config = StackConfig(work_dir=work_dir, database_url=args.database_url)
+        configure_export_api(config)
+        engine = make_engine(config)
+        try:
+            results = run_benchmarks(engine, args.rows, args.backends, args.repeat)
+        finally:
+            engine.dispose()
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
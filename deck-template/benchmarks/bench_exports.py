@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for the pipeline exports
+
+Seeds `deals` with synthetic rows and runs every export path of
+export_pivot_api (buffered workbook, streamed workbook, Arrow, Parquet and
+gzip'd CSV) with every extraction backend. Rows/second, time to first byte
+and peak RSS are reported for each case. Every case runs in a fresh process,
+so peak RSS covers that export alone. The snapshot cache is disabled, so
+every repetition builds the export. Results are written to a JSON baseline
+that later runs can be compared against. A comparing run writes its results
+only to an explicit --output, never over the baseline:
+
+    python benchmarks/bench_exports.py --rows 10000 100000
+    python benchmarks/bench_exports.py --database-url postgresql://localhost/virgil_bench
+    python benchmarks/bench_exports.py --compare benchmarks/results/exports.json
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, SERVICE_DIR)
+
+from local_stack import StackConfig, make_engine
+from synthetic_deals import create_schema, seed_deals
+
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results', 'exports.json')
+DEFAULT_ROW_COUNTS = [10_000, 100_000, 1_000_000, 5_000_000]
+EXPORT_PATHS = ['xlsx_buffered', 'xlsx_stream', 'arrow', 'parquet', 'csv']
+BACKENDS = ['cursor', 'copy']
+
+# Metrics compared against the baseline; lower is better for all of them
+COMPARED_METRICS = ['seconds', 'ttfb_s', 'peak_rss_mb']
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of the current process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+async def _drain(body) -> Tuple[Optional[float], int]:
+    """Consume a StreamingResponse body; returns (time of the first byte, bytes)."""
+    first_byte = None
+    size = 0
+    async for piece in body:
+        if first_byte is None and piece:
+            first_byte = time.perf_counter()
+        size += len(piece)
+    return first_byte, size
+
+
+def _run_export(api, export_path: str) -> Tuple[float, float, int]:
+    """Run one export; returns (seconds, seconds to first byte, bytes)."""
+    from deal_filters import DealFilters
+    from job_scheduler import JobOptions
+
+    started = time.perf_counter()
+    if export_path == 'xlsx_buffered':
+        # Nothing is sent before the workbook is complete
+        size = len(api.write_pipeline_workbook(DealFilters()).getbuffer())
+        first_byte = time.perf_counter()
+    else:
+        async def export():
+            if export_path == 'xlsx_stream':
+                response = api.stream_pipeline_template(DealFilters())
+            else:
+                response = await api.export_pipeline_data(export_path, DealFilters(), JobOptions('bench'))
+            return await _drain(response.body_iterator)
+        first_byte, size = asyncio.run(export())
+    finished = time.perf_counter()
+    return finished - started, (first_byte or finished) - started, size
+
+
+def run_case(database_url: str, export_path: str, backend: str, repeat: int) -> Dict[str, Any]:
+    """
+    Measure one (export path, backend) case. Runs inside a worker process.
+
+    Args:
+        database_url: SQLAlchemy URL of the seeded database
+        export_path: One of EXPORT_PATHS
+        backend: Extraction backend of deal_reader
+        repeat: Number of timed repetitions; the median is reported
+    """
+    os.environ['EXPORT_EXTRACT_BACKEND'] = backend
+    os.environ['EXPORT_CACHE_MAX_MB'] = '0'
+    # export_pivot_api opens pivot_template.xlsx relative to the working directory
+    os.chdir(SERVICE_DIR)
+    from local_stack import configure_export_api
+    configure_export_api(StackConfig(work_dir=tempfile.gettempdir(), database_url=database_url))
+    import export_pivot_api
+
+    base_rss = _peak_rss_mb()
+    timings, first_bytes = [], []
+    size = 0
+    for _ in range(repeat):
+        seconds, ttfb, size = _run_export(export_pivot_api, export_path)
+        timings.append(seconds)
+        first_bytes.append(ttfb)
+
+    seconds = statistics.median(timings)
+    return {
+        'seconds': round(seconds, 4),
+        'ttfb_s': round(statistics.median(first_bytes), 4),
+        'output_bytes': size,
+        'base_rss_mb': round(base_rss, 1),
+        'peak_rss_mb': round(_peak_rss_mb(), 1),
+    }
+
+
+def _run_isolated(*args) -> Dict[str, Any]:
+    """Run a case in a fresh process so ru_maxrss only covers that case."""
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        return pool.apply(run_case, args)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(config: StackConfig, row_counts: List[int], export_paths: Iterable[str],
+                   backends: List[str], repeat: int) -> Dict[str, Any]:
+    """Seed each table size and measure every export path with every backend."""
+    from columnar_export import format_available
+
+    engine = make_engine(config)
+    try:
+        create_schema(engine)
+        dialect = engine.dialect.name
+        if dialect != 'postgresql' and 'copy' in backends:
+            print("⚠️ COPY needs PostgreSQL; measuring the cursor backend only")
+            backends = [backend for backend in backends if backend != 'copy']
+        export_paths = [path for path in export_paths if path.startswith('xlsx') or format_available(path)]
+
+        results = []
+        for row_count in row_counts:
+            print(f"🔧 Seeding {row_count} deals", flush=True)
+            seed_deals(engine, row_count)
+            for export_path in export_paths:
+                for backend in backends:
+                    case = _run_isolated(config.sqlalchemy_url, export_path, backend, repeat)
+                    case.update({
+                        'rows': row_count,
+                        'export_path': export_path,
+                        'backend': backend,
+                        'rows_per_second': round(row_count / case['seconds']) if case['seconds'] else None,
+                    })
+                    results.append(case)
+                    print(f"  {export_path:>13} {backend:>6}: {case['rows_per_second']} rows/s, "
+                          f"TTFB {case['ttfb_s']:.3f}s, peak RSS {case['peak_rss_mb']} MB", flush=True)
+    finally:
+        engine.dispose()
+
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'database': dialect,
+            'repeat': repeat
+        },
+        'results': results
+    }
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any],
+                    tolerance: float) -> List[str]:
+    """
+    Compare a run against a baseline.
+
+    Returns:
+        List of human-readable regressions beyond `tolerance` (e.g. 0.15 = 15%)
+    """
+    baseline_cases = {(r['rows'], r['export_path'], r['backend']): r for r in baseline.get('results', [])}
+    regressions = []
+    for case in current['results']:
+        reference = baseline_cases.get((case['rows'], case['export_path'], case['backend']))
+        if not reference:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = reference.get(metric), case.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            marker = '⚠️' if change > tolerance else '  '
+            print(f"{marker} {case['rows']:>8} {case['export_path']:>13} {case['backend']:>6} "
+                  f"{metric:>11}: {old:.4f} -> {new:.4f} ({change:+.1%})")
+            if change > tolerance:
+                regressions.append(f"{case['rows']}/{case['export_path']}/{case['backend']}/{metric} {change:+.1%}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline exports on synthetic deals")
+    parser.add_argument('--database-url', help="SQLAlchemy URL (default: SQLite in a temp dir)")
+    parser.add_argument('--rows', nargs='+', type=int, default=DEFAULT_ROW_COUNTS,
+                        help="Table sizes to measure")
+    parser.add_argument('--paths', nargs='+', choices=EXPORT_PATHS, default=EXPORT_PATHS,
+                        help="Export paths to measure")
+    parser.add_argument('--backends', nargs='+', choices=BACKENDS, default=BACKENDS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output',
+                        help="Where to write the JSON results (default: the results directory, "
+                             "or nowhere with --compare)")
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help="Baseline JSON to compare against; exits non-zero on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="Allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+    if args.output is None and not args.compare:
+        args.output = DEFAULT_OUTPUT
+    if args.output and args.compare and os.path.realpath(args.output) == os.path.realpath(args.compare):
+        parser.error("--output must not overwrite the --compare baseline")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        config = StackConfig(work_dir=work_dir, database_url=args.database_url)
+        results = run_benchmarks(config, args.rows, args.paths, args.backends, args.repeat)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(results, json.load(f), args.tolerance)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite for TemplateHandler
+
+Generates synthetic templates and measures load_template,
+_analyze_slide_layouts, create_presentation_from_slides and
+save_presentation across deck sizes. Every case runs in a fresh process so
+peak RSS is attributable to that case alone. Results are written to a JSON
+baseline that later runs can be compared against. A comparing run writes its
+results only to an explicit --output, never over the baseline:
+
+    python benchmarks/bench_template_handler.py
+    python benchmarks/bench_template_handler.py --compare benchmarks/results/template_handler.json
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from synthetic_templates import build_slides_data, build_synthetic_template
+
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results', 'template_handler.json')
+DEFAULT_DECK_SIZES = [1, 10, 50, 100, 250, 500]
+
+# name -> (layout_count, shapes_per_layout, media_kb)
+TEMPLATE_PROFILES = {
+    'plain': (11, 0, 0),
+    'many_layouts': (60, 0, 0),
+    'busy_layouts': (20, 25, 0),
+    'media_heavy': (20, 0, 2048),
+}
+
+# Metrics compared against the baseline; lower is better for all of them
+COMPARED_METRICS = ['load_s', 'analyze_s', 'create_s', 'cached_create_s', 'save_s', 'peak_rss_mb']
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of the current process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def _timed(func, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def run_case(template_path: str, slide_count: int, repeat: int) -> Dict[str, Any]:
+    """
+    Measure one (template, deck size) case. Runs inside a worker process.
+
+    Args:
+        template_path: Synthetic template to use
+        slide_count: Number of slides in the generated deck
+        repeat: Number of timed repetitions; the median is reported
+    """
+    from render_cache import SlideRenderCache
+    from structured_logging import configure_logging
+    from template_handler import TemplateHandler
+
+    # Log like the service does so formatting cost is measured, but not on the terminal
+    configure_logging()
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, logging.StreamHandler):
+            handler.setStream(open(os.devnull, 'w'))
+
+    slides_data = build_slides_data(slide_count)
+    timings = {'load_s': [], 'analyze_s': [], 'create_s': [], 'cached_create_s': [], 'save_s': []}
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        output_path = os.path.join(work_dir, 'output.pptx')
+        for _ in range(repeat):
+            # Cold render: no slide cache, so repeats do not benefit from earlier ones
+            handler = TemplateHandler(template_path, slide_cache=None)
+            timings['load_s'].append(_timed(handler.load_template))
+            timings['analyze_s'].append(_timed(handler._analyze_slide_layouts))
+            timings['create_s'].append(
+                _timed(handler.create_presentation_from_slides, slides_data, output_path)
+            )
+
+            # Regenerating an unchanged deck with a warm slide cache
+            handler.slide_cache = SlideRenderCache(256 * 1024 * 1024)
+            handler.create_presentation_from_slides(slides_data, output_path)
+            timings['cached_create_s'].append(
+                _timed(handler.create_presentation_from_slides, slides_data, output_path)
+            )
+            handler.slide_cache = None
+
+            # Time save separately on a deck of the same size built in place
+            for i, slide_data in enumerate(slides_data):
+                handler.create_slide_from_layout(
+                    handler._get_appropriate_layout(slide_data['type'], i), slide_data
+                )
+            timings['save_s'].append(_timed(handler.save_presentation, output_path))
+        output_size = os.path.getsize(output_path)
+
+    result = {name: statistics.median(values) for name, values in timings.items()}
+    result['create_slides_per_s'] = slide_count / result['create_s'] if result['create_s'] else None
+    result['save_slides_per_s'] = slide_count / result['save_s'] if result['save_s'] else None
+    result['output_bytes'] = output_size
+    result['peak_rss_mb'] = round(_peak_rss_mb(), 1)
+    return result
+
+
+def _run_isolated(template_path: str, slide_count: int, repeat: int) -> Dict[str, Any]:
+    """Run a case in a fresh process so ru_maxrss only covers that case."""
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        return pool.apply(run_case, (template_path, slide_count, repeat))
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def run_benchmarks(profiles: List[str], deck_sizes: List[int], repeat: int) -> Dict[str, Any]:
+    """Generate templates for each profile and measure every deck size."""
+    results = []
+    with tempfile.TemporaryDirectory() as template_dir:
+        for profile in profiles:
+            layouts, shapes, media_kb = TEMPLATE_PROFILES[profile]
+            template_path = os.path.join(template_dir, f"{profile}.pptx")
+            template = build_synthetic_template(template_path, layouts, shapes, media_kb * 1024)
+
+            for slide_count in deck_sizes:
+                print(f"▶ {profile}: {slide_count} slides", flush=True)
+                case = _run_isolated(template_path, slide_count, repeat)
+                results.append({
+                    'profile': profile,
+                    'layouts': template['layout_count'],
+                    'shapes_per_layout': shapes,
+                    'media_kb': media_kb,
+                    'template_bytes': template['file_size'],
+                    'slides': slide_count,
+                    **case
+                })
+
+    return {
+        'meta': {
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'git_revision': _git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': repeat
+        },
+        'results': results
+    }
+
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any],
+                    tolerance: float) -> List[str]:
+    """
+    Compare a run against a baseline.
+
+    Returns:
+        List of human-readable regressions beyond `tolerance` (e.g. 0.15 = 15%)
+    """
+    baseline_cases = {(r['profile'], r['slides']): r for r in baseline.get('results', [])}
+    regressions = []
+    for case in current['results']:
+        reference = baseline_cases.get((case['profile'], case['slides']))
+        if not reference:
+            continue
+        for metric in COMPARED_METRICS:
+            old, new = reference.get(metric), case.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            marker = '⚠️' if change > tolerance else '  '
+            print(f"{marker} {case['profile']:>13} {case['slides']:>4} slides "
+                  f"{metric:>12}: {old:.4f} -> {new:.4f} ({change:+.1%})")
+            if change > tolerance:
+                regressions.append(f"{case['profile']}/{case['slides']}/{metric} {change:+.1%}")
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark TemplateHandler on synthetic templates")
+    parser.add_argument('--profiles', nargs='+', choices=sorted(TEMPLATE_PROFILES),
+                        default=list(TEMPLATE_PROFILES))
+    parser.add_argument('--slides', nargs='+', type=int, default=DEFAULT_DECK_SIZES,
+                        help="Deck sizes to measure")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output',
+                        help="Where to write the JSON results (default: the results directory, "
+                             "or nowhere with --compare)")
+    parser.add_argument('--compare', metavar='BASELINE',
+                        help="Baseline JSON to compare against; exits non-zero on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.15,
+                        help="Allowed relative slowdown before a metric counts as a regression")
+    args = parser.parse_args()
+    if args.output is None and not args.compare:
+        args.output = DEFAULT_OUTPUT
+    if args.output and args.compare and os.path.realpath(args.output) == os.path.realpath(args.compare):
+        parser.error("--output must not overwrite the --compare baseline")
+
+    results = run_benchmarks(args.profiles, args.slides, args.repeat)
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(results, json.load(f), args.tolerance)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"✅ Results written to {args.output}")
+
+    if regressions:
+        print(f"❌ {len(regressions)} regression(s): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
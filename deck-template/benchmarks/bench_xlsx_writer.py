@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Microbenchmark for the export's Deals sheet writer
+
+Builds DataFrame chunks shaped like the export query's results (as the
+cursor path produces them: Decimal deal values, date objects, timestamps and
+NULLs) and measures the cost per row of turning them into sheet XML. It
+compares the column-wise writer with writing every cell through
+`TemplateWorkbook._cell`, and reports the conversion cost per column.
+
+    python benchmarks/bench_xlsx_writer.py
+    python benchmarks/bench_xlsx_writer.py --rows 50000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Any, Callable, Dict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BENCH_DIR)
+sys.path.insert(0, SERVICE_DIR)
+
+import pandas as pd
+
+from synthetic_deals import DEAL_COLUMNS, generate_deals
+from xlsx_export import excel_column, load_template_workbook
+
+DEFAULT_OUTPUT = os.path.join(BENCH_DIR, 'results', 'xlsx_writer.json')
+
+
+def build_chunk(row_count: int) -> pd.DataFrame:
+    """A chunk like iter_query_chunks returns for the export query."""
+    records = []
+    for deal in generate_deals(row_count):
+        deal['deal_value'] = Decimal(str(deal['deal_value']))
+        records.append([deal[column] for column in DEAL_COLUMNS])
+    return pd.DataFrame.from_records(records, columns=DEAL_COLUMNS, coerce_float=True)
+
+
+def per_cell_rows(template, chunk: pd.DataFrame, first_row: int) -> str:
+    """The sheet rows written one `_cell` call per value."""
+    parts = []
+    for row_number, values in enumerate(chunk.itertuples(index=False, name=None), start=first_row):
+        cells = ''.join(template._cell(f'{letter}{row_number}', value)
+                        for letter, value in zip(template.column_letters, values))
+        parts.append(f'<row r="{row_number}">{cells}</row>')
+    return ''.join(parts)
+
+
+def _median_seconds(func: Callable[[], Any], repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def run_benchmarks(row_count: int, repeat: int) -> Dict[str, Any]:
+    template = load_template_workbook(os.path.join(SERVICE_DIR, 'pivot_template.xlsx'))
+    chunk = build_chunk(row_count)
+    first_row = template.header_row + 1
+
+    if template._chunk_rows(chunk, first_row) != per_cell_rows(template, chunk, first_row):
+        print("⚠️ Column-wise and per-cell output differ for this chunk")
+
+    writers = {
+        'per_cell': lambda: per_cell_rows(template, chunk, first_row),
+        'column_wise': lambda: template._chunk_rows(chunk, first_row),
+    }
+    results = {'rows': row_count, 'writers': {}, 'columns': {}}
+    for name, func in writers.items():
+        seconds = _median_seconds(func, repeat)
+        results['writers'][name] = {'seconds': round(seconds, 4),
+                                    'us_per_row': round(seconds / row_count * 1e6, 2)}
+        print(f"{name:>12}: {seconds / row_count * 1e6:.2f} µs/row")
+
+    for column, series in chunk.items():
+        seconds = _median_seconds(lambda: excel_column(series), repeat)
+        results['columns'][column] = {'dtype': str(series.dtype), 'kind': excel_column(series)[0],
+                                      'us_per_row': round(seconds / row_count * 1e6, 3)}
+
+    results.update({
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'repeat': repeat,
+    })
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure the per-row cost of the Deals sheet writer")
+    parser.add_argument('--rows', type=int, default=20_000, help="Rows per chunk")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.rows, args.repeat)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for S3 and PostgreSQL
+
+Lets `template_api` and `export_pivot_api` run without AWS or the real
+database. S3 is either a real S3-compatible endpoint (MinIO, LocalStack) or
+a directory-backed fake; the database is either a local PostgreSQL or a
+SQLite file behind a psycopg2-shaped adapter. Queries SQLite cannot run
+are replaced by equivalents here, not in the services.
+"""
+
+import os
+import re
+import shutil
+import sqlite3
+import sys
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Optional
+from urllib.parse import urlparse
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVICE_DIR = os.path.dirname(BENCH_DIR)
+
+
+@dataclass
+class StackConfig:
+    """Where the services should find their storage and database."""
+    work_dir: str
+    bucket_name: str = 'loadtest-bucket'
+    # None -> directory-backed fake S3
+    s3_endpoint: Optional[str] = None
+    # None -> SQLite file in work_dir
+    database_url: Optional[str] = None
+
+    @property
+    def s3_root(self) -> str:
+        return os.path.join(self.work_dir, 's3')
+
+    @property
+    def sqlite_path(self) -> str:
+        return os.path.join(self.work_dir, 'loadtest.db')
+
+    @property
+    def sqlalchemy_url(self) -> str:
+        return self.database_url or f"sqlite:///{self.sqlite_path}"
+
+
+class LocalS3Client:
+    """
+    Directory-backed fake of the boto3 S3 client calls the services make.
+
+    Objects live at ``<root>/<bucket>/<key>``.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, key)
+
+    def head_bucket(self, Bucket: str):
+        if not os.path.isdir(os.path.join(self.root, Bucket)):
+            raise FileNotFoundError(f"No such bucket: {Bucket}")
+        return {}
+
+    def create_bucket(self, Bucket: str, **kwargs):
+        os.makedirs(os.path.join(self.root, Bucket), exist_ok=True)
+        return {}
+
+    def put_object(self, Bucket: str, Key: str, Body, **kwargs):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            if isinstance(Body, (bytes, bytearray)):
+                f.write(Body)
+            else:
+                shutil.copyfileobj(Body, f)
+        return {}
+
+    def get_object(self, Bucket: str, Key: str, **kwargs):
+        path = self._path(Bucket, Key)
+        return {'Body': open(path, 'rb'), 'ContentLength': os.path.getsize(path)}
+
+    def head_object(self, Bucket: str, Key: str, **kwargs):
+        path = self._path(Bucket, Key)
+        return {'ContentLength': os.path.getsize(path)}
+
+    def download_file(self, Bucket: str, Key: str, Filename: str, **kwargs):
+        shutil.copyfile(self._path(Bucket, Key), Filename)
+
+    def download_fileobj(self, Bucket: str, Key: str, Fileobj, **kwargs):
+        with open(self._path(Bucket, Key), 'rb') as f:
+            shutil.copyfileobj(f, Fileobj)
+
+    def upload_file(self, Filename: str, Bucket: str, Key: str, **kwargs):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        shutil.copyfile(Filename, path)
+
+    def delete_object(self, Bucket: str, Key: str, **kwargs):
+        path = self._path(Bucket, Key)
+        if os.path.exists(path):
+            os.unlink(path)
+        return {}
+
+    def list_objects_v2(self, Bucket: str, Prefix: str = '', **kwargs):
+        bucket_root = os.path.join(self.root, Bucket)
+        contents = []
+        for dirpath, _, filenames in os.walk(bucket_root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                key = os.path.relpath(path, bucket_root).replace(os.sep, '/')
+                if key.startswith(Prefix):
+                    stat = os.stat(path)
+                    contents.append({
+                        'Key': key,
+                        'Size': stat.st_size,
+                        'ETag': f'"{int(stat.st_mtime_ns)}-{stat.st_size}"',
+                        'LastModified': datetime.fromtimestamp(stat.st_mtime),
+                    })
+        contents.sort(key=lambda item: item['Key'])
+        return {'Contents': contents, 'KeyCount': len(contents), 'IsTruncated': False}
+
+    def close(self):
+        pass
+
+
+def _convert_timestamp(value: bytes) -> datetime:
+    try:
+        return datetime.fromisoformat(value.decode())
+    except ValueError:
+        # /templates/upload passes the literal 'NOW()' that PostgreSQL would evaluate
+        return datetime.now()
+
+
+sqlite3.register_converter('TIMESTAMP', _convert_timestamp)
+
+
+class _SqliteCursor:
+    """psycopg2-style cursor over sqlite3 (``%s`` params, dict rows on request)."""
+
+    _PARAM = re.compile(r'%s')
+
+    def __init__(self, cursor: sqlite3.Cursor, dict_rows: bool):
+        self._cursor = cursor
+        self._dict_rows = dict_rows
+
+    def execute(self, query: str, params=None):
+        self._cursor.execute(self._PARAM.sub('?', query), tuple(params or ()))
+
+    def _row(self, row):
+        if row is None or not self._dict_rows:
+            return row
+        return {col[0]: value for col, value in zip(self._cursor.description, row)}
+
+    def fetchone(self):
+        return self._row(self._cursor.fetchone())
+
+    def fetchall(self):
+        return [self._row(row) for row in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class SqliteConnection:
+    """Minimal psycopg2 connection stand-in used by template_api."""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, detect_types=sqlite3.PARSE_DECLTYPES, timeout=30)
+
+    def cursor(self, cursor_factory=None):
+        return _SqliteCursor(self._conn.cursor(), dict_rows=cursor_factory is not None)
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def make_s3_client(config: StackConfig):
+    """Return an S3 client for the configured stand-in."""
+    if config.s3_endpoint:
+        import boto3
+        return boto3.client(
+            's3',
+            endpoint_url=config.s3_endpoint,
+            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID', 'minioadmin'),
+            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY', 'minioadmin'),
+            region_name=os.getenv('AWS_REGION', 'us-east-1'),
+        )
+    return LocalS3Client(config.s3_root)
+
+
+def make_engine(config: StackConfig):
+    from sqlalchemy import create_engine
+    return create_engine(config.sqlalchemy_url)
+
+
+def _postgres_db_config(database_url: str) -> Dict[str, Any]:
+    url = urlparse(database_url)
+    return {
+        'host': url.hostname,
+        'database': url.path.lstrip('/'),
+        'user': url.username,
+        'password': url.password,
+        'port': url.port or 5432,
+    }
+
+
+def configure_template_api(config: StackConfig):
+    """Import template_api and point it at the local stand-ins."""
+    if SERVICE_DIR not in sys.path:
+        sys.path.insert(0, SERVICE_DIR)
+    import template_api
+
+    template_api.s3_client = make_s3_client(config)
+    template_api.create_s3_client = lambda: make_s3_client(config)
+    template_api.S3_CONFIG['bucket_name'] = config.bucket_name
+    if config.database_url:
+        template_api.DB_CONFIG.update(_postgres_db_config(config.database_url))
+    else:
+        template_api.get_db_connection = lambda: SqliteConnection(config.sqlite_path)
+    return template_api.app
+
+
+def sqlite_summary_query(where: str = '') -> str:
+    """
+    pipeline_summary.summary_query for SQLite, which has no GROUPING SETS.
+
+    One UNION ALL branch per grouping set, each tagged with the grouping id
+    GROUPING() would report for it.
+    """
+    from pipeline_summary import _ALL_AGGREGATED, _GROUPING_IDS, _MEASURES, SUMMARY_DIMENSIONS
+
+    columns = [column for column, _, _ in SUMMARY_DIMENSIONS]
+    selects = []
+    for grouping_id, grouped in list(_GROUPING_IDS.items()) + [(_ALL_AGGREGATED, None)]:
+        selected = ', '.join(column if column == grouped else f'NULL AS {column}' for column in columns)
+        group_by = f' GROUP BY {grouped}' if grouped else ''
+        selects.append(f"SELECT {grouping_id} AS grouping_id, {selected},{_MEASURES}\n FROM deals{where}{group_by}")
+    return '\nUNION ALL\n'.join(selects) + '\nORDER BY grouping_id, pipeline_value DESC'
+
+
+def configure_export_api(config: StackConfig):
+    """Import export_pivot_api and point it at the local database."""
+    if SERVICE_DIR not in sys.path:
+        sys.path.insert(0, SERVICE_DIR)
+    # The module builds its engine URL from DB_* at import time; give it a parseable one
+    db_config = _postgres_db_config(config.database_url or 'postgresql://localhost:5432/loadtest')
+    for env_name, key in [('DB_USER', 'user'), ('DB_PASS', 'password'), ('DB_HOST', 'host'),
+                          ('DB_PORT', 'port'), ('DB_NAME', 'database')]:
+        os.environ[env_name] = str(db_config[key] or '')
+    import export_pivot_api
+    import pipeline_summary
+
+    export_pivot_api.engine = make_engine(config)
+    if export_pivot_api.engine.dialect.name == 'sqlite':
+        pipeline_summary.summary_query = sqlite_summary_query
+    return export_pivot_api.app
+
+
+SERVICES = {
+    'template_api': configure_template_api,
+    'export_pivot_api': configure_export_api,
+}
+
+
+# Result caches of the services, turned off unless a run asks for them
+CACHE_ENV_OFF = {
+    'DECK_CACHE_BACKEND': 'none',
+    'SLIDE_CACHE_MAX_MB': '0',
+    'EXPORT_CACHE_MAX_MB': '0',
+}
+
+
+def serve(service: str, config: StackConfig, port: int, log_level: str = 'warning', caches: bool = False):
+    """
+    Run one service with uvicorn against the stand-ins.
+
+    Intended as a multiprocessing target so services do not share the load
+    generator's CPU or GIL. Without `caches`, the deck, slide and export
+    caches are off so repeated requests measure the actual work.
+    """
+    import uvicorn
+
+    if not caches:
+        # Read when the service modules are imported below
+        os.environ.update(CACHE_ENV_OFF)
+
+    # Keep service output out of the load generator's report
+    log_file = open(os.path.join(config.work_dir, f"{service}.log"), 'a', buffering=1)
+    sys.stdout = sys.stderr = log_file
+
+    # export_pivot_api opens pivot_template.xlsx relative to the working directory
+    os.chdir(SERVICE_DIR)
+    app = SERVICES[service](config)
+    uvicorn.run(app, host='127.0.0.1', port=port, log_level=log_level, access_log=False)
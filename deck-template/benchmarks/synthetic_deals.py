@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Synthetic data for the export and template services
+
+Creates the subset of the Prisma schema the Python services read
+(`company_files`, `deals` and `users`) and seeds it with generated rows. Works
+against PostgreSQL or a SQLite stand-in through a SQLAlchemy engine.
+"""
+
+import csv
+import io
+import random
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List
+
+from sqlalchemy import text
+
+STAGES = ['Discovery', 'Qualification', 'Proposal', 'Negotiation', 'Closed Won', 'Closed Lost']
+LEAD_SOURCES = ['Inbound', 'Outbound', 'Partner', 'Event', 'Referral']
+COMPETITORS = [None, 'Oracle', 'Microsoft', 'Workday', 'Infor']
+
+DEAL_COLUMNS = [
+    'id', 'company_id', 'deal_name', 'stage', 'deal_value', 'probability',
+    'expected_close_date', 'actual_close_date', 'ae_assigned', 'sales_manager',
+    'lead_source', 'competitor', 'loss_reason', 'notes', 'last_activity',
+    'created_at', 'updated_at'
+]
+
+COMPANY_FILE_COLUMNS = [
+    'filename', 'original_name', 'file_size', 'file_type', 'category',
+    'file_path', 's3_key', 'uploaded_at'
+]
+
+PPTX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+_DDL = {
+    'company_files': """
+        CREATE TABLE IF NOT EXISTS company_files (
+            id {pk},
+            company_id INTEGER,
+            filename VARCHAR(255) NOT NULL,
+            original_name VARCHAR(255) NOT NULL,
+            file_size INTEGER NOT NULL,
+            file_type VARCHAR(100) NOT NULL,
+            category VARCHAR(50) NOT NULL,
+            file_path VARCHAR(500) NOT NULL,
+            uploaded_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP,
+            created_by INTEGER,
+            file_content TEXT,
+            content_extracted BOOLEAN DEFAULT FALSE,
+            s3_key VARCHAR(500)
+        )
+    """,
+    'deals': """
+        CREATE TABLE IF NOT EXISTS deals (
+            id {pk},
+            company_id INTEGER,
+            deal_name VARCHAR(255) NOT NULL,
+            stage VARCHAR(50) NOT NULL DEFAULT 'Discovery',
+            deal_value NUMERIC(12, 2),
+            probability INTEGER DEFAULT 0,
+            expected_close_date DATE,
+            actual_close_date DATE,
+            ae_assigned INTEGER,
+            sales_manager INTEGER,
+            lead_source VARCHAR(100),
+            competitor VARCHAR(255),
+            loss_reason TEXT,
+            notes TEXT,
+            last_activity TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP,
+            created_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP
+        )
+    """,
+    'users': """
+        CREATE TABLE IF NOT EXISTS users (
+            id {pk},
+            email VARCHAR(255) NOT NULL UNIQUE,
+            name VARCHAR(255) NOT NULL,
+            role VARCHAR(50) DEFAULT 'sales_rep',
+            territory VARCHAR(100)
+        )
+    """,
+}
+
+# Same index names as prisma/schema.prisma
+_INDEXES = [
+    "CREATE INDEX IF NOT EXISTS idx_company_files_s3_key ON company_files (s3_key)",
+    "CREATE INDEX IF NOT EXISTS idx_deals_ae ON deals (ae_assigned)",
+    "CREATE INDEX IF NOT EXISTS idx_deals_close_date ON deals (expected_close_date)",
+    "CREATE INDEX IF NOT EXISTS idx_deals_company ON deals (company_id)",
+    "CREATE INDEX IF NOT EXISTS idx_deals_company_stage ON deals (company_id, stage)",
+    "CREATE INDEX IF NOT EXISTS idx_deals_stage ON deals (stage)",
+    "CREATE INDEX IF NOT EXISTS idx_deals_stage_ae ON deals (stage, ae_assigned)",
+    "CREATE INDEX IF NOT EXISTS idx_deals_value ON deals (deal_value)",
+]
+
+
+def create_schema(engine, drop: bool = False):
+    """Create the tables and indexes used by the services."""
+    pk = 'SERIAL PRIMARY KEY' if engine.dialect.name == 'postgresql' else 'INTEGER PRIMARY KEY'
+    with engine.begin() as conn:
+        for table, ddl in _DDL.items():
+            if drop:
+                conn.execute(text(f"DROP TABLE IF EXISTS {table}"))
+            conn.execute(text(ddl.format(pk=pk)))
+        for statement in _INDEXES:
+            conn.execute(text(statement))
+
+
+def generate_deals(row_count: int, start_id: int = 1, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    """
+    Yield synthetic deal rows matching the Prisma `deals` model.
+
+    Args:
+        row_count: Number of rows to generate
+        start_id: First deal id
+        seed: Random seed so runs are reproducible
+    """
+    rng = random.Random(seed + start_id)
+    base_day = date(2024, 1, 1)
+    base_time = datetime(2024, 1, 1, 9, 0, 0)
+    company_count = max(10, row_count // 20)
+
+    for deal_id in range(start_id, start_id + row_count):
+        stage = rng.choice(STAGES)
+        closed = stage.startswith('Closed')
+        expected_close = base_day + timedelta(days=rng.randint(0, 720))
+        created_at = base_time + timedelta(minutes=rng.randint(0, 720 * 24 * 60))
+        yield {
+            'id': deal_id,
+            'company_id': rng.randint(1, company_count),
+            'deal_name': f"Synthetic Deal {deal_id}",
+            'stage': stage,
+            'deal_value': round(rng.uniform(5_000, 2_500_000), 2),
+            'probability': 100 if stage == 'Closed Won' else 0 if stage == 'Closed Lost' else rng.randint(5, 90),
+            'expected_close_date': expected_close,
+            'actual_close_date': expected_close + timedelta(days=rng.randint(-30, 30)) if closed else None,
+            'ae_assigned': rng.randint(1, 50),
+            'sales_manager': rng.randint(51, 60),
+            'lead_source': rng.choice(LEAD_SOURCES),
+            'competitor': rng.choice(COMPETITORS),
+            'loss_reason': 'Budget' if stage == 'Closed Lost' else None,
+            'notes': None if rng.random() < 0.5 else f"Follow up on proposal {deal_id}",
+            'last_activity': created_at + timedelta(days=rng.randint(0, 60)),
+            'created_at': created_at,
+            'updated_at': created_at + timedelta(days=rng.randint(0, 90)),
+        }
+
+
+def _copy_rows(engine, table: str, columns: List[str], rows: List[Dict[str, Any]]):
+    """Bulk load rows into PostgreSQL with COPY FROM STDIN."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['' if row[c] is None else row[c] for c in columns])
+    buffer.seek(0)
+
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, NULL '')", buffer
+        )
+        raw.commit()
+        cursor.close()
+    finally:
+        raw.close()
+
+
+def _insert_rows(engine, table: str, columns: List[str], rows: List[Dict[str, Any]]):
+    """Insert rows with executemany (SQLite and other stand-ins)."""
+    placeholders = ', '.join(f":{c}" for c in columns)
+    statement = text(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})")
+    # SQLite has no native date types; store ISO strings like the sqlite3 adapters do
+    prepared = [
+        {c: v.isoformat(sep=' ') if isinstance(v, datetime) else v.isoformat() if isinstance(v, date) else v
+         for c, v in row.items()}
+        for row in rows
+    ]
+    with engine.begin() as conn:
+        conn.execute(statement, prepared)
+
+
+def seed_deals(engine, row_count: int, batch_size: int = 50_000, seed: int = 42) -> int:
+    """
+    Replace the contents of `deals` with `row_count` synthetic rows.
+
+    Returns:
+        Number of rows written
+    """
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM deals"))
+
+    load = _copy_rows if engine.dialect.name == 'postgresql' else _insert_rows
+    written = 0
+    while written < row_count:
+        count = min(batch_size, row_count - written)
+        rows = list(generate_deals(count, start_id=written + 1, seed=seed))
+        load(engine, 'deals', DEAL_COLUMNS, rows)
+        written += count
+
+    if engine.dialect.name == 'postgresql':
+        with engine.begin() as conn:
+            conn.execute(text("SELECT setval(pg_get_serial_sequence('deals', 'id'), :n)"), {'n': max(row_count, 1)})
+            conn.execute(text("ANALYZE deals"))
+    return written
+
+
+def seed_users(engine, user_count: int = 60) -> int:
+    """
+    Replace the contents of `users` with the AEs (ids 1-50) and sales managers (51-60) deals refer to.
+
+    Returns:
+        Number of rows written
+    """
+    rows = [{
+        'id': user_id,
+        'email': f"user{user_id}@example.com",
+        'name': f"Synthetic {'AE' if user_id <= 50 else 'Manager'} {user_id}",
+        'role': 'sales_rep' if user_id <= 50 else 'sales_manager',
+    } for user_id in range(1, user_count + 1)]
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM users"))
+    _insert_rows(engine, 'users', ['id', 'email', 'name', 'role'], rows)
+    return len(rows)
+
+
+def seed_template_files(engine, template_keys: List[str], file_size: int) -> List[str]:
+    """
+    Register templates in `company_files` the way /templates/upload does.
+
+    Args:
+        template_keys: S3 keys (``templates/<filename>``) already stored in the bucket
+        file_size: Size recorded for each template
+
+    Returns:
+        Template ids (filenames) usable as `template_id`
+    """
+    rows = []
+    for s3_key in template_keys:
+        filename = s3_key.split('/', 1)[-1]
+        rows.append({
+            'filename': filename,
+            'original_name': filename.split('_', 1)[-1],
+            'file_size': file_size,
+            'file_type': PPTX_CONTENT_TYPE,
+            'category': 'templates',
+            'file_path': f"/api/files/{s3_key}",
+            's3_key': s3_key,
+            'uploaded_at': datetime.now(),
+        })
+
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM company_files WHERE category = 'templates'"))
+    load = _copy_rows if engine.dialect.name == 'postgresql' else _insert_rows
+    load(engine, 'company_files', COMPANY_FILE_COLUMNS, rows)
+    return [row['filename'] for row in rows]
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Synthetic PowerPoint template generator for benchmarks
+
+Builds .pptx templates locally so the template handler can be measured
+without downloading customer templates from S3. Templates can be varied by
+layout count, extra shapes per layout and size of embedded media.
+"""
+
+import copy
+import io
+import os
+from typing import Any, Dict, List
+
+from PIL import Image
+from pptx import Presentation
+from pptx.opc.constants import RELATIONSHIP_TYPE as RT
+from pptx.parts.slide import SlideLayoutPart
+from pptx.util import Inches
+
+# Layout 1 of the default python-pptx template is "Title and Content"
+BASE_CONTENT_LAYOUT = 1
+
+
+def _random_png(size_bytes: int) -> bytes:
+    """
+    Build a PNG of roughly the requested size.
+
+    Random pixels do not compress, so the encoded size tracks the raw size.
+    """
+    side = max(1, int((size_bytes / 3) ** 0.5))
+    image = Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+    buffer = io.BytesIO()
+    image.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _clone_layout(presentation, source_layout, name: str):
+    """Append a copy of `source_layout` to the first slide master."""
+    master = presentation.slide_masters[0]
+    package = presentation.part.package
+    partname = package.next_partname('/ppt/slideLayouts/slideLayout%d.xml')
+
+    element = copy.deepcopy(source_layout._element)
+    element.cSld.set('name', name)
+    layout_part = SlideLayoutPart(partname, source_layout.part.content_type, package, element)
+    layout_part.relate_to(master.part, RT.SLIDE_MASTER)
+    rId = master.part.relate_to(layout_part, RT.SLIDE_LAYOUT)
+
+    # Layout ids share a number space with master ids and must stay unique
+    id_lst = master._element.get_or_add_sldLayoutIdLst()
+    used_ids = [int(entry.get('id')) for entry in id_lst.sldLayoutId_lst]
+    used_ids += [int(entry.get('id')) for entry in presentation.part._element.sldMasterIdLst]
+    entry = id_lst._add_sldLayoutId()
+    entry.set('id', str(max(used_ids) + 1))
+    entry.rId = rId
+    return layout_part.slide_layout
+
+
+def _add_layout_shapes(layout, shape_count: int):
+    """Add decorative text boxes to a layout's shape tree."""
+    sp_tree = layout.shapes._spTree
+    for i in range(shape_count):
+        shape_id = layout.shapes._next_shape_id
+        textbox = sp_tree.add_textbox(
+            shape_id, f"Decoration {i}",
+            Inches(0.2 + (i % 10) * 0.9), Inches(6.8), Inches(0.8), Inches(0.4)
+        )
+        textbox.txBody.p_lst[0].add_r().text = f"Synthetic shape {i}"
+
+
+def _add_layout_media(layout, image_bytes: bytes):
+    """Embed a picture in a layout so every slide using it references the media part."""
+    image_part, rId = layout.part.get_or_add_image_part(io.BytesIO(image_bytes))
+    shape_id = layout.shapes._next_shape_id
+    layout.shapes._spTree.add_pic(
+        shape_id, "Synthetic media", "", rId,
+        Inches(8.5), Inches(0.2), Inches(1.2), Inches(1.2)
+    )
+
+
+def build_synthetic_template(output_path: str, layout_count: int = 11,
+                             shapes_per_layout: int = 0,
+                             media_bytes: int = 0) -> Dict[str, Any]:
+    """
+    Create a synthetic template on disk.
+
+    Args:
+        output_path: Where to write the .pptx file
+        layout_count: Total number of slide layouts (at least the 11 built-in ones)
+        shapes_per_layout: Extra text boxes added to every layout
+        media_bytes: Approximate size of a picture embedded in every layout
+            (0 disables media)
+
+    Returns:
+        Dict describing the generated template
+    """
+    presentation = Presentation()
+    layouts = list(presentation.slide_layouts)
+
+    source_layout = layouts[BASE_CONTENT_LAYOUT]
+    for i in range(len(layouts), layout_count):
+        layouts.append(_clone_layout(presentation, source_layout, f"Synthetic Layout {i}"))
+
+    image_bytes = _random_png(media_bytes) if media_bytes > 0 else None
+    for layout in layouts:
+        if shapes_per_layout:
+            _add_layout_shapes(layout, shapes_per_layout)
+        if image_bytes:
+            _add_layout_media(layout, image_bytes)
+
+    presentation.save(output_path)
+    return {
+        'path': output_path,
+        'layout_count': len(presentation.slide_layouts),
+        'shapes_per_layout': shapes_per_layout,
+        'media_bytes': media_bytes,
+        'file_size': os.path.getsize(output_path)
+    }
+
+
+def build_slides_data(slide_count: int, body_chars: int = 600) -> List[Dict[str, Any]]:
+    """
+    Build slide payloads shaped like the ones the dashboard posts.
+
+    Args:
+        slide_count: Number of slides to generate
+        body_chars: Approximate length of each slide's body text
+    """
+    sentence = "Synthetic benchmark content for the template handler. "
+    body = (sentence * (body_chars // len(sentence) + 1))[:body_chars]
+    slides_data = []
+    for i in range(slide_count):
+        slides_data.append({
+            'type': 'title' if i == 0 else 'content',
+            'title': f"Benchmark Slide {i + 1}",
+            'content': body,
+            'order': i + 1
+        })
+    return slides_data
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Generate a synthetic .pptx template")
+    parser.add_argument("output", help="Path of the .pptx file to write")
+    parser.add_argument("--layouts", type=int, default=11)
+    parser.add_argument("--shapes", type=int, default=0)
+    parser.add_argument("--media-kb", type=int, default=0)
+    args = parser.parse_args()
+
+    info = build_synthetic_template(args.output, args.layouts, args.shapes, args.media_kb * 1024)
+    print(json.dumps(info, indent=2))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Data-only pipeline exports: Arrow IPC, Parquet and gzip'd CSV
+
+BI tools that only want the deal rows should not have to parse the pivot
+workbook. These writers turn the DataFrame chunks read from the database
+into record batches (Arrow), row groups (Parquet) or CSV lines and yield
+the encoded bytes as each chunk is written, so the export streams in
+constant memory like the workbook export does.
+
+Arrow and Parquet need pyarrow; without it only CSV is available.
+"""
+
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Arrow/Parquet exports are reported as unavailable
+    pa = pq = None
+
+# format -> (media type, file extension)
+EXPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrow'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'csv': ('application/gzip', 'csv.gz'),
+}
+
+# Column types of the export, as pyarrow type aliases. Fixing them up front keeps
+# every batch on the same schema even when a chunk has a column that is all NULL.
+DEAL_COLUMN_TYPES: List[Tuple[str, str]] = [
+    ('id', 'int64'),
+    ('company_id', 'int64'),
+    ('deal_name', 'string'),
+    ('stage', 'string'),
+    ('deal_value', 'float64'),
+    ('probability', 'int32'),
+    ('expected_close_date', 'date32'),
+    ('actual_close_date', 'date32'),
+    ('ae_assigned', 'int64'),
+    ('sales_manager', 'int64'),
+    ('lead_source', 'string'),
+    ('competitor', 'string'),
+    ('loss_reason', 'string'),
+    ('notes', 'string'),
+    ('last_activity', 'timestamp[us]'),
+    ('created_at', 'timestamp[us]'),
+    ('updated_at', 'timestamp[us]'),
+]
+
+
+def format_available(export_format: str) -> bool:
+    """Whether `export_format` can be produced in this installation."""
+    return export_format == 'csv' or pa is not None
+
+
+class _StreamSink:
+    """Write-only file object for pyarrow writers whose output is drained as it grows."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def arrow_schema(column_types: List[Tuple[str, str]] = DEAL_COLUMN_TYPES) -> 'pa.Schema':
+    return pa.schema([(name, pa.type_for_alias(type_name)) for name, type_name in column_types])
+
+
+def _to_table(chunk: pd.DataFrame, schema: 'pa.Schema') -> 'pa.Table':
+    columns = []
+    for field in schema:
+        values = chunk[field.name]
+        if pa.types.is_floating(field.type) and values.dtype == object:
+            # Decimal values from NUMERIC columns
+            values = pd.to_numeric(values, errors='coerce')
+        elif pa.types.is_date32(field.type) and pd.api.types.is_datetime64_any_dtype(values.dtype):
+            values = values.dt.date
+        elif pa.types.is_timestamp(field.type) and getattr(values.dtype, 'tz', None) is not None:
+            values = values.dt.tz_localize(None)
+        # from_pandas: NaN/None/NaT become nulls, also in integer columns
+        columns.append(pa.array(values, type=field.type, from_pandas=True))
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def iter_arrow(chunks: Iterable[pd.DataFrame], schema: Optional['pa.Schema'] = None) -> Iterator[bytes]:
+    """Yield an Arrow IPC stream with one record batch per chunk."""
+    schema = schema or arrow_schema()
+    sink = _StreamSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for chunk in chunks:
+            writer.write_table(_to_table(chunk, schema))
+            yield sink.drain()
+    # End-of-stream marker
+    yield sink.drain()
+
+
+def iter_parquet(chunks: Iterable[pd.DataFrame], schema: Optional['pa.Schema'] = None,
+                 compression: str = 'zstd') -> Iterator[bytes]:
+    """Yield a Parquet file with one row group per chunk."""
+    schema = schema or arrow_schema()
+    sink = _StreamSink()
+    with pq.ParquetWriter(sink, schema, compression=compression) as writer:
+        for chunk in chunks:
+            writer.write_table(_to_table(chunk, schema))
+            yield sink.drain()
+    # Footer
+    yield sink.drain()
+
+
+def iter_csv_gzip(chunks: Iterable[pd.DataFrame], columns: Optional[List[str]] = None,
+                  compresslevel: int = 6) -> Iterator[bytes]:
+    """Yield gzip-compressed CSV with a header row, one compressed block per chunk."""
+    columns = columns or [name for name, _ in DEAL_COLUMN_TYPES]
+    compressor = zlib.compressobj(compresslevel, zlib.DEFLATED, 31)
+    # Written up front so an export without rows still has its header
+    header = compressor.compress(pd.DataFrame(columns=columns).to_csv(index=False).encode('utf-8'))
+    if header:
+        yield header
+    for chunk in chunks:
+        text = chunk.to_csv(index=False, header=False, date_format='%Y-%m-%d %H:%M:%S.%f',
+                            lineterminator='\n')
+        data = compressor.compress(text.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_export(export_format: str, chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+    """Encode `chunks` in one of EXPORT_FORMATS."""
+    if export_format == 'arrow':
+        return iter_arrow(chunks)
+    if export_format == 'parquet':
+        return iter_parquet(chunks)
+    return iter_csv_gzip(chunks)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Row filters for pipeline exports
+
+Exports can be limited to one stage, AE, sales manager, company or close-date
+window. Filters become a parameterized WHERE clause that is shared by the
+row query, the summary query and the cache fingerprint. Conditions are
+written in the column order of the `deals` indexes so the planner can use
+them:
+
+    company_id + stage        -> idx_deals_company_stage
+    stage + ae_assigned       -> idx_deals_stage_ae
+    expected_close_date range -> idx_deals_close_date
+"""
+
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from fastapi import HTTPException, Query
+
+
+@dataclass
+class DealFilters:
+    """Filters of one export request; empty fields do not filter."""
+    stage: List[str] = field(default_factory=list)
+    ae_assigned: Optional[int] = None
+    sales_manager: Optional[int] = None
+    company_id: Optional[int] = None
+    expected_close_from: Optional[date] = None
+    expected_close_to: Optional[date] = None
+    updated_since: Optional[datetime] = None
+
+    def where(self, paramstyle: str = 'named') -> Tuple[str, Union[Dict[str, Any], List[Any]]]:
+        """
+        SQL conditions and bind parameters for these filters.
+
+        Args:
+            paramstyle: 'named' for `:name` placeholders (SQLAlchemy `text()`),
+                'format' for positional `%s` placeholders (DB-API connections)
+
+        Returns:
+            Tuple of (' WHERE ...' or '', parameters by name or in placeholder order)
+        """
+        if paramstyle not in ('named', 'format'):
+            raise ValueError(f"Unsupported paramstyle '{paramstyle}'")
+        conditions = []
+        named: Dict[str, Any] = {}
+        positional: List[Any] = []
+
+        def bind(name: str, value: Any) -> str:
+            if paramstyle == 'format':
+                positional.append(value)
+                return '%s'
+            named[name] = value
+            return ':' + name
+
+        if self.company_id is not None:
+            conditions.append(f"company_id = {bind('company_id', self.company_id)}")
+        if self.stage:
+            # One placeholder per value, so the same text works with every driver
+            placeholders = [bind(f"stage_{i}", stage) for i, stage in enumerate(self.stage)]
+            conditions.append(f"stage IN ({', '.join(placeholders)})")
+        if self.ae_assigned is not None:
+            conditions.append(f"ae_assigned = {bind('ae_assigned', self.ae_assigned)}")
+        if self.sales_manager is not None:
+            conditions.append(f"sales_manager = {bind('sales_manager', self.sales_manager)}")
+        if self.expected_close_from is not None:
+            conditions.append(f"expected_close_date >= {bind('expected_close_from', self.expected_close_from)}")
+        if self.expected_close_to is not None:
+            conditions.append(f"expected_close_date <= {bind('expected_close_to', self.expected_close_to)}")
+        if self.updated_since is not None:
+            conditions.append(f"updated_at >= {bind('updated_since', self.updated_since)}")
+
+        params = positional if paramstyle == 'format' else named
+        if not conditions:
+            return '', params
+        return ' WHERE ' + ' AND '.join(conditions), params
+
+    def cache_options(self) -> Dict[str, Any]:
+        """The filters as options of an export cache key."""
+        options = asdict(self)
+        options['stage'] = sorted(set(self.stage))
+        return options
+
+
+def deal_filters(
+    stage: Optional[List[str]] = Query(None, description="Stage(s) to include; repeat for several"),
+    ae_assigned: Optional[int] = Query(None, description="AE user id"),
+    sales_manager: Optional[int] = Query(None, description="Sales manager user id"),
+    company_id: Optional[int] = Query(None),
+    expected_close_from: Optional[date] = Query(None, description="Earliest expected close date"),
+    expected_close_to: Optional[date] = Query(None, description="Latest expected close date"),
+    updated_since: Optional[datetime] = Query(None, description="Only deals updated at or after this time"),
+) -> DealFilters:
+    """FastAPI dependency reading the export filters from the query string."""
+    if expected_close_from and expected_close_to and expected_close_from > expected_close_to:
+        raise HTTPException(status_code=400, detail="expected_close_from must not be after expected_close_to")
+    return DealFilters(
+        stage=[s for s in (stage or []) if s],
+        ae_assigned=ae_assigned,
+        sales_manager=sales_manager,
+        company_id=company_id,
+        expected_close_from=expected_close_from,
+        expected_close_to=expected_close_to,
+        updated_since=updated_since,
+    )
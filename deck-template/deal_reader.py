@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Chunked reads of export queries
+
+`pd.read_sql` without a server-side cursor pulls the whole result set into
+the client before the first row is usable. Here the query runs on a named,
+server-side cursor (SQLAlchemy `yield_per`), so rows arrive in batches and
+each batch becomes one DataFrame. On PostgreSQL the rows can instead be
+bulk-extracted with `COPY ... TO STDOUT` and parsed by pandas' CSV reader
+straight into columns, which skips building a Python tuple per row.
+`prefetch` moves the fetching onto a background thread with a bounded
+queue. The next batch is then read from the database while the previous
+one is written to the output.
+
+Environment:
+    EXPORT_CHUNK_ROWS: Rows per fetched batch (default 10000)
+    EXPORT_PREFETCH_CHUNKS: Batches fetched ahead of the writer (default 2, 0 disables)
+    EXPORT_EXTRACT_BACKEND: 'auto' (default: COPY on PostgreSQL, cursor elsewhere),
+        'copy' or 'cursor'
+"""
+
+import logging
+import os
+import queue
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+from sqlalchemy import text
+
+from structured_logging import log_event
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "10000"))
+EXPORT_PREFETCH_CHUNKS = int(os.getenv("EXPORT_PREFETCH_CHUNKS", "2"))
+EXPORT_EXTRACT_BACKEND = os.getenv("EXPORT_EXTRACT_BACKEND", "auto").lower()
+
+# PostgreSQL type OIDs with a non-text representation in the COPY output;
+# columns of any other type are kept as text
+_PG_DATE = 1082
+_PG_TIMESTAMP = 1114
+_PG_TIMESTAMPTZ = 1184
+_PG_FLOAT = {700, 701, 1700}
+_PG_INFERRED = {16, 20, 21, 23, _PG_DATE, _PG_TIMESTAMP, _PG_TIMESTAMPTZ}
+_COPY_NULL = '\\N'
+
+
+def iter_query_chunks(engine, query: str, params: Optional[Dict[str, Any]] = None,
+                      batch_size: int = EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Run `query` and yield its rows as DataFrames of up to `batch_size` rows.
+
+    On dialects with server-side cursors (PostgreSQL/psycopg2) rows are
+    fetched from a named cursor `batch_size` at a time; elsewhere the
+    driver's own cursor is read in batches of the same size.
+    """
+    with engine.connect() as conn:
+        yield from iter_connection_chunks(conn, query, params, batch_size)
+
+
+def iter_connection_chunks(conn, query: str, params: Optional[Dict[str, Any]] = None,
+                           batch_size: int = EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Like `iter_query_chunks`, on a connection the caller already holds."""
+    if conn.dialect.supports_server_side_cursors:
+        conn = conn.execution_options(yield_per=batch_size)
+    result = conn.execute(text(query), params or {})
+    columns = list(result.keys())
+    for rows in result.partitions(batch_size):
+        yield pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+
+
+def _convert_copy_chunk(chunk: pd.DataFrame, type_codes: List[int]) -> pd.DataFrame:
+    """Turn CSV-parsed columns into the types the cursor path returns."""
+    for column, type_code in zip(chunk.columns, type_codes):
+        if type_code == _PG_DATE:
+            chunk[column] = pd.to_datetime(chunk[column], format='ISO8601').dt.date
+        elif type_code in (_PG_TIMESTAMP, _PG_TIMESTAMPTZ):
+            chunk[column] = pd.to_datetime(chunk[column], format='ISO8601',
+                                           utc=type_code == _PG_TIMESTAMPTZ)
+    return chunk
+
+
+def read_copy_csv(stream, columns: List[str], type_codes: List[int],
+                  batch_size: int = EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Parse `COPY ... TO STDOUT WITH (FORMAT csv, NULL '\\N')` output into DataFrames.
+
+    Args:
+        stream: Binary file object with the COPY output
+        columns: Result column names
+        type_codes: PostgreSQL type OIDs of the columns
+    """
+    # Integer, boolean and date/time columns are left to the parser's inference
+    # (integers without NULLs become int64, like on the cursor path)
+    dtypes = {}
+    for column, type_code in zip(columns, type_codes):
+        if type_code in _PG_FLOAT:
+            dtypes[column] = 'float64'
+        elif type_code not in _PG_INFERRED:
+            dtypes[column] = object
+    reader = pd.read_csv(stream, names=columns, header=None, chunksize=batch_size, dtype=dtypes,
+                         na_values=[_COPY_NULL], keep_default_na=False,
+                         true_values=['t'], false_values=['f'])
+    for chunk in reader:
+        yield _convert_copy_chunk(chunk, type_codes)
+
+
+def _bind_query(engine, cursor, query: str, params: Optional[Dict[str, Any]]) -> str:
+    """Inline the `:name` parameters of `query` with the driver's own quoting."""
+    from psycopg2.extensions import encodings
+
+    compiled = text(query).compile(dialect=engine.dialect)
+    bound = cursor.mogrify(str(compiled), {**compiled.params, **(params or {})})
+    return bound.decode(encodings[cursor.connection.encoding])
+
+
+def iter_copy_chunks(engine, query: str, params: Optional[Dict[str, Any]] = None,
+                     batch_size: int = EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Bulk-extract `query` with COPY TO STDOUT and yield DataFrames of up to `batch_size` rows.
+
+    COPY runs on a background thread and writes into a pipe, which pandas'
+    CSV reader consumes, so at most one pipe buffer plus one batch is in
+    memory. PostgreSQL (psycopg2) only. COPY takes no bind parameters, so
+    `params` are inlined with psycopg2's `mogrify`.
+    """
+    raw = engine.raw_connection()
+    finished = False
+    try:
+        cursor = raw.cursor()
+        query = _bind_query(engine, cursor, query, params)
+        # Column names and types, without running the query
+        cursor.execute(f"SELECT * FROM ({query}) AS export_columns LIMIT 0")
+        columns = [column.name for column in cursor.description]
+        type_codes = [column.type_code for column in cursor.description]
+
+        read_fd, write_fd = os.pipe()
+        reader, writer = os.fdopen(read_fd, 'rb'), os.fdopen(write_fd, 'wb')
+        errors = []
+
+        def copy():
+            try:
+                cursor.copy_expert(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, NULL '{_COPY_NULL}')", writer)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                writer.close()
+
+        copier = threading.Thread(target=copy, name='export-copy', daemon=True)
+        copier.start()
+        try:
+            yield from read_copy_csv(reader, columns, type_codes, batch_size)
+        finally:
+            # Closing the read end makes an unfinished COPY fail instead of blocking
+            reader.close()
+            copier.join()
+        if errors:
+            raise errors[0]
+        finished = True
+    finally:
+        if finished:
+            raw.close()
+        else:
+            # The connection may be mid-COPY; do not return it to the pool
+            raw.invalidate()
+
+
+def iter_export_chunks(engine, query: str, params: Optional[Dict[str, Any]] = None,
+                       backend: Optional[str] = None,
+                       batch_size: int = EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Yield the rows of `query` as DataFrames using the configured extraction backend.
+
+    With 'auto', COPY is used on PostgreSQL. If COPY fails before producing
+    any rows (e.g. not permitted through a pooler), the cursor path is used
+    instead.
+    """
+    backend = (backend or EXPORT_EXTRACT_BACKEND).lower()
+    use_copy = backend == 'copy' or (backend == 'auto' and engine.dialect.name == 'postgresql')
+    if not use_copy:
+        yield from iter_query_chunks(engine, query, params, batch_size)
+        return
+
+    chunks = iter_copy_chunks(engine, query, params, batch_size)
+    try:
+        first_chunk = next(chunks, None)
+    except Exception as e:
+        if backend == 'copy':
+            raise
+        log_event(logger, logging.WARNING, 'export_copy_fallback', error=str(e))
+        yield from iter_query_chunks(engine, query, params, batch_size)
+        return
+    if first_chunk is not None:
+        yield first_chunk
+        yield from chunks
+
+
+class _Failure:
+    __slots__ = ('error',)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_DONE = object()
+
+
+def prefetch(chunks: Iterable, depth: int = EXPORT_PREFETCH_CHUNKS) -> Iterator:
+    """
+    Iterate `chunks` on a background thread, keeping up to `depth` items ready.
+
+    The source is iterated and closed on the background thread only. Errors
+    are re-raised in the consumer. If the consumer stops early, the source
+    is closed so its database connection is released.
+    """
+    if depth <= 0:
+        yield from chunks
+        return
+
+    buffer: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        source = iter(chunks)
+        try:
+            for item in source:
+                if not put(item):
+                    break
+            else:
+                put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+        finally:
+            close = getattr(source, 'close', None)
+            if close is not None:
+                close()
+
+    producer = threading.Thread(target=produce, name='export-prefetch', daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        producer.join()
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Whole-deck result cache
+
+Identical generation requests (same template bytes, same slides) produce the
+same .pptx, so the rendered file is stored under a key built from the
+template content hash and a canonical hash of the sorted slide payload.
+Repeat requests are served from the cache instead of rendering again.
+
+Environment:
+    DECK_CACHE_BACKEND: 'memory' (default), 'disk' or 'none'
+    DECK_CACHE_MAX_MB: Size bound for stored decks (default 256)
+    DECK_CACHE_TTL_SECONDS: Lifetime of an entry (default 3600)
+    DECK_CACHE_DIR: Directory for the disk backend (default <tmp>/deck-cache)
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def deck_cache_key(template_hash: str, slides_data: List[Dict[str, Any]]) -> str:
+    """
+    Key for a generation request.
+
+    Args:
+        template_hash: Content hash of the template file
+        slides_data: Slide payloads, already sorted by `order`
+    """
+    canonical = json.dumps(slides_data, sort_keys=True, separators=(',', ':'), default=str)
+    digest = hashlib.sha256()
+    digest.update(template_hash.encode('ascii'))
+    digest.update(b'\0')
+    digest.update(canonical.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CachedDeck:
+    """A cache hit: either the file's bytes (memory) or a path to it (disk)."""
+
+    __slots__ = ('data', 'path')
+
+    def __init__(self, data: Optional[bytes] = None, path: Optional[str] = None):
+        self.data = data
+        self.path = path
+
+
+class MemoryDeckCache:
+    """LRU of deck bytes bounded by total size, with a per-entry TTL."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[str, Tuple[bytes, float]]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # Directory mtime when this process last looked at it
+        self._directory_mtime = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[CachedDeck]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < time.time():
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return CachedDeck(data=entry[0])
+
+    def put(self, key: str, source_path: str):
+        if os.path.getsize(source_path) > self.max_bytes:
+            return
+        with open(source_path, 'rb') as f:
+            data = f.read()
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (data, time.time() + self.ttl_seconds)
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        data, _ = self._entries.pop(key)
+        self._size -= len(data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'backend': 'memory', 'entries': len(self._entries), 'bytes': self._size,
+                    'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses}
+
+
+class DiskDeckCache:
+    """
+    Decks stored as files under a directory, bounded by total size, with a TTL.
+
+    The directory is the source of truth, so workers on one host can share
+    it: a deck another process stored is found on disk when it is not in this
+    process's index. A hit sets the file's access time (its mtime stays the
+    store time the TTL counts from), so every worker sees which decks are in
+    use. The index is rebuilt from the directory, least recently used first,
+    when another process has added or removed decks since the last rebuild
+    and before evicting decks over the size bound. Entries written by earlier
+    processes are picked up on startup.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_seconds: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: 'OrderedDict[str, int]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        # Directory mtime when this process last looked at it
+        self._directory_mtime = 0
+        self.hits = 0
+        self.misses = 0
+
+        os.makedirs(directory, exist_ok=True)
+        self._rebuild_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pptx")
+
+    def _directory_changed(self) -> bool:
+        """Whether decks were added or removed since this process last looked."""
+        return os.stat(self.directory).st_mtime_ns != self._directory_mtime
+
+    def _rebuild_index(self):
+        """Index every deck in the directory, least recently used first, including other processes' decks."""
+        self._directory_mtime = os.stat(self.directory).st_mtime_ns
+        existing = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if not entry.name.endswith('.pptx'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    # Evicted by another process meanwhile
+                    continue
+                existing.append((stat.st_atime_ns, entry.name[:-len('.pptx')], stat.st_size))
+        self._entries.clear()
+        self._size = 0
+        for _, key, size in sorted(existing):
+            self._entries[key] = size
+            self._size += size
+
+    def get(self, key: str) -> Optional[CachedDeck]:
+        path = self._path(key)
+        with self._lock:
+            try:
+                stat = os.stat(path)
+                expired = stat.st_mtime + self.ttl_seconds < time.time()
+            except OSError:
+                stat, expired = None, True
+            if expired:
+                if key in self._entries:
+                    self._remove(key)
+                elif stat is not None:
+                    _unlink(path)
+                self.misses += 1
+                return None
+            if key not in self._entries:
+                # Stored by another worker
+                self._entries[key] = stat.st_size
+                self._size += stat.st_size
+            self._entries.move_to_end(key)
+            try:
+                # Record the use for other workers' eviction; the mtime keeps the TTL
+                os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+            except OSError:
+                pass
+            self.hits += 1
+            return CachedDeck(path=path)
+
+    def put(self, key: str, source_path: str):
+        size = os.path.getsize(source_path)
+        if size > self.max_bytes:
+            return
+        # Checked before our own write changes the directory
+        with self._lock:
+            foreign_changes = self._directory_changed()
+        # Write next to the final path and rename, so readers never see partial files
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as out, open(source_path, 'rb') as src:
+            while True:
+                chunk = src.read(1024 * 1024)
+                if not chunk:
+                    break
+                out.write(chunk)
+        os.replace(temp_path, self._path(key))
+
+        with self._lock:
+            if foreign_changes:
+                # Other workers' decks count against the bound too
+                self._rebuild_index()
+            else:
+                self._size += size - self._entries.pop(key, 0)
+                self._entries[key] = size
+            if self._size > self.max_bytes:
+                # Other workers' hits decide what goes, so evict in the directory's access order
+                self._rebuild_index()
+                while self._size > self.max_bytes:
+                    self._remove(next(iter(self._entries)))
+            self._directory_mtime = os.stat(self.directory).st_mtime_ns
+
+    def _remove(self, key: str):
+        self._size -= self._entries.pop(key)
+        _unlink(self._path(key))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'backend': 'disk', 'directory': self.directory, 'entries': len(self._entries),
+                    'bytes': self._size, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+def deck_cache_from_env():
+    """Build the configured deck cache, or None when caching is disabled."""
+    backend = os.getenv('DECK_CACHE_BACKEND', 'memory').lower()
+    max_bytes = int(float(os.getenv('DECK_CACHE_MAX_MB', '256')) * 1024 * 1024)
+    ttl_seconds = float(os.getenv('DECK_CACHE_TTL_SECONDS', '3600'))
+    if backend == 'none' or max_bytes <= 0:
+        return None
+    if backend == 'disk':
+        directory = os.getenv('DECK_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'deck-cache'))
+        return DiskDeckCache(directory, max_bytes, ttl_seconds)
+    return MemoryDeckCache(max_bytes, ttl_seconds)
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Snapshot cache for pipeline exports
+
+An export only changes when `deals` (or the template) changes, so generated
+workbooks are kept in memory under a key built from a cheap fingerprint of
+the exported rows: their count and latest `updated_at`. A repeat click with the
+same fingerprint is served from the cache, and a client that already holds
+that snapshot gets a 304 through its ETag. Concurrent requests for a
+snapshot that is being built wait for that build instead of starting their
+own.
+
+The fingerprint does not see changes that keep both the row count and
+`max(updated_at)` the same (e.g. an UPDATE that does not touch
+`updated_at`); such edits show up once the next change bumps either value.
+
+Environment:
+    EXPORT_CACHE_MAX_MB: Size bound for cached workbooks (default 256, 0 disables)
+    EXPORT_CACHE_WAIT_SECONDS: How long a request waits for a build in progress (default 120)
+"""
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from sqlalchemy import text
+
+from deal_filters import DealFilters
+
+EXPORT_CACHE_MAX_BYTES = int(float(os.getenv("EXPORT_CACHE_MAX_MB", "256")) * 1024 * 1024)
+EXPORT_CACHE_WAIT_SECONDS = float(os.getenv("EXPORT_CACHE_WAIT_SECONDS", "120"))
+
+FINGERPRINT_QUERY = "SELECT COUNT(*) AS row_count, MAX(updated_at) AS last_updated FROM deals"
+
+
+def deals_fingerprint(engine, filters: Optional[DealFilters] = None) -> Tuple[str, int]:
+    """
+    Row count and latest update of the deals matching `filters`.
+
+    Returns:
+        Tuple of the fingerprint string and the row count, so callers sizing
+        the export do not count the rows again
+    """
+    where, params = (filters or DealFilters()).where()
+    with engine.connect() as conn:
+        row = conn.execute(text(FINGERPRINT_QUERY + where), params).mappings().one()
+    return f"{row['row_count']}:{row['last_updated']}", row['row_count']
+
+
+def export_cache_key(fingerprint: str, template_path: str, **options: Any) -> str:
+    """
+    Key for an export of the data identified by `fingerprint`.
+
+    Args:
+        fingerprint: Fingerprint string from `deals_fingerprint`
+        template_path: Template the export is built from; edits to it change the key
+        options: Request options that change the output
+    """
+    stat = os.stat(template_path)
+    digest = hashlib.sha256()
+    digest.update(fingerprint.encode('utf-8'))
+    digest.update(f"\0{stat.st_mtime_ns}:{stat.st_size}".encode('ascii'))
+    for name in sorted(options):
+        digest.update(f"\0{name}={options[name]!r}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def etag_for(key: str) -> str:
+    return f'"{key[:32]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header value covers `etag`."""
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates or f'W/{etag}' in candidates
+
+
+class _Build:
+    __slots__ = ('done', 'data')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.data: Optional[bytes] = None
+
+
+class ExportSnapshotCache:
+    """LRU of export bytes bounded by total size, with single-flight builds per key."""
+
+    def __init__(self, max_bytes: int, wait_seconds: float = EXPORT_CACHE_WAIT_SECONDS):
+        self.max_bytes = max_bytes
+        self.wait_seconds = wait_seconds
+        self._entries: 'OrderedDict[str, bytes]' = OrderedDict()
+        self._building: Dict[str, _Build] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def acquire(self, key: str) -> Tuple[Optional[bytes], bool]:
+        """
+        Look up `key`, waiting for a build of it that is already in progress.
+
+        Returns:
+            Tuple of (cached bytes, whether the caller must build and `release`
+            the key). Both are empty/False only if an in-progress build failed
+            or took longer than `wait_seconds`; the caller then builds without
+            caching.
+        """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data, False
+            build = self._building.get(key)
+            if build is None:
+                self._building[key] = _Build()
+                self.misses += 1
+                return None, True
+            self.coalesced += 1
+
+        build.done.wait(self.wait_seconds)
+        return build.data, False
+
+    def release(self, key: str, data: Optional[bytes]):
+        """Finish a build started by `acquire`, storing `data` unless it is None."""
+        with self._lock:
+            build = self._building.pop(key, None)
+            if data is not None and len(data) <= self.max_bytes:
+                if key in self._entries:
+                    self._size -= len(self._entries.pop(key))
+                self._entries[key] = data
+                self._size += len(data)
+                while self._size > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._size -= len(evicted)
+        if build is not None:
+            build.data = data
+            build.done.set()
+
+    def tee(self, key: str, chunks: Iterable[bytes]) -> Iterator[bytes]:
+        """
+        Pass a streamed build for an `acquire`d key through, keeping a copy.
+
+        The copy is stored when the stream completes. It is dropped once it
+        exceeds the cache's size bound, so a huge export still streams in
+        constant memory.
+        """
+        copy = []
+        size = 0
+        completed = False
+        try:
+            for chunk in chunks:
+                if copy is not None:
+                    size += len(chunk)
+                    if size <= self.max_bytes:
+                        copy.append(chunk)
+                    else:
+                        copy = None
+                yield chunk
+            completed = True
+        finally:
+            self.release(key, b''.join(copy) if completed and copy is not None else None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'entries': len(self._entries), 'bytes': self._size, 'max_bytes': self.max_bytes,
+                    'building': len(self._building), 'hits': self.hits, 'misses': self.misses,
+                    'coalesced': self.coalesced}
+
+
+def export_cache_from_env() -> Optional[ExportSnapshotCache]:
+    """Build the export cache, or None when it is disabled."""
+    if EXPORT_CACHE_MAX_BYTES <= 0:
+        return None
+    return ExportSnapshotCache(EXPORT_CACHE_MAX_BYTES)
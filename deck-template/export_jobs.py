@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+Background export jobs
+
+Exports of the full deal history can outlast a proxy timeout, and a
+synchronous export holds a request worker for its whole duration. A job
+runs the same export on a small pool of background threads, writes the
+file into a local result directory and reports progress (rows written out
+of the rows expected) until the file is downloaded or expires. Each user
+may only have a few jobs queued or running at a time, so one analyst
+cannot occupy every export worker. A job is only visible to the user who
+submitted it, and a file is not deleted while a download of it is running.
+"User" is the id the API passes in; this module does not authenticate it
+(see `job_user` in export_pivot_api.py).
+On startup, files in the result directory older than the TTL (left behind
+by a process that exited) are deleted.
+
+Jobs live in the memory of one process; with several server processes,
+status and download requests must reach the process that accepted the job.
+
+Environment:
+    EXPORT_JOB_WORKERS: Jobs running at the same time (default 2)
+    EXPORT_JOB_PER_USER: Jobs a user may have queued or running (default 1)
+    EXPORT_JOB_TTL_SECONDS: How long a finished file is kept (default 3600)
+    EXPORT_JOB_DIR: Result directory (default <tmp>/export-jobs)
+"""
+
+import logging
+import os
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from structured_logging import log_event
+
+logger = logging.getLogger(__name__)
+
+EXPORT_JOB_WORKERS = int(os.getenv("EXPORT_JOB_WORKERS", "2"))
+EXPORT_JOB_PER_USER = int(os.getenv("EXPORT_JOB_PER_USER", "1"))
+EXPORT_JOB_TTL_SECONDS = float(os.getenv("EXPORT_JOB_TTL_SECONDS", "3600"))
+EXPORT_JOB_DIR = os.getenv("EXPORT_JOB_DIR", os.path.join(tempfile.gettempdir(), "export-jobs"))
+
+ACTIVE_STATUSES = ('queued', 'running')
+
+
+class JobLimitExceeded(Exception):
+    """The user already has the maximum number of active jobs."""
+
+
+class ExportJob:
+    """State of one background export."""
+
+    def __init__(self, user: str, filename: str, media_type: str, total_rows: Optional[int],
+                 options: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.user = user
+        self.filename = filename
+        self.media_type = media_type
+        self.total_rows = total_rows
+        self.options = options
+        self.status = 'queued'
+        self.rows_written = 0
+        self.size = 0
+        self.error: Optional[str] = None
+        self.path: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.expires_at: Optional[float] = None
+        # Downloads in progress; the file outlives its TTL until they finish
+        self.downloads = 0
+        self.last_download_at: Optional[float] = None
+
+    def count_rows(self, chunks: Iterable) -> Iterator:
+        """Pass DataFrame chunks through, counting their rows as progress."""
+        for chunk in chunks:
+            yield chunk
+            self.rows_written += len(chunk)
+
+    def to_dict(self) -> Dict[str, Any]:
+        progress = None
+        if self.status == 'done':
+            progress = 1.0
+        elif self.total_rows:
+            progress = round(min(self.rows_written / self.total_rows, 1.0), 4)
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'rows_written': self.rows_written,
+            'total_rows': self.total_rows,
+            'progress': progress,
+            'size': self.size if self.status == 'done' else None,
+            'filename': self.filename,
+            'options': self.options,
+            'error': self.error,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'expires_at': self.expires_at,
+        }
+
+
+class ExportJobManager:
+    """Runs export jobs on a bounded thread pool and keeps their results for a TTL."""
+
+    def __init__(self, result_dir: str = EXPORT_JOB_DIR, workers: int = EXPORT_JOB_WORKERS,
+                 per_user_limit: int = EXPORT_JOB_PER_USER, ttl_seconds: float = EXPORT_JOB_TTL_SECONDS):
+        self.result_dir = result_dir
+        self.per_user_limit = per_user_limit
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, ExportJob] = {}
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='export-job')
+        os.makedirs(result_dir, exist_ok=True)
+        self.sweep()
+
+    def sweep(self) -> int:
+        """
+        Delete files in the result directory not modified for a TTL.
+
+        Jobs live in process memory, so such files belong to no job. Newer files
+        may belong to another process sharing the directory and are kept.
+
+        Returns:
+            Number of files deleted
+        """
+        cutoff = time.time() - self.ttl_seconds
+        removed = 0
+        with os.scandir(self.result_dir) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_file() and entry.stat().st_mtime < cutoff:
+                        os.unlink(entry.path)
+                        removed += 1
+                except OSError:
+                    continue
+        if removed:
+            log_event(logger, logging.INFO, 'export_job_dir_swept', result_dir=self.result_dir, removed=removed)
+        return removed
+
+    def submit(self, user: str, build: Callable[[ExportJob], Iterable[bytes]], filename: str,
+               media_type: str, total_rows: Optional[int] = None,
+               options: Optional[Dict[str, Any]] = None) -> ExportJob:
+        """
+        Queue an export.
+
+        Args:
+            user: Who the job is counted against
+            build: Called on a worker with the job; returns the file's bytes in pieces
+                and reports progress through `job.count_rows`
+            filename: Download name of the result
+            media_type: Content type of the result
+            total_rows: Rows the export is expected to contain, for progress
+
+        Raises:
+            JobLimitExceeded: If the user already has `per_user_limit` active jobs
+        """
+        self.expire()
+        job = ExportJob(user, filename, media_type, total_rows, options or {})
+        with self._lock:
+            active = sum(1 for other in self._jobs.values()
+                         if other.user == user and other.status in ACTIVE_STATUSES)
+            if active >= self.per_user_limit:
+                raise JobLimitExceeded(f"User '{user}' already has {active} export job(s) in progress")
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, build)
+        log_event(logger, logging.INFO, 'export_job_queued', job_id=job.id, user=user, total_rows=total_rows)
+        return job
+
+    def _run(self, job: ExportJob, build: Callable[[ExportJob], Iterable[bytes]]):
+        job.status = 'running'
+        job.started_at = time.time()
+        fd, temp_path = tempfile.mkstemp(dir=self.result_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for piece in build(job):
+                    f.write(piece)
+                    job.size += len(piece)
+            path = os.path.join(self.result_dir, f"{job.id}-{job.filename}")
+            os.replace(temp_path, path)
+        except Exception as e:
+            job.status = 'failed'
+            job.error = str(e)
+            job.finished_at = time.time()
+            job.expires_at = job.finished_at + self.ttl_seconds
+            _unlink(temp_path)
+            log_event(logger, logging.ERROR, 'export_job_failed', job_id=job.id, error=str(e))
+            return
+        job.path = path
+        job.finished_at = time.time()
+        job.expires_at = job.finished_at + self.ttl_seconds
+        job.status = 'done'
+        log_event(logger, logging.INFO, 'export_job_done', job_id=job.id, rows=job.rows_written,
+                  bytes=job.size, seconds=round(job.finished_at - job.started_at, 3))
+
+    def _visible(self, job_id: str, user: Optional[str]) -> Optional[ExportJob]:
+        job = self._jobs.get(job_id)
+        if job is None or (user is not None and job.user != user):
+            return None
+        return job
+
+    def get(self, job_id: str, user: Optional[str] = None) -> Optional[ExportJob]:
+        """The job, or None if it is unknown, expired or (with `user`) someone else's."""
+        self.expire()
+        with self._lock:
+            return self._visible(job_id, user)
+
+    def start_download(self, job_id: str, user: Optional[str] = None) -> Optional[ExportJob]:
+        """
+        Like get(); a finished job's file is then kept until finish_download(job).
+
+        A download that is never finished holds the file for at most one more TTL.
+        """
+        self.expire()
+        with self._lock:
+            job = self._visible(job_id, user)
+            if job is not None and job.status == 'done':
+                job.downloads += 1
+                job.last_download_at = time.time()
+            return job
+
+    def finish_download(self, job: ExportJob):
+        with self._lock:
+            job.downloads = max(0, job.downloads - 1)
+
+    def list(self, user: str) -> List[ExportJob]:
+        self.expire()
+        with self._lock:
+            return sorted((job for job in self._jobs.values() if job.user == user),
+                          key=lambda job: job.created_at, reverse=True)
+
+    def expire(self):
+        """Delete results past their TTL and not being downloaded, and forget their jobs."""
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if job.expires_at is not None and job.expires_at < now
+                       and not (job.downloads and now - job.last_download_at < self.ttl_seconds)]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            job.status = 'expired'
+            if job.path:
+                _unlink(job.path)
+
+
+def _unlink(path: str):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
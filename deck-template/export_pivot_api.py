@@ -1,16 +1,26 @@
-from fastapi import FastAPI, Response
+from fastapi import Depends, FastAPI, Header, HTTPException, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import create_engine
-import pandas as pd
+from fastapi.responses import FileResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from sqlalchemy import create_engine, text
 import io
 import os
-from openpyxl import Workbook
-from openpyxl.worksheet.table import Table, TableStyleInfo
+import threading
+from collections import OrderedDict
+from itertools import chain
+from typing import Dict, Iterator, List, Optional
 
-from openpyxl.utils.dataframe import dataframe_to_rows
-from openpyxl.utils import get_column_letter
-import openpyxl
-from openpyxl.utils.dataframe import dataframe_to_rows
+from admission import AdmissionRejected
+from columnar_export import EXPORT_FORMATS, format_available, iter_export
+from deal_filters import DealFilters, deal_filters
+from deal_reader import iter_export_chunks, prefetch
+from export_cache import deals_fingerprint, etag_for, etag_matches, export_cache_from_env, export_cache_key
+from export_jobs import ExportJob, ExportJobManager, JobLimitExceeded
+from job_scheduler import BATCH, INTERACTIVE, JobOptions, JobScheduler, ScheduledJob, scheduling_options
+from joined_sheets import JoinedSheet, close_joined_sheets, joined_sheet_names, joined_sheets
+from pipeline_summary import pipeline_summary_sheets
+from xlsx_export import XLSX_MEDIA_TYPE, load_template_workbook
 
 app = FastAPI()
 
@@ -33,37 +43,358 @@ DB_NAME = os.getenv("DB_NAME", "")
 DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 engine = create_engine(DATABASE_URL)
 
-@app.get("/export-pipeline-template")
-def export_pipeline_template():
-    query = """
-        SELECT id, company_id, deal_name, stage, deal_value, probability, expected_close_date, actual_close_date,
-               ae_assigned, sales_manager, lead_source, competitor, loss_reason, notes, last_activity, created_at, updated_at
-        FROM deals
+TEMPLATE_PATH = 'pivot_template.xlsx'
+
+DEALS_QUERY = """
+    SELECT id, company_id, deal_name, stage, deal_value, probability, expected_close_date, actual_close_date,
+           ae_assigned, sales_manager, lead_source, competitor, loss_reason, notes, last_activity, created_at, updated_at
+    FROM deals
+"""
+
+# Generated workbooks keyed by a fingerprint of deals (None when EXPORT_CACHE_MAX_MB=0)
+export_cache = export_cache_from_env()
+
+EXPORT_HEADERS = {'Content-Disposition': 'attachment; filename="pipeline_template.xlsx"'}
+
+# Background exports for requests that would outlast the proxy timeout
+export_jobs = ExportJobManager()
+
+# Interactive exports ahead of background ones, fair across users (SCHEDULER_* etc.)
+export_scheduler = JobScheduler.from_env()
+
+def _too_busy(e: AdmissionRejected) -> HTTPException:
+    """The HTTP response for an export the scheduler turned away"""
+    return HTTPException(status_code=e.status_code, detail=e.detail, headers={"Retry-After": str(e.retry_after)})
+
+# Rows exported per filter set, to size the next export with the same filters without counting
+_last_row_counts: 'OrderedDict[str, int]' = OrderedDict()
+_row_counts_lock = threading.Lock()
+_MAX_ROW_COUNTS = 1024
+
+def _filters_key(filters: DealFilters) -> str:
+    return repr(sorted(filters.cache_options().items()))
+
+def scheduled_export(job_options: JobOptions, kind: str, filters: DealFilters,
+                     sheets: Optional[List[str]] = None, default_priority: str = INTERACTIVE,
+                     rows: Optional[int] = None) -> ScheduledJob:
+    """
+    A scheduler job for an export; the cost model learns per kind and row count
+
+    `rows` is the row count when the caller already has it. Otherwise the job
+    is sized by the last export with the same filters (or not at all), so no
+    COUNT runs before the first byte; `counted_rows` records the real count.
+    """
+    cost_key = f"export:{kind}" + ''.join(f"+{sheet}" for sheet in sheets or [])
+    if rows is None:
+        with _row_counts_lock:
+            rows = _last_row_counts.get(_filters_key(filters))
+    return export_scheduler.job(job_options, cost_key, rows, default_priority)
+
+def counted_rows(chunks: Iterator, filters: DealFilters, job: Optional[ScheduledJob] = None) -> Iterator:
+    """Pass row chunks through, then record how many rows the export had"""
+    rows = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        yield chunk
+    if job is not None:
+        # Read when the job is released, after the last chunk
+        job.size = rows
+    key = _filters_key(filters)
+    with _row_counts_lock:
+        _last_row_counts.pop(key, None)
+        _last_row_counts[key] = rows
+        while len(_last_row_counts) > _MAX_ROW_COUNTS:
+            _last_row_counts.popitem(last=False)
+
+def _closing_sheets(body: Iterator[bytes], sheets: Optional[List[JoinedSheet]]) -> Iterator[bytes]:
+    """Yield the workbook, then close the joined sheets' connection however the stream ends"""
+    try:
+        yield from body
+    finally:
+        close_joined_sheets(sheets)
+
+async def _start(job: ScheduledJob):
+    """
+    Wait for the job's turn on the event loop
+
+    Queued exports must not wait on threadpool threads: a full queue would
+    hold most of the threads and stall every other sync endpoint.
+    """
+    try:
+        await export_scheduler.acquire(job)
+    except AdmissionRejected as e:
+        raise _too_busy(e)
+
+def _deal_rows(filters: DealFilters, job: Optional[ScheduledJob] = None) -> Iterator:
+    """Row chunks of the export, with the query already run"""
+    # Server-side cursor batches, fetched ahead of the writer on a background thread
+    where, params = filters.where()
+    chunks = counted_rows(prefetch(iter_export_chunks(engine, DEALS_QUERY + where, params)), filters, job)
+    # Run the query before the response starts so database errors still return 500
+    first_chunk = next(chunks, None)
+    if first_chunk is not None:
+        chunks = chain([first_chunk], chunks)
+    return chunks
+
+def stream_pipeline_template(filters: DealFilters, summary: bool = True, cache_key: Optional[str] = None,
+                             headers: Optional[Dict[str, str]] = None, sheets: Optional[List[str]] = None,
+                             job: Optional[ScheduledJob] = None):
+    """
+    Stream the export while rows are read, holding a few chunks of rows at a time
+
+    `job` must already be started; its slot is given back when the response ends.
     """
-    df = pd.read_sql(query, engine)
+    extra_sheets = None
+    try:
+        template = load_template_workbook(TEMPLATE_PATH)
+        # Aggregated in the database; a few rows per sheet
+        summary_sheets = pipeline_summary_sheets(engine, filters) if summary else None
+        # Joined in the database, read as the writer reaches each sheet
+        extra_sheets = joined_sheets(engine, sheets, filters) if sheets else None
+        chunks = _deal_rows(filters, job)
+    except BaseException:
+        close_joined_sheets(extra_sheets)
+        if cache_key is not None:
+            export_cache.release(cache_key, None)
+        if job is not None:
+            export_scheduler.release(job, observe=False)
+        raise
 
-    # Load your template
-    wb = openpyxl.load_workbook('pivot_template.xlsx')
-    ws = wb['Deals']
+    body = template.stream(chunks, summary_sheets, extra_sheets)
+    if extra_sheets:
+        body = _closing_sheets(body, extra_sheets)
+    if job is not None:
+        # The job keeps its slot until the last byte is written
+        body = export_scheduler.release_after(job, body)
+    if cache_key is not None:
+        # Keep a copy for the snapshot cache; started here so an abandoned response still releases the key
+        body = export_cache.tee(cache_key, body)
+        body = chain([next(body)], body)
 
-    # Clear existing data (except header)
-    ws.delete_rows(2, ws.max_row)
+    return StreamingResponse(
+        body,
+        media_type=XLSX_MEDIA_TYPE,
+        headers={**EXPORT_HEADERS, **(headers or {})},
+    )
 
-    # Write new data (excluding header)
-    for r in dataframe_to_rows(df, index=False, header=False):
-        ws.append(r)
+def write_pipeline_workbook(filters: DealFilters, summary: bool = True,
+                            sheets: Optional[List[str]] = None, job: Optional[ScheduledJob] = None) -> io.BytesIO:
+    """Build the whole export in memory; `job` is only sized with the rows written"""
+    # Template parsed once per process; only the Deals sheet XML is generated per request
+    template = load_template_workbook(TEMPLATE_PATH)
+    summary_sheets = pipeline_summary_sheets(engine, filters) if summary else None
+    extra_sheets = joined_sheets(engine, sheets, filters) if sheets else None
 
-    # Save to output
+    # Write the workbook as batches arrive from the database
+    where, params = filters.where()
+    chunks = counted_rows(prefetch(iter_export_chunks(engine, DEALS_QUERY + where, params)), filters, job)
     output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
+    for piece in _closing_sheets(template.stream(chunks, summary_sheets, extra_sheets), extra_sheets):
+        output.write(piece)
+    return output
 
-    headers = {
-        'Content-Disposition': 'attachment; filename="pipeline_template.xlsx"',
-        'Content-Type': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-    }
-    return Response(content=output.read(), headers=headers, media_type=headers["Content-Type"])
+@app.get("/export-pipeline-template")
+async def export_pipeline_template(stream: bool = False, summary: bool = True,
+                             filters: DealFilters = Depends(deal_filters),
+                             if_none_match: Optional[str] = Header(None),
+                             sheets: List[str] = Depends(joined_sheet_names),
+                             job_options: JobOptions = Depends(scheduling_options)):
+    # The deals fingerprint does not cover the joined tables, so those exports are not cached
+    # Jobs wait for their slot on the event loop and only then take a threadpool thread
+    if export_cache is None or sheets:
+        job = scheduled_export(job_options, 'xlsx_stream' if stream else 'xlsx', filters, sheets)
+        if stream:
+            await _start(job)
+            return await run_in_threadpool(stream_pipeline_template, filters, summary,
+                                           headers={'X-Export-Cache': 'BYPASS'}, sheets=sheets, job=job)
+        try:
+            async with export_scheduler.run(job):
+                output = await run_in_threadpool(write_pipeline_workbook, filters, summary, sheets, job)
+        except AdmissionRejected as e:
+            raise _too_busy(e)
+        # Hand the buffer to the response without copying it
+        return Response(content=output.getbuffer(), media_type=XLSX_MEDIA_TYPE,
+                        headers={**EXPORT_HEADERS, 'X-Export-Cache': 'BYPASS'})
+
+    # Same rows and template -> same workbook, so the key doubles as the ETag
+    fingerprint, rows = await run_in_threadpool(deals_fingerprint, engine, filters)
+    cache_key = export_cache_key(fingerprint, TEMPLATE_PATH, summary=summary, **filters.cache_options())
+    headers = {'ETag': etag_for(cache_key), 'Cache-Control': 'private, no-cache'}
+    if etag_matches(if_none_match, headers['ETag']):
+        return Response(status_code=304, headers=headers)
+
+    # Waits if the same snapshot is already being built by another request
+    data, owner = await run_in_threadpool(export_cache.acquire, cache_key)
+    if data is not None:
+        return Response(content=data, media_type=XLSX_MEDIA_TYPE,
+                        headers={**EXPORT_HEADERS, **headers, 'X-Export-Cache': 'HIT'})
+
+    headers['X-Export-Cache'] = 'MISS'
+    try:
+        job = scheduled_export(job_options, 'xlsx_stream' if stream else 'xlsx', filters, rows=rows)
+    except BaseException:
+        if owner:
+            export_cache.release(cache_key, None)
+        raise
+    if stream:
+        try:
+            await _start(job)
+        except BaseException:
+            if owner:
+                export_cache.release(cache_key, None)
+            raise
+        return await run_in_threadpool(stream_pipeline_template, filters, summary, cache_key if owner else None,
+                                       headers, job=job)
+
+    try:
+        async with export_scheduler.run(job):
+            data = (await run_in_threadpool(write_pipeline_workbook, filters, summary, job=job)).getvalue()
+    except BaseException as e:
+        if owner:
+            export_cache.release(cache_key, None)
+        if isinstance(e, AdmissionRejected):
+            raise _too_busy(e)
+        raise
+    if owner:
+        export_cache.release(cache_key, data)
+    return Response(content=data, media_type=XLSX_MEDIA_TYPE, headers={**EXPORT_HEADERS, **headers})
 
 @app.get("/export-pipeline-pivot")
-def export_pipeline_pivot():
-    return export_pipeline_template()
+async def export_pipeline_pivot(stream: bool = False, summary: bool = True,
+                          filters: DealFilters = Depends(deal_filters),
+                          if_none_match: Optional[str] = Header(None),
+                          sheets: List[str] = Depends(joined_sheet_names),
+                          job_options: JobOptions = Depends(scheduling_options)):
+    return await export_pipeline_template(stream, summary, filters, if_none_match, sheets, job_options)
+
+@app.get("/export-pipeline-data/{export_format}")
+async def export_pipeline_data(export_format: str, filters: DealFilters = Depends(deal_filters),
+                         job_options: JobOptions = Depends(scheduling_options)):
+    """Stream the deals rows as Arrow IPC, Parquet or gzip'd CSV, without the workbook"""
+    if export_format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=404, detail=f"Unknown format '{export_format}'; "
+                                                    f"use one of {', '.join(EXPORT_FORMATS)}")
+    if not format_available(export_format):
+        raise HTTPException(status_code=501, detail=f"{export_format} export needs pyarrow")
+    media_type, extension = EXPORT_FORMATS[export_format]
+
+    job = scheduled_export(job_options, export_format, filters)
+    await _start(job)
+    try:
+        chunks = await run_in_threadpool(_deal_rows, filters, job)
+    except BaseException:
+        export_scheduler.release(job, observe=False)
+        raise
+
+    return StreamingResponse(
+        export_scheduler.release_after(job, iter_export(export_format, chunks)),
+        media_type=media_type,
+        headers={'Content-Disposition': f'attachment; filename="pipeline_deals.{extension}"'},
+    )
+
+@app.get("/scheduler/status")
+def scheduler_status():
+    """Export slots in use, queued jobs per priority class and rejections"""
+    return export_scheduler.status()
+
+@app.get("/export-cache/status")
+def export_cache_status():
+    """Size and hit counts of the export snapshot cache"""
+    if export_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **export_cache.stats()}
+
+def count_deals(filters: DealFilters) -> int:
+    """Rows an export with `filters` will contain"""
+    where, params = filters.where()
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT COUNT(*) FROM deals" + where), params).scalar_one()
+
+def _export_job_status(job: ExportJob) -> dict:
+    status = job.to_dict()
+    status['status_url'] = f"/export-jobs/{job.id}"
+    status['download_url'] = f"/export-jobs/{job.id}/download" if job.status == 'done' else None
+    return status
+
+def job_user(x_user_id: str = Header('anonymous')) -> str:
+    """
+    The user export jobs belong to
+
+    This is not authentication: X-User-Id is whatever the client sends, and
+    requests without it share the 'anonymous' jobs. Job ids are random, but
+    anyone who knows a user id can list and download that user's exports.
+    Deploy behind a proxy that authenticates the caller and sets X-User-Id
+    (overwriting any value the client sent), or replace this dependency
+    with one that reads the authenticated user.
+    """
+    return x_user_id
+
+@app.post("/export-jobs", status_code=202)
+def submit_export_job(export_format: str = 'xlsx', summary: bool = True,
+                      filters: DealFilters = Depends(deal_filters),
+                      sheets: List[str] = Depends(joined_sheet_names),
+                      x_user_id: str = Depends(job_user),
+                      job_options: JobOptions = Depends(scheduling_options)):
+    """Start an export in the background; poll its status and download it when done"""
+    if export_format == 'xlsx':
+        media_type, extension = XLSX_MEDIA_TYPE, 'xlsx'
+    elif export_format in EXPORT_FORMATS:
+        if not format_available(export_format):
+            raise HTTPException(status_code=501, detail=f"{export_format} export needs pyarrow")
+        media_type, extension = EXPORT_FORMATS[export_format]
+    else:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{export_format}'; "
+                                                    f"use xlsx or one of {', '.join(EXPORT_FORMATS)}")
+
+    def build(job: ExportJob):
+        # Background exports are batch work: waiting interactive exports start first
+        scheduled = scheduled_export(job_options, export_format, filters, sheets, BATCH, rows=job.total_rows)
+        with export_scheduler.run_blocking(scheduled):
+            where, params = filters.where()
+            chunks = job.count_rows(prefetch(iter_export_chunks(engine, DEALS_QUERY + where, params)))
+            if export_format != 'xlsx':
+                yield from iter_export(export_format, chunks)
+                return
+            summary_sheets = pipeline_summary_sheets(engine, filters) if summary else None
+            extra_sheets = joined_sheets(engine, sheets, filters) if sheets else None
+            workbook = load_template_workbook(TEMPLATE_PATH).stream(chunks, summary_sheets, extra_sheets)
+            yield from _closing_sheets(workbook, extra_sheets)
+
+    try:
+        job = export_jobs.submit(
+            x_user_id, build,
+            filename=f"pipeline_{'template' if export_format == 'xlsx' else 'deals'}.{extension}",
+            media_type=media_type,
+            total_rows=count_deals(filters),
+            options={'export_format': export_format, 'summary': summary, 'sheets': sheets,
+                     **filters.cache_options()},
+        )
+    except JobLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return _export_job_status(job)
+
+@app.get("/export-jobs")
+def list_export_jobs(x_user_id: str = Depends(job_user)):
+    """The caller's export jobs, newest first"""
+    return {"jobs": [_export_job_status(job) for job in export_jobs.list(x_user_id)]}
+
+@app.get("/export-jobs/{job_id}")
+def export_job_status(job_id: str, x_user_id: str = Depends(job_user)):
+    # Other users' jobs are reported as missing, not forbidden
+    job = export_jobs.get(job_id, x_user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found or expired")
+    return _export_job_status(job)
+
+@app.get("/export-jobs/{job_id}/download")
+def download_export_job(job_id: str, x_user_id: str = Depends(job_user)):
+    job = export_jobs.start_download(job_id, x_user_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found or expired")
+    if job.status == 'failed':
+        raise HTTPException(status_code=500, detail=f"Export failed: {job.error}")
+    if job.status != 'done':
+        raise HTTPException(status_code=409, detail=f"Export is {job.status}")
+    # The file is kept past its TTL until the response has been sent
+    return FileResponse(job.path, media_type=job.media_type, filename=job.filename,
+                        background=BackgroundTask(export_jobs.finish_download, job))
@@ -0,0 +1,483 @@
+#!/usr/bin/env python3
+"""
+Priority scheduling of render and export jobs
+
+Jobs belong to one of two classes. Interactive jobs (a user waiting on a
+single deck or export) start before batch jobs (bulk generation,
+background exports); after SCHEDULER_INTERACTIVE_BURST interactive starts in
+a row one waiting batch job goes next, so batch work is slowed but never
+starved. Within a class, tenants (users, or companies with
+SCHEDULER_FAIRNESS=company) share the slots by weighted fair queuing: each
+job is tagged with a virtual finish time of its tenant's previous finish
+plus its predicted cost divided by the tenant's weight, and the smallest tag
+starts first. A tenant with many queued jobs therefore cannot push another
+tenant's single job to the back.
+
+Predicted costs come from a model learned from finished jobs: per key
+(template or export format) a decayed least-squares fit of seconds against
+job size (slides or rows), falling back to a fit over all keys for keys not
+seen yet. A job of unknown size is predicted at the average time of its
+key. A job whose predicted wait plus run time exceeds its deadline is
+rejected up front (503 with Retry-After) instead of timing out later, and a
+queued job is dropped once it can no longer start in time. A job is never
+rejected when nothing else is running or queued.
+
+The scheduler orders and limits jobs within one process; memory admission
+(admission.py) still applies to renders once they start.
+
+Environment:
+    SCHEDULER_SLOTS: Jobs running at the same time (default 4, 0 disables queuing)
+    SCHEDULER_MAX_QUEUE: Jobs allowed to wait before new ones get 429 (default 32)
+    SCHEDULER_INTERACTIVE_DEADLINE_SECONDS: Default deadline of interactive jobs (default 30)
+    SCHEDULER_BATCH_DEADLINE_SECONDS: Default deadline of batch jobs (default 0, none)
+    SCHEDULER_INTERACTIVE_BURST: Interactive starts in a row while batch jobs wait (default 8)
+    SCHEDULER_FAIRNESS: 'user' (X-User-Id, default) or 'company' (X-Company-Id)
+    SCHEDULER_TENANT_WEIGHTS: Fair-share weights, e.g. 'acme=2,globex=0.5' (default 1 each)
+    SCHEDULER_COST_DECAY: Weight kept by older samples per new sample (default 0.9)
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from fastapi import Header, HTTPException
+
+from admission import AdmissionRejected
+
+INTERACTIVE = 'interactive'
+BATCH = 'batch'
+PRIORITIES = (INTERACTIVE, BATCH)
+
+SCHEDULER_FAIRNESS = os.getenv('SCHEDULER_FAIRNESS', 'user').lower()
+
+
+class JobOptions(NamedTuple):
+    """Scheduling options of a request."""
+    tenant: str
+    # None -> the endpoint's default class
+    priority: Optional[str] = None
+    # None -> the class's default deadline
+    deadline_seconds: Optional[float] = None
+
+
+def scheduling_options(
+    x_job_priority: Optional[str] = Header(None, description="interactive or batch"),
+    x_deadline_seconds: Optional[float] = Header(None, description="Seconds the caller is willing to wait"),
+    x_user_id: str = Header('anonymous'),
+    x_company_id: Optional[str] = Header(None),
+) -> JobOptions:
+    """FastAPI dependency reading a request's scheduling options from its headers."""
+    priority = x_job_priority.strip().lower() if x_job_priority else None
+    if priority is not None and priority not in PRIORITIES:
+        raise HTTPException(status_code=400, detail=f"Unknown X-Job-Priority '{x_job_priority}'; "
+                                                    f"use {' or '.join(PRIORITIES)}")
+    if x_deadline_seconds is not None and x_deadline_seconds <= 0:
+        raise HTTPException(status_code=400, detail="X-Deadline-Seconds must be positive")
+    tenant = x_company_id if SCHEDULER_FAIRNESS == 'company' and x_company_id else x_user_id
+    return JobOptions(tenant, priority, x_deadline_seconds)
+
+
+class _Fit:
+    """Exponentially decayed sums for a least-squares fit of seconds against size."""
+
+    __slots__ = ('weight', 'sx', 'sy', 'sxx', 'sxy', 'samples')
+
+    def __init__(self):
+        self.weight = self.sx = self.sy = self.sxx = self.sxy = 0.0
+        self.samples = 0
+
+    def add(self, x: float, y: float, decay: float):
+        self.weight = self.weight * decay + 1
+        self.sx = self.sx * decay + x
+        self.sy = self.sy * decay + y
+        self.sxx = self.sxx * decay + x * x
+        self.sxy = self.sxy * decay + x * y
+        self.samples += 1
+
+    def predict(self, x: Optional[float]) -> float:
+        mean_x, mean_y = self.sx / self.weight, self.sy / self.weight
+        if x is None:
+            return mean_y
+        variance = self.sxx / self.weight - mean_x * mean_x
+        if variance > 1e-9 * max(1.0, mean_x * mean_x):
+            slope = (self.sxy / self.weight - mean_x * mean_y) / variance
+            if slope >= 0:
+                # Fixed cost (template parsing) plus a cost per slide or row
+                return max(0.0, mean_y + slope * (x - mean_x))
+            # Noise made larger jobs look cheaper; use the average
+            return mean_y
+        # Only one size seen so far: scale its time by size
+        return mean_y * x / mean_x if mean_x > 0 else mean_y
+
+
+class CostModel:
+    """Predicts job seconds per key from past run times and job sizes."""
+
+    def __init__(self, decay: float = 0.9, default_seconds: float = 1.0, max_keys: int = 1024):
+        """
+        Args:
+            decay: Weight kept by older samples each time a sample is added
+            default_seconds: Prediction before any job has finished
+            max_keys: Keys remembered; the least recently updated are forgotten
+        """
+        self.decay = decay
+        self.default_seconds = default_seconds
+        self.max_keys = max_keys
+        self._fits: 'OrderedDict[str, _Fit]' = OrderedDict()
+        # Fit over every key, for keys without samples
+        self._overall = _Fit()
+        self._lock = threading.Lock()
+
+    def predict(self, key: str, size: Optional[int]) -> float:
+        """Predicted seconds of a job of `size` slides or rows (None: not known yet)."""
+        with self._lock:
+            fit = self._fits.get(key)
+            if fit is None:
+                fit = self._overall if self._overall.samples else None
+            return fit.predict(size) if fit is not None else self.default_seconds
+
+    def observe(self, key: str, size: int, seconds: float):
+        """Add the run time of a finished job."""
+        with self._lock:
+            fit = self._fits.pop(key, None) or _Fit()
+            fit.add(size, seconds, self.decay)
+            self._fits[key] = fit
+            while len(self._fits) > self.max_keys:
+                self._fits.popitem(last=False)
+            self._overall.add(size, seconds, self.decay)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'keys': len(self._fits), 'samples': self._overall.samples}
+
+
+_job_ids = itertools.count(1)
+
+
+class ScheduledJob:
+    """A job with its predicted cost, deadline and fair-queuing tags."""
+
+    def __init__(self, tenant: str, priority: str, cost_key: str, size: Optional[int],
+                 predicted_seconds: float, deadline: Optional[float], weight: float):
+        self.id = next(_job_ids)
+        self.tenant = tenant
+        self.priority = priority
+        self.cost_key = cost_key
+        self.size = size
+        self.predicted_seconds = predicted_seconds
+        # time.monotonic() by which the job should be done, or None
+        self.deadline = deadline
+        self.weight = weight
+        self.state = 'new'
+        self.start_tag = 0.0
+        self.finish_tag = 0.0
+        self.started_at: Optional[float] = None
+        self._grant: Optional[Callable[[], None]] = None
+
+
+class JobScheduler:
+    """
+    Starts jobs on a fixed number of slots in priority, fair-share order.
+
+    Usable from the event loop (`run`) and from threads (`run_blocking`).
+    """
+
+    def __init__(self, slots: int = 4, max_queue: int = 32, interactive_deadline: Optional[float] = 30.0,
+                 batch_deadline: Optional[float] = None, interactive_burst: int = 8,
+                 cost_model: Optional[CostModel] = None, tenant_weights: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            slots: Jobs running at the same time (0 or less: no limit, nothing queues)
+            max_queue: Jobs allowed to wait before new ones get 429
+            interactive_deadline: Default deadline of interactive jobs in seconds (None: no deadline)
+            batch_deadline: Default deadline of batch jobs in seconds (None: no deadline)
+            interactive_burst: Interactive starts in a row while batch jobs wait
+            cost_model: Run time predictions (a fresh model by default)
+            tenant_weights: Fair-share weight per tenant (default 1)
+        """
+        self.slots = slots
+        self.max_queue = max_queue
+        self.deadlines = {INTERACTIVE: interactive_deadline, BATCH: batch_deadline}
+        self.interactive_burst = max(1, interactive_burst)
+        self.cost_model = cost_model or CostModel()
+        self.tenant_weights = tenant_weights or {}
+
+        self._lock = threading.Lock()
+        # Per class: heap of (finish tag, job id, job); withdrawn jobs are skipped when popped
+        self._queues: Dict[str, List[Tuple[float, int, ScheduledJob]]] = {p: [] for p in PRIORITIES}
+        self._queued = {p: 0 for p in PRIORITIES}
+        self._virtual_time = {p: 0.0 for p in PRIORITIES}
+        self._tenant_finish: Dict[str, Dict[str, float]] = {p: {} for p in PRIORITIES}
+        self._running: Dict[int, ScheduledJob] = {}
+        self._interactive_streak = 0
+        self._started_total = {p: 0 for p in PRIORITIES}
+        self._rejected_full = 0
+        self._rejected_deadline = 0
+
+    @classmethod
+    def from_env(cls) -> 'JobScheduler':
+        """Build a scheduler from SCHEDULER_* environment variables."""
+        interactive_deadline = float(os.getenv('SCHEDULER_INTERACTIVE_DEADLINE_SECONDS', '30'))
+        batch_deadline = float(os.getenv('SCHEDULER_BATCH_DEADLINE_SECONDS', '0'))
+        return cls(
+            slots=int(os.getenv('SCHEDULER_SLOTS', '4')),
+            max_queue=int(os.getenv('SCHEDULER_MAX_QUEUE', '32')),
+            interactive_deadline=interactive_deadline if interactive_deadline > 0 else None,
+            batch_deadline=batch_deadline if batch_deadline > 0 else None,
+            interactive_burst=int(os.getenv('SCHEDULER_INTERACTIVE_BURST', '8')),
+            cost_model=CostModel(decay=float(os.getenv('SCHEDULER_COST_DECAY', '0.9'))),
+            tenant_weights=_parse_weights(os.getenv('SCHEDULER_TENANT_WEIGHTS', '')),
+        )
+
+    def job(self, options: JobOptions, cost_key: str, size: Optional[int],
+            default_priority: str = INTERACTIVE) -> ScheduledJob:
+        """
+        Describe a job and predict its cost.
+
+        Args:
+            options: The request's scheduling options
+            cost_key: What the cost model learns per, e.g. 'render:<template id>'
+            size: Slides or rows; the cost model's input. None when not known
+                before the job runs; set job.size by release() to teach the model.
+            default_priority: Class used when the request does not name one
+        """
+        priority = options.priority or default_priority
+        deadline_seconds = options.deadline_seconds or self.deadlines[priority]
+        deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        return ScheduledJob(options.tenant, priority, cost_key, size,
+                            self.cost_model.predict(cost_key, size), deadline,
+                            self.tenant_weights.get(options.tenant, 1.0))
+
+    def _free_slot(self) -> bool:
+        return self.slots <= 0 or len(self._running) < self.slots
+
+    def _start(self, job: ScheduledJob):
+        job.state = 'running'
+        job.started_at = time.monotonic()
+        self._running[job.id] = job
+        self._started_total[job.priority] += 1
+
+    def _predicted_wait(self, job: ScheduledJob, now: float) -> float:
+        """Seconds until `job` would start: work running now and queued ahead of it, spread over the slots."""
+        ahead = sum(max(0.0, running.predicted_seconds - (now - running.started_at))
+                    for running in self._running.values())
+        for priority in PRIORITIES:
+            for finish_tag, _, queued in self._queues[priority]:
+                if queued.state != 'queued':
+                    continue
+                if priority != job.priority or finish_tag <= job.finish_tag:
+                    ahead += queued.predicted_seconds
+            if priority == job.priority:
+                break
+        return ahead / max(1, self.slots)
+
+    def _rejection(self, status_code: int, detail: str, wait: float) -> AdmissionRejected:
+        return AdmissionRejected(status_code, detail, max(1, math.ceil(wait)))
+
+    def _enqueue(self, job: ScheduledJob) -> Tuple[bool, Optional[float]]:
+        """
+        Start `job` now or queue it.
+
+        Returns:
+            (started, seconds the job may wait before it can no longer meet its deadline)
+
+        Raises:
+            AdmissionRejected: Queue full (429) or the deadline cannot be met (503)
+        """
+        now = time.monotonic()
+        with self._lock:
+            queued_total = sum(self._queued.values())
+            if self._free_slot() and not queued_total:
+                self._start(job)
+                return True, None
+            if queued_total >= self.max_queue:
+                self._rejected_full += 1
+                raise self._rejection(429, "Job queue is full", self._predicted_wait(job, now))
+
+            tenant_finish = self._tenant_finish[job.priority]
+            job.start_tag = max(self._virtual_time[job.priority], tenant_finish.get(job.tenant, 0.0))
+            # Every job advances its tenant's clock, even one predicted to be instant
+            job.finish_tag = job.start_tag + max(job.predicted_seconds, 1e-3) / job.weight
+            wait = self._predicted_wait(job, now)
+            if job.deadline is not None and now + wait + job.predicted_seconds > job.deadline:
+                self._rejected_deadline += 1
+                raise self._rejection(
+                    503, f"Cannot finish within the deadline (predicted wait {wait:.1f}s, "
+                         f"run {job.predicted_seconds:.1f}s)", wait)
+
+            tenant_finish[job.tenant] = job.finish_tag
+            job.state = 'queued'
+            heapq.heappush(self._queues[job.priority], (job.finish_tag, job.id, job))
+            self._queued[job.priority] += 1
+        if job.deadline is None:
+            return False, None
+        return False, max(0.0, job.deadline - job.predicted_seconds - now)
+
+    def _withdraw(self, job: ScheduledJob) -> bool:
+        """Take a queued job out of the queue; False if it was started meanwhile."""
+        with self._lock:
+            if job.state != 'queued':
+                return False
+            job.state = 'withdrawn'
+            self._queued[job.priority] -= 1
+            tenant_finish = self._tenant_finish[job.priority]
+            # Give the tenant back the share of a job that never ran
+            if tenant_finish.get(job.tenant) == job.finish_tag:
+                tenant_finish[job.tenant] = job.start_tag
+            return True
+
+    def _pop(self, priority: str) -> ScheduledJob:
+        queue = self._queues[priority]
+        while True:
+            _, _, job = heapq.heappop(queue)
+            if job.state == 'queued':
+                self._queued[priority] -= 1
+                return job
+
+    def _dispatch(self):
+        """Start queued jobs while slots are free. Called with the lock held."""
+        while self._free_slot() and any(self._queued.values()):
+            batch_waiting = self._queued[BATCH] > 0
+            if self._queued[INTERACTIVE] and not (batch_waiting and
+                                                   self._interactive_streak >= self.interactive_burst):
+                job = self._pop(INTERACTIVE)
+                self._interactive_streak = self._interactive_streak + 1 if batch_waiting else 0
+            else:
+                job = self._pop(BATCH)
+                self._interactive_streak = 0
+
+            # Tenants whose last finish tag is behind the class clock are level with a new tenant
+            self._virtual_time[job.priority] = job.finish_tag
+            tenant_finish = self._tenant_finish[job.priority]
+            for tenant in [t for t, finish in tenant_finish.items() if finish <= job.finish_tag]:
+                del tenant_finish[tenant]
+
+            self._start(job)
+            job._grant()
+
+    async def acquire(self, job: ScheduledJob):
+        """
+        Wait on the event loop until `job` may start.
+
+        Raises:
+            AdmissionRejected: Queue full (429) or the deadline cannot be met (503)
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        job._grant = lambda: loop.call_soon_threadsafe(_grant, future)
+        started, wait_limit = self._enqueue(job)
+        if started:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=wait_limit)
+        except asyncio.TimeoutError:
+            if not self._withdraw(job):
+                # Started just as the timeout fired; keep the slot
+                return
+            self._count_late()
+            raise self._rejection(503, "Could not start in time to meet the deadline", job.predicted_seconds)
+        except asyncio.CancelledError:
+            # Client went away while queued; give back the slot if it was granted
+            if not self._withdraw(job):
+                self.release(job, observe=False)
+            raise
+
+    def acquire_blocking(self, job: ScheduledJob):
+        """Wait on the calling thread until `job` may start; raises like `acquire`."""
+        granted = threading.Event()
+        job._grant = granted.set
+        started, wait_limit = self._enqueue(job)
+        if started or granted.wait(wait_limit):
+            return
+        if self._withdraw(job):
+            self._count_late()
+            raise self._rejection(503, "Could not start in time to meet the deadline", job.predicted_seconds)
+
+    def _count_late(self):
+        with self._lock:
+            self._rejected_deadline += 1
+
+    def release(self, job: ScheduledJob, observe: bool = True):
+        """
+        Free a started job's slot and start queued jobs. Safe to call from any thread.
+
+        Args:
+            observe: Teach the cost model the job's run time (False for failed or abandoned jobs)
+        """
+        duration = time.monotonic() - job.started_at
+        with self._lock:
+            if self._running.pop(job.id, None) is None:
+                return
+            job.state = 'done'
+            self._dispatch()
+        if observe and job.size is not None:
+            self.cost_model.observe(job.cost_key, job.size, duration)
+
+    @asynccontextmanager
+    async def run(self, job: ScheduledJob):
+        """Hold a slot for `job` for the duration of the block."""
+        await self.acquire(job)
+        try:
+            yield job
+        except BaseException:
+            self.release(job, observe=False)
+            raise
+        self.release(job)
+
+    @contextmanager
+    def run_blocking(self, job: ScheduledJob):
+        """`run` for threads."""
+        self.acquire_blocking(job)
+        try:
+            yield job
+        except BaseException:
+            self.release(job, observe=False)
+            raise
+        self.release(job)
+
+    def release_after(self, job: ScheduledJob, chunks: Iterable) -> Iterator:
+        """Yield `chunks` of a started job, then free its slot however the stream ends."""
+        completed = False
+        try:
+            yield from chunks
+            completed = True
+        finally:
+            self.release(job, observe=completed)
+
+    def status(self) -> Dict[str, Any]:
+        """Slots in use, queue depth per class and rejection counts."""
+        with self._lock:
+            return {
+                'slots': self.slots,
+                'running': len(self._running),
+                'running_by_priority': {p: sum(1 for job in self._running.values() if job.priority == p)
+                                        for p in PRIORITIES},
+                'queued': dict(self._queued),
+                'max_queue': self.max_queue,
+                'started_total': dict(self._started_total),
+                'rejected_queue_full': self._rejected_full,
+                'rejected_deadline': self._rejected_deadline,
+                'deadlines': self.deadlines,
+                'cost_model': self.cost_model.stats(),
+            }
+
+
+def _parse_weights(value: str) -> Dict[str, float]:
+    weights = {}
+    for item in value.split(','):
+        tenant, _, weight = item.partition('=')
+        if tenant.strip() and weight.strip():
+            weights[tenant.strip()] = float(weight)
+    return weights
+
+
+def _grant(future: asyncio.Future):
+    if not future.done():
+        future.set_result(True)
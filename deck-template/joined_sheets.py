@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Joined sheets for the pipeline export
+
+The Deals sheet carries raw ids (company_id, ae_assigned, sales_manager), so
+exports are usually followed by VLOOKUPs against other files. The sheets
+here resolve those ids in the database: companies of the exported deals,
+their products, their recent activities and the names of their AE and sales
+manager. Each sheet is one set-based query that joins the exported deals
+(the export's filters, as a CTE) to the related table; there are no per-deal
+lookups. The queries run one after another on a single pooled connection and
+are streamed into the workbook in chunks like the Deals sheet.
+
+Environment:
+    EXPORT_ACTIVITY_DAYS: Age limit of the activities in the Activities sheet (default 90)
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+from fastapi import HTTPException, Query
+
+from deal_filters import DealFilters
+from deal_reader import EXPORT_CHUNK_ROWS, iter_connection_chunks
+
+EXPORT_ACTIVITY_DAYS = int(os.getenv("EXPORT_ACTIVITY_DAYS", "90"))
+
+_EXPORTED_DEALS = "WITH exported AS (SELECT id, deal_name, company_id, ae_assigned, sales_manager FROM deals{where})\n"
+
+# name -> (sheet name, header, query joining `exported` to the related tables)
+JOINED_SHEETS: Dict[str, Tuple[str, List[str], str]] = {
+    'companies': (
+        'Companies',
+        ['Company ID', 'Company', 'Industry', 'Company Size', 'Region', 'Priority', 'Deals'],
+        """
+        SELECT c.id, c.name, c.industry, c.company_size, c.region, c.priority, COUNT(*) AS deal_count
+        FROM exported d
+        JOIN companies c ON c.id = d.company_id
+        GROUP BY c.id, c.name, c.industry, c.company_size, c.region, c.priority
+        ORDER BY c.name, c.id
+        """,
+    ),
+    'products': (
+        'Deal Products',
+        ['Deal ID', 'Deal', 'Product ID', 'Product', 'Category', 'Estimated Value', 'Fit Score',
+         'ROI %', 'Implementation Months'],
+        """
+        SELECT d.id, d.deal_name, dp.product_id, p.product_name, p.category, dp.estimated_value,
+               dp.fit_score, dp.roi_percentage, dp.implementation_months
+        FROM exported d
+        JOIN deal_products dp ON dp.deal_id = d.id
+        LEFT JOIN sap_products p ON p.id = dp.product_id
+        ORDER BY d.id, dp.product_id
+        """,
+    ),
+    'activities': (
+        'Activities',
+        ['Deal ID', 'Deal', 'Date', 'Type', 'Subject', 'Outcome', 'Duration (min)', 'User', 'Next Steps'],
+        """
+        SELECT d.id, d.deal_name, a.activity_date, a.activity_type, a.subject, a.outcome,
+               a.duration_minutes, u.name, a.next_steps
+        FROM exported d
+        JOIN activities a ON a.deal_id = d.id
+        LEFT JOIN users u ON u.id = a.user_id
+        WHERE a.activity_date >= :activities_since
+        ORDER BY d.id, a.activity_date DESC
+        """,
+    ),
+    'owners': (
+        'Deal Owners',
+        ['Deal ID', 'Deal', 'Company', 'AE', 'AE Email', 'Sales Manager', 'Sales Manager Email'],
+        """
+        SELECT d.id, d.deal_name, c.name, ae.name, ae.email, sm.name, sm.email
+        FROM exported d
+        LEFT JOIN companies c ON c.id = d.company_id
+        LEFT JOIN users ae ON ae.id = d.ae_assigned
+        LEFT JOIN users sm ON sm.id = d.sales_manager
+        ORDER BY d.id
+        """,
+    ),
+}
+
+# (sheet name, header, DataFrame chunks)
+JoinedSheet = Tuple[str, List[str], Iterator[pd.DataFrame]]
+
+
+class _SharedConnection:
+    """One pooled connection, checked out on first use and returned after the last sheet."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.conn = None
+
+    def chunks(self, query: str, params: Dict[str, Any], last: bool,
+               batch_size: int = EXPORT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+        if self.conn is None:
+            self.conn = self.engine.connect()
+        try:
+            yield from iter_connection_chunks(self.conn, query, params, batch_size)
+        except BaseException:
+            # Failed or abandoned export: later sheets will not run
+            self.close()
+            raise
+        if last:
+            self.close()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+def joined_sheets(engine, names: List[str], filters: Optional[DealFilters] = None,
+                  activity_days: int = EXPORT_ACTIVITY_DAYS) -> List[JoinedSheet]:
+    """
+    Joined sheets for an export, in JOINED_SHEETS order.
+
+    Queries run lazily, as the workbook writer reaches each sheet.
+
+    Args:
+        engine: SQLAlchemy engine
+        names: Keys of JOINED_SHEETS to include
+        filters: The export's filters, applied to the deals every sheet is joined to
+        activity_days: Activities older than this are left out
+    """
+    where, params = (filters or DealFilters()).where()
+    params = {**params, 'activities_since': datetime.now() - timedelta(days=activity_days)}
+    selected = [name for name in JOINED_SHEETS if name in names]
+    connection = _SharedConnection(engine)
+    sheets = []
+    for i, name in enumerate(selected):
+        sheet_name, header, query = JOINED_SHEETS[name]
+        sql = _EXPORTED_DEALS.format(where=where) + query
+        sheets.append((sheet_name, header, connection.chunks(sql, params, last=i == len(selected) - 1)))
+    return sheets
+
+
+def close_joined_sheets(sheets: Optional[List[JoinedSheet]]):
+    """
+    Stop the sheets' queries and return their connection.
+
+    For exports that end before the last sheet was written (an error, or a
+    client that disconnected); sheets not started yet hold nothing.
+    """
+    for _, _, chunks in sheets or []:
+        chunks.close()
+
+
+def joined_sheet_names(
+    sheets: Optional[List[str]] = Query(None, description="Joined sheet(s) to add: " + ', '.join(JOINED_SHEETS)),
+) -> List[str]:
+    """FastAPI dependency reading the requested joined sheets from the query string."""
+    names = [name for name in (sheets or []) if name]
+    unknown = [name for name in names if name not in JOINED_SHEETS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sheet(s) {', '.join(unknown)}; "
+                                                    f"use {', '.join(JOINED_SHEETS)}")
+    return names
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Parallel slide construction for large decks
+
+Slides are filled on a pool of worker processes. The parent picks every
+slide's layout (layout choice depends on the slide's position), splits the
+deck into contiguous ranges and sends each range to a worker. Each worker
+opens the same template, renders its slides and returns their XML. The
+parent then attaches the XML to one package in deck order.
+
+Environment:
+    RENDER_PARALLEL_THRESHOLD: Decks with at least this many slides to render
+        are built in parallel (default 200, 0 disables)
+    RENDER_WORKERS: Worker processes (default: CPU count; 1 disables)
+    RENDER_WORKER_TIMEOUT_SECONDS: Longest wait for one range (default 120)
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional, Tuple
+
+from structured_logging import log_event
+
+logger = logging.getLogger(__name__)
+
+PARALLEL_THRESHOLD = int(os.getenv('RENDER_PARALLEL_THRESHOLD', '200'))
+WORKER_COUNT = int(os.getenv('RENDER_WORKERS', str(os.cpu_count() or 1)))
+WORKER_TIMEOUT = float(os.getenv('RENDER_WORKER_TIMEOUT_SECONDS', '120'))
+
+# (slide index, layout index, slide data)
+SlideJob = Tuple[int, int, Dict[str, Any]]
+# (slide index, slide XML or None if it must be rendered in the parent, fill passes)
+RenderedSlide = Tuple[int, Optional[bytes], Dict[str, Optional[str]]]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def should_render_in_parallel(slide_count: int) -> bool:
+    """Whether a deck with `slide_count` slides to render is worth splitting."""
+    return WORKER_COUNT > 1 and 0 < PARALLEL_THRESHOLD <= slide_count
+
+
+def workers_for(slide_count: int) -> int:
+    """
+    Worker processes a deck with `slide_count` slides to render keeps busy.
+
+    Each of them parses its own copy of the template, so admission control
+    counts that memory on top of the parent's render.
+
+    Returns:
+        0 when the deck is rendered in the parent only
+    """
+    if not should_render_in_parallel(slide_count):
+        return 0
+    return min(WORKER_COUNT, slide_count)
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Worker pool shared by all requests, started on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned workers do not inherit the server's threads or locks
+            _pool = ProcessPoolExecutor(max_workers=WORKER_COUNT,
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the worker pool (it is restarted on next use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def _discard_pool(pool: ProcessPoolExecutor, terminate: bool = False):
+    """
+    Stop using a broken or hung pool; the next request starts a new one.
+
+    Args:
+        terminate: Also kill its worker processes (a hung worker never exits by itself)
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    if terminate:
+        for process in list((getattr(pool, '_processes', None) or {}).values()):
+            process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def render_slide_range(template_path: str, jobs: List[SlideJob]) -> List[RenderedSlide]:
+    """
+    Render a range of slides from a template. Runs in a worker process.
+
+    Args:
+        template_path: Template file shared with the parent
+        jobs: Slides to render with their already chosen layouts
+
+    Returns:
+        One entry per job, in the same order
+    """
+    from pptx import Presentation
+    from template_handler import TemplateHandler
+
+    handler = TemplateHandler(template_path, slide_cache=None)
+    handler.presentation = Presentation(template_path)
+
+    rendered = []
+    for index, layout_index, slide_data in jobs:
+        slide = handler.presentation.slides.add_slide(handler.presentation.slide_layouts[layout_index])
+        fill = handler._fill_slide_content(slide, slide_data)
+        # Slides with relationships besides their layout cannot be moved between packages
+        blob = slide.part.blob if len(slide.part.rels) == 1 else None
+        rendered.append((index, blob, fill))
+    return rendered
+
+
+def _split(jobs: List[SlideJob], parts: int) -> List[List[SlideJob]]:
+    """Split jobs into `parts` contiguous ranges of near-equal size."""
+    size, remainder = divmod(len(jobs), parts)
+    ranges, start = [], 0
+    for part in range(parts):
+        end = start + size + (1 if part < remainder else 0)
+        if end > start:
+            ranges.append(jobs[start:end])
+        start = end
+    return ranges
+
+
+def render_slides_parallel(template_path: str, jobs: List[SlideJob]) -> Dict[int, RenderedSlide]:
+    """
+    Render slides across the worker pool.
+
+    A range whose worker fails is left out of the result, so the caller
+    renders those slides itself. If the pool itself breaks (a worker died)
+    or a range outlasts RENDER_WORKER_TIMEOUT_SECONDS, the pool is replaced
+    for later requests and nothing is returned, so the caller renders every
+    slide.
+
+    Returns:
+        Rendered slides keyed by slide index
+    """
+    pool = _get_pool()
+    rendered = {}
+    try:
+        futures = [pool.submit(render_slide_range, template_path, chunk)
+                   for chunk in _split(jobs, WORKER_COUNT)]
+        for future in futures:
+            try:
+                for entry in future.result(timeout=WORKER_TIMEOUT):
+                    rendered[entry[0]] = entry
+            except (BrokenProcessPool, FutureTimeoutError):
+                raise
+            except Exception as e:
+                log_event(logger, logging.WARNING, 'parallel_render_range_failed', error=str(e))
+    except (BrokenProcessPool, FutureTimeoutError, RuntimeError) as e:
+        # RuntimeError: the pool was shut down by another request that found it broken
+        log_event(logger, logging.WARNING, 'parallel_render_pool_failed',
+                  error=str(e) or type(e).__name__)
+        _discard_pool(pool, terminate=isinstance(e, FutureTimeoutError))
+        return {}
+    return rendered
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Data-bound pipeline slides
+
+Slides of the types in DATA_SLIDE_TYPES are filled from `deals` on the
+server, so the frontend no longer queries deals and formats the numbers
+into `content` itself. All data slides of a deck are served by one query:
+the deck's deals are selected once (as a CTE) and every requested grouping,
+plus the top deals, is read from them in a single UNION ALL statement. The
+results are bound into the slide payloads as a `table` (and a `chart` for
+groupings), which TemplateHandler draws as a native table and bar chart in
+the slide's body placeholder, below the slide's own text if it has any.
+Because the bound rows are part of the payload, the slide and deck caches
+pick up changed data on their own.
+
+Slide options (SlideData.data):
+    limit: Rows shown (default 10); groupings beyond it are folded into "Other"
+
+Deck filters (deck_config.pipelineFilters) take the fields of DealFilters,
+e.g. {"company_id": 12, "stage": ["Proposal", "Negotiation"]}.
+"""
+
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from pptx.chart.data import CategoryChartData
+from pptx.enum.chart import XL_CHART_TYPE, XL_LEGEND_POSITION
+from pptx.enum.text import MSO_AUTO_SIZE
+from pptx.util import Pt
+
+from deal_filters import DealFilters
+
+# slide type -> (deals column, heading); None is the top deals list
+DATA_SLIDE_TYPES: Dict[str, Tuple[Optional[str], Optional[str]]] = {
+    'pipeline_by_stage': ('stage', 'Stage'),
+    'pipeline_by_ae': ('ae_assigned', 'AE'),
+    'pipeline_by_sales_manager': ('sales_manager', 'Sales Manager'),
+    'pipeline_by_lead_source': ('lead_source', 'Lead Source'),
+    'top_deals': (None, None),
+}
+
+DEFAULT_ROW_LIMIT = 10
+MAX_ROW_LIMIT = 50
+OTHER_LABEL = 'Other'
+BLANK_LABEL = '(blank)'
+TOTAL_LABEL = 'Total'
+TABLE_FONT_SIZE = Pt(11)
+# Height per line of body text kept as a caption above the data
+CAPTION_LINE_HEIGHT = Pt(24)
+
+# Columns read by the deck query, so every grouping comes from one pass over deals
+_SCOPED_DEALS = """
+WITH scoped AS (
+    SELECT deal_name, stage, deal_value, COALESCE(probability, 0) AS probability,
+           expected_close_date, ae_assigned, sales_manager, lead_source
+    FROM deals{where}
+)"""
+
+# User id columns are labelled with the user's name
+_USER_COLUMNS = {'ae_assigned', 'sales_manager'}
+
+_MEASURES = """COUNT(*) AS deal_count,
+       COALESCE(SUM(s.deal_value), 0) AS pipeline_value,
+       COALESCE(SUM(s.deal_value * s.probability / 100.0), 0) AS weighted_value,
+       CAST(NULL AS VARCHAR(50)) AS stage, CAST(NULL AS INTEGER) AS probability,
+       CAST(NULL AS DATE) AS expected_close_date"""
+
+
+def is_data_slide(slide_data: Dict[str, Any]) -> bool:
+    return slide_data.get('type') in DATA_SLIDE_TYPES
+
+
+def deck_filters(deck_config: Dict[str, Any]) -> DealFilters:
+    """DealFilters from a deck's `pipelineFilters`; unknown keys are ignored."""
+    config = deck_config.get('pipelineFilters') or {}
+    values: Dict[str, Any] = {}
+    for name in DealFilters.__dataclass_fields__:
+        value = config.get(name)
+        if value in (None, '', []):
+            continue
+        if name == 'stage':
+            value = [value] if isinstance(value, str) else list(value)
+        elif name in ('expected_close_from', 'expected_close_to'):
+            value = date.fromisoformat(value)
+        elif name == 'updated_since':
+            value = datetime.fromisoformat(value)
+        else:
+            value = int(value)
+        values[name] = value
+    return DealFilters(**values)
+
+
+def _row_limit(slide_data: Dict[str, Any]) -> int:
+    limit = (slide_data.get('data') or {}).get('limit', DEFAULT_ROW_LIMIT)
+    return max(1, min(int(limit), MAX_ROW_LIMIT))
+
+
+def deck_query(columns: List[str], top_deals: int, filters: DealFilters) -> Tuple[str, List[Any]]:
+    """
+    The one query serving a deck's data slides.
+
+    Args:
+        columns: Deals columns to group by
+        top_deals: Number of top deals by value to include (0 for none)
+        filters: Deals the deck covers
+
+    Returns:
+        Tuple of (SQL with %s placeholders, parameters)
+    """
+    # DB-API connections here take %s placeholders
+    where, values = filters.where(paramstyle='format')
+    sql = _SCOPED_DEALS.format(where=where)
+
+    selects = []
+    for column in columns:
+        if column in _USER_COLUMNS:
+            selects.append(f"""
+SELECT '{column}' AS dimension, CAST(s.{column} AS VARCHAR(255)) AS group_key, MAX(u.name) AS label,
+       {_MEASURES}
+FROM scoped s LEFT JOIN users u ON u.id = s.{column}
+GROUP BY s.{column}""")
+        else:
+            selects.append(f"""
+SELECT '{column}' AS dimension, CAST(s.{column} AS VARCHAR(255)) AS group_key,
+       CAST(s.{column} AS VARCHAR(255)) AS label,
+       {_MEASURES}
+FROM scoped s
+GROUP BY s.{column}""")
+    if top_deals:
+        selects.append("""
+SELECT 'top_deals' AS dimension, NULL AS group_key, t.deal_name AS label, 1 AS deal_count,
+       t.deal_value AS pipeline_value, t.deal_value * t.probability / 100.0 AS weighted_value,
+       t.stage, t.probability, t.expected_close_date
+FROM (SELECT * FROM scoped WHERE deal_value IS NOT NULL ORDER BY deal_value DESC LIMIT %s) t""")
+        values.append(top_deals)
+    return sql + '\nUNION ALL'.join(selects), values
+
+
+def fetch_deck_data(conn, slides_data: List[Dict[str, Any]],
+                    filters: Optional[DealFilters] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Run the deck query for the data slides in `slides_data`.
+
+    Args:
+        conn: psycopg2 connection (or compatible)
+        slides_data: The deck's slide payloads
+        filters: Deals the deck covers
+
+    Returns:
+        Dimension column (or 'top_deals') -> rows, in query order
+    """
+    data_slides = [slide for slide in slides_data if is_data_slide(slide)]
+    columns = []
+    for slide in data_slides:
+        column = DATA_SLIDE_TYPES[slide['type']][0]
+        if column and column not in columns:
+            columns.append(column)
+    top_deals = max((_row_limit(slide) for slide in data_slides if slide['type'] == 'top_deals'), default=0)
+    if not columns and not top_deals:
+        return {}
+
+    sql, params = deck_query(columns, top_deals, filters or DealFilters())
+    cursor = conn.cursor()
+    try:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    fields = ['dimension', 'group_key', 'label', 'deal_count', 'pipeline_value', 'weighted_value',
+              'stage', 'probability', 'expected_close_date']
+    results: Dict[str, List[Dict[str, Any]]] = {}
+    for row in rows:
+        record = dict(zip(fields, row))
+        results.setdefault(record['dimension'], []).append(record)
+    return results
+
+
+def _number(value) -> float:
+    return float(value) if isinstance(value, Decimal) else float(value or 0)
+
+
+def _money(value) -> str:
+    return f"{_number(value):,.0f}"
+
+
+def _grouping_table(rows: List[Dict[str, Any]], heading: str, limit: int) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Table and chart payloads of one grouping, largest pipeline first."""
+    rows = sorted(rows, key=lambda row: _number(row['pipeline_value']), reverse=True)
+    entries = [(row['label'] or row['group_key'] or BLANK_LABEL, row['deal_count'],
+                _number(row['pipeline_value']), _number(row['weighted_value'])) for row in rows[:limit]]
+    rest = rows[limit:]
+    if rest:
+        entries.append((OTHER_LABEL, sum(row['deal_count'] for row in rest),
+                        sum(_number(row['pipeline_value']) for row in rest),
+                        sum(_number(row['weighted_value']) for row in rest)))
+    total = (TOTAL_LABEL, sum(row['deal_count'] for row in rows),
+             sum(_number(row['pipeline_value']) for row in rows),
+             sum(_number(row['weighted_value']) for row in rows))
+
+    table = {
+        'header': [heading, 'Deals', 'Pipeline', 'Weighted'],
+        'rows': [[str(label), f"{count:,}", _money(value), _money(weighted)]
+                 for label, count, value, weighted in entries + [total]],
+    }
+    chart = {
+        'categories': [str(label) for label, _, _, _ in entries],
+        'series': {
+            'Pipeline': [round(value, 2) for _, _, value, _ in entries],
+            'Weighted': [round(weighted, 2) for _, _, _, weighted in entries],
+        },
+    }
+    return table, chart
+
+
+def _top_deals_table(rows: List[Dict[str, Any]], limit: int) -> Dict[str, Any]:
+    return {
+        'header': ['Deal', 'Stage', 'Value', 'Probability', 'Expected Close'],
+        'rows': [[row['label'], row['stage'] or '', _money(row['pipeline_value']),
+                  f"{row['probability']}%", str(row['expected_close_date'] or '')]
+                 for row in rows[:limit]],
+    }
+
+
+def bind_pipeline_data(conn, slides_data: List[Dict[str, Any]],
+                       filters: Optional[DealFilters] = None) -> int:
+    """
+    Fill the data slides of a deck in place with `table` and `chart` payloads.
+
+    Returns:
+        Number of slides bound
+    """
+    data = fetch_deck_data(conn, slides_data, filters)
+    bound = 0
+    for slide in slides_data:
+        if not is_data_slide(slide):
+            continue
+        column, heading = DATA_SLIDE_TYPES[slide['type']]
+        limit = _row_limit(slide)
+        if column is None:
+            slide['table'] = _top_deals_table(data.get('top_deals', []), limit)
+        else:
+            slide['table'], slide['chart'] = _grouping_table(data.get(column, []), heading, limit)
+        bound += 1
+    return bound
+
+
+def _body_area(slide) -> Tuple[int, int, int, int]:
+    """
+    Where the data goes: the first body placeholder, or the area below the title.
+
+    An empty body placeholder is removed and its area used. One with text
+    (the slide's `content`) keeps it as a caption: it is shrunk to a band at
+    the top of its area and the data goes below it.
+
+    Returns:
+        (left, top, width, height) in EMU
+    """
+    for shape in slide.placeholders:
+        if shape.placeholder_format.type not in (2, 7):
+            continue
+        left, top, width, height = area = (shape.left, shape.top, shape.width, shape.height)
+        if None in area:
+            continue
+        lines = [line for line in shape.text_frame.text.splitlines() if line.strip()]
+        if not lines:
+            shape._element.getparent().remove(shape._element)
+            return area
+        caption_height = min(height // 3, len(lines) * CAPTION_LINE_HEIGHT)
+        # Set every coordinate: placeholders may inherit theirs from the layout
+        shape.left, shape.top, shape.width, shape.height = left, top, width, caption_height
+        shape.text_frame.word_wrap = True
+        shape.text_frame.auto_size = MSO_AUTO_SIZE.TEXT_TO_FIT_SHAPE
+        gap = CAPTION_LINE_HEIGHT // 4
+        return left, top + caption_height + gap, width, height - caption_height - gap
+
+    presentation = slide.part.package.presentation_part.presentation
+    width, height = presentation.slide_width, presentation.slide_height
+    top = int(height * 0.2)
+    title = slide.shapes.title
+    if title is not None and title.top is not None and title.height is not None:
+        top = title.top + title.height
+    margin = int(width * 0.05)
+    return margin, top + margin // 2, width - 2 * margin, max(height - top - margin * 3 // 2, height // 4)
+
+
+def adds_parts(content: Dict[str, Any]) -> bool:
+    """Whether add_data_shapes adds parts (a chart and its workbook) to the slide."""
+    chart = content.get('chart')
+    return bool(chart and chart.get('categories'))
+
+
+def add_data_shapes(slide, content: Dict[str, Any]) -> Optional[str]:
+    """
+    Draw the bound `table` and `chart` of a slide.
+
+    Returns:
+        'table', 'chart' or 'table+chart', or None if the slide has no data
+    """
+    table = content.get('table')
+    chart = content.get('chart')
+    if not table and not chart:
+        return None
+
+    left, top, width, height = _body_area(slide)
+    drawn = []
+    if table:
+        # Side by side with the chart, otherwise the whole area
+        table_width = width // 2 - width // 40 if chart else width
+        rows = [table['header']] + table['rows']
+        row_height = min(height // max(len(rows), 1), Pt(28))
+        shape = slide.shapes.add_table(len(rows), len(table['header']), left, top,
+                                       table_width, row_height * len(rows))
+        for r, values in enumerate(rows):
+            for c, value in enumerate(values):
+                cell = shape.table.cell(r, c)
+                cell.text = str(value)
+                for paragraph in cell.text_frame.paragraphs:
+                    for run in paragraph.runs:
+                        run.font.size = TABLE_FONT_SIZE
+        drawn.append('table')
+    if chart and chart.get('categories'):
+        chart_left = left + width // 2 + width // 40 if table else left
+        chart_width = width // 2 - width // 40 if table else width
+        chart_data = CategoryChartData()
+        chart_data.categories = chart['categories']
+        for name, values in chart['series'].items():
+            chart_data.add_series(name, values)
+        graphic = slide.shapes.add_chart(XL_CHART_TYPE.BAR_CLUSTERED, chart_left, top,
+                                         chart_width, height, chart_data)
+        graphic.chart.has_legend = True
+        graphic.chart.legend.position = XL_LEGEND_POSITION.BOTTOM
+        graphic.chart.legend.include_in_layout = False
+        drawn.append('chart')
+    return '+'.join(drawn) or None
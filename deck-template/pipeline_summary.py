@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Pipeline summaries for the export workbook
+
+The pivot in the export is mostly used for pipeline by stage, AE, sales
+manager and lead source. These are computed in the database with one
+`GROUPING SETS` query (backed by idx_deals_stage / idx_deals_stage_ae) and
+written as plain summary sheets, so they are readable as soon as the
+workbook opens without Excel pivoting every raw row. The export's filters
+apply to the summaries too.
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from deal_filters import DealFilters
+
+# (deals column, sheet name, column heading)
+SUMMARY_DIMENSIONS = [
+    ('stage', 'By Stage', 'Stage'),
+    ('ae_assigned', 'By AE', 'AE (user id)'),
+    ('sales_manager', 'By Sales Manager', 'Sales Manager (user id)'),
+    ('lead_source', 'By Lead Source', 'Lead Source'),
+]
+
+SUMMARY_HEADER = ['Deals', 'Pipeline Value', 'Weighted Value']
+BLANK_LABEL = '(blank)'
+TOTAL_LABEL = 'Total'
+
+_MEASURES = """
+       COUNT(*) AS deal_count,
+       COALESCE(SUM(deal_value), 0) AS pipeline_value,
+       COALESCE(SUM(deal_value * COALESCE(probability, 0) / 100.0), 0) AS weighted_value"""
+
+# Grouping id of each grouping set, as GROUPING(<all dimension columns>) reports it:
+# a bit is set for every column that is aggregated away in that row
+_ALL_AGGREGATED = (1 << len(SUMMARY_DIMENSIONS)) - 1
+_GROUPING_IDS = {
+    _ALL_AGGREGATED ^ (1 << (len(SUMMARY_DIMENSIONS) - 1 - i)): column
+    for i, (column, _, _) in enumerate(SUMMARY_DIMENSIONS)
+}
+
+SummarySheet = Tuple[str, List[str], List[tuple]]
+
+
+def summary_query(where: str = '') -> str:
+    """
+    Query returning one row per dimension value plus a grand total row.
+
+    Args:
+        where: ' WHERE ...' clause limiting the summarized deals
+    """
+    columns = [column for column, _, _ in SUMMARY_DIMENSIONS]
+    grouping_sets = ', '.join(f'({column})' for column in columns)
+    return f"""
+        SELECT GROUPING({', '.join(columns)}) AS grouping_id,
+               {', '.join(columns)},{_MEASURES}
+        FROM deals{where}
+        GROUP BY GROUPING SETS ({grouping_sets}, ())
+        ORDER BY grouping_id, pipeline_value DESC
+    """
+
+
+def fetch_pipeline_summary(engine, filters: Optional[DealFilters] = None) -> Dict[Optional[str], List[Dict[str, Any]]]:
+    """
+    Run the summary query over the deals matching `filters`.
+
+    Returns:
+        Dimension column -> rows of {value, deal_count, pipeline_value, weighted_value};
+        the grand total is under None
+    """
+    summary: Dict[Optional[str], List[Dict[str, Any]]] = {column: [] for column, _, _ in SUMMARY_DIMENSIONS}
+    summary[None] = []
+    where, params = (filters or DealFilters()).where()
+    with engine.connect() as conn:
+        for row in conn.execute(text(summary_query(where)), params).mappings():
+            column = _GROUPING_IDS.get(row['grouping_id'])
+            summary[column].append({
+                'value': row[column] if column else None,
+                'deal_count': row['deal_count'],
+                'pipeline_value': row['pipeline_value'],
+                'weighted_value': row['weighted_value'],
+            })
+    return summary
+
+
+def pipeline_summary_sheets(engine, filters: Optional[DealFilters] = None) -> List[SummarySheet]:
+    """Summary sheets for the export workbook, as (sheet name, header, rows)."""
+    summary = fetch_pipeline_summary(engine, filters)
+    total = summary[None][0] if summary[None] else {'deal_count': 0, 'pipeline_value': 0, 'weighted_value': 0}
+
+    sheets = []
+    for column, sheet_name, heading in SUMMARY_DIMENSIONS:
+        rows = [
+            (BLANK_LABEL if row['value'] is None else row['value'],
+             row['deal_count'], row['pipeline_value'], row['weighted_value'])
+            for row in summary[column]
+        ]
+        rows.append((TOTAL_LABEL, total['deal_count'], total['pipeline_value'], total['weighted_value']))
+        sheets.append((sheet_name, [heading] + SUMMARY_HEADER, rows))
+    return sheets
@@ -0,0 +1,222 @@
+#!/usr/bin/env python3
+"""
+Pre-fork server for the template API
+
+`uvicorn --workers N` starts N interpreters that each import the app and
+parse every hot template on their own. Here the master process imports
+template_api, preloads the hot templates (PRELOAD_TEMPLATES, see
+template_preload.py), freezes the garbage collector and only then forks the
+workers. The parsed templates are shared copy-on-write, so another worker
+costs its unique memory (USS) rather than a full copy of the templates.
+Renders still parse their own copy of the template; see template_preload.py.
+The master downloads with its own S3 client and closes it before forking,
+so workers never inherit its open connections.
+
+    PREFORK_WORKERS=8 PRELOAD_TEMPLATES=1718000000000_Brand.pptx python prefork_server.py
+
+The workers accept connections on one listening socket opened by the
+master. The master only supervises: it restarts workers that exit, logs
+every worker's memory at an interval and stops the workers on SIGTERM or
+SIGINT. `GET /workers/memory` reports the same figures on demand.
+
+RENDER_MEMORY_BUDGET_MB and RENDER_WORKERS are per process under uvicorn.
+Here they are totals for the host: every worker admits renders against
+its share of the budget and starts its share of the render pool, so N
+workers do not add up to N budgets and N pools of CPU count processes.
+
+Environment:
+    PREFORK_WORKERS: Worker processes (default: CPU count)
+    PREFORK_HOST: Listen address (default 0.0.0.0)
+    PREFORK_PORT: Listen port (default 8000)
+    PREFORK_MEMORY_LOG_SECONDS: Interval of the worker_memory log event (default 60, 0 disables)
+    PREFORK_SHUTDOWN_SECONDS: Grace period for workers to finish on shutdown (default 30)
+"""
+
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, Optional
+
+import template_preload
+from structured_logging import configure_logging, log_event
+
+logger = logging.getLogger(__name__)
+
+PREFORK_WORKERS = int(os.getenv("PREFORK_WORKERS", str(os.cpu_count() or 1)))
+PREFORK_HOST = os.getenv("PREFORK_HOST", "0.0.0.0")
+PREFORK_PORT = int(os.getenv("PREFORK_PORT", "8000"))
+PREFORK_MEMORY_LOG_SECONDS = float(os.getenv("PREFORK_MEMORY_LOG_SECONDS", "60"))
+PREFORK_SHUTDOWN_SECONDS = float(os.getenv("PREFORK_SHUTDOWN_SECONDS", "30"))
+
+# Workers that die sooner than this after starting are restarted with a delay
+_MIN_WORKER_LIFETIME = 1.0
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    """Listening socket shared by every worker."""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+class PreforkServer:
+    """Forks workers serving one ASGI app from a shared socket and keeps them running."""
+
+    def __init__(self, app, sock: socket.socket, workers: int = PREFORK_WORKERS,
+                 memory_log_seconds: float = PREFORK_MEMORY_LOG_SECONDS,
+                 shutdown_seconds: float = PREFORK_SHUTDOWN_SECONDS, log_level: str = 'info'):
+        self.app = app
+        self.sock = sock
+        self.workers = max(1, workers)
+        self.memory_log_seconds = memory_log_seconds
+        self.shutdown_seconds = shutdown_seconds
+        self.log_level = log_level
+        # pid -> start time
+        self._children: Dict[int, float] = {}
+        self._stopping = False
+
+    def _spawn(self) -> int:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._run_worker()
+            except BaseException as e:
+                log_event(logger, logging.ERROR, 'worker_failed', pid=os.getpid(), error=str(e))
+                code = 1
+            finally:
+                # Never return into the master's supervision loop or run its atexit hooks
+                os._exit(code)
+        self._children[pid] = time.monotonic()
+        log_event(logger, logging.INFO, 'worker_started', pid=pid)
+        return pid
+
+    def _run_worker(self):
+        import uvicorn
+
+        # uvicorn installs its own handlers for a graceful shutdown
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        server = uvicorn.Server(uvicorn.Config(self.app, log_level=self.log_level))
+        server.run(sockets=[self.sock])
+
+    def _request_stop(self, signum, frame):
+        self._stopping = True
+
+    def _reap(self):
+        """Collect exited workers and start replacements."""
+        while self._children:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                return
+            started = self._children.pop(pid, None)
+            if started is None:
+                continue
+            log_event(logger, logging.WARNING if not self._stopping else logging.INFO, 'worker_exited',
+                      pid=pid, exit_code=os.waitstatus_to_exitcode(status))
+            if not self._stopping:
+                if time.monotonic() - started < _MIN_WORKER_LIFETIME:
+                    time.sleep(_MIN_WORKER_LIFETIME)
+                self._spawn()
+
+    def log_memory(self):
+        report = template_preload.memory_report()
+        log_event(logger, logging.INFO, 'worker_memory', master=report['master'], workers=report['workers'],
+                  worker_uss_total_mb=report['worker_uss_total_mb'])
+
+    def run(self):
+        """Fork the workers and supervise them until SIGTERM or SIGINT."""
+        template_preload.prefork_master_pid = os.getpid()
+        frozen = template_preload.freeze_for_fork()
+        log_event(logger, logging.INFO, 'prefork_starting', workers=self.workers, gc_frozen_objects=frozen,
+                  preloaded_templates=len(template_preload.preloaded_templates()))
+
+        signal.signal(signal.SIGTERM, self._request_stop)
+        signal.signal(signal.SIGINT, self._request_stop)
+        for _ in range(self.workers):
+            self._spawn()
+
+        next_memory_log = time.monotonic() + self.memory_log_seconds
+        while not self._stopping:
+            self._reap()
+            if self.memory_log_seconds > 0 and time.monotonic() >= next_memory_log:
+                self.log_memory()
+                next_memory_log = time.monotonic() + self.memory_log_seconds
+            time.sleep(0.5)
+        self.stop()
+
+    def stop(self):
+        """Ask the workers to finish their requests, then kill the ones that do not."""
+        self._stopping = True
+        for pid in list(self._children):
+            _signal(pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.shutdown_seconds
+        while self._children and time.monotonic() < deadline:
+            self._reap()
+            time.sleep(0.1)
+        for pid in list(self._children):
+            _signal(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            self._children.pop(pid, None)
+        self.sock.close()
+        log_event(logger, logging.INFO, 'prefork_stopped')
+
+
+def _signal(pid: int, signum: int):
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass
+
+
+def share_render_limits(admission, workers: int) -> Dict[str, int]:
+    """
+    Split the render memory budget and render pool between the workers.
+
+    Called in the master before forking, so every worker inherits its share.
+
+    Args:
+        admission: The app's MemoryAdmissionController
+        workers: Worker processes about to be forked
+
+    Returns:
+        Each worker's budget in bytes and render pool size
+    """
+    import parallel_render
+
+    workers = max(1, workers)
+    admission.budget_bytes = admission.budget_bytes // workers
+    parallel_render.WORKER_COUNT = max(1, parallel_render.WORKER_COUNT // workers)
+    return {'budget_bytes': admission.budget_bytes, 'render_workers': parallel_render.WORKER_COUNT}
+
+
+def main(workers: Optional[int] = None) -> int:
+    configure_logging()
+    import template_api
+
+    if template_preload.PRELOAD_TEMPLATES:
+        preloaded = template_api.preload_hot_templates(template_preload.PRELOAD_TEMPLATES)
+        print(f"✅ Preloaded {preloaded}/{len(template_preload.PRELOAD_TEMPLATES)} template(s)")
+
+    workers = workers or PREFORK_WORKERS
+    limits = share_render_limits(template_api.render_admission, workers)
+    log_event(logger, logging.INFO, 'prefork_render_limits', workers=workers, **limits)
+
+    sock = bind_socket(PREFORK_HOST, PREFORK_PORT)
+    print(f"🚀 Serving template API on {PREFORK_HOST}:{PREFORK_PORT} with {workers} workers")
+    try:
+        PreforkServer(template_api.app, sock, workers=workers).run()
+    finally:
+        template_preload.clear_preloaded()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
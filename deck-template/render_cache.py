@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Per-slide render cache
+
+Stores the XML of slides that have already been rendered, keyed by
+(template content hash, layout index, slide content hash). When a deck is
+regenerated after editing a few slides, unchanged slides are re-attached
+from the cache instead of being cloned from the layout and filled again.
+
+Environment:
+    SLIDE_CACHE_MAX_MB: Memory bound for cached slide XML (default 64, 0 disables)
+    SLIDE_CACHE_MAX_ENTRIES: Entry bound (default 10000)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+SlideKey = Tuple[str, int, str]
+
+# Slide fields that do not change how a slide renders
+_POSITION_FIELDS = ('order',)
+
+
+def slide_content_hash(slide_data: Dict[str, Any]) -> str:
+    """Canonical hash of everything in a slide payload that affects its rendering."""
+    content = {k: v for k, v in slide_data.items() if k not in _POSITION_FIELDS}
+    canonical = json.dumps(content, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class SlideRenderCache:
+    """
+    Thread-safe LRU of rendered slide XML bounded by total bytes and entry count.
+    """
+
+    def __init__(self, max_bytes: int, max_entries: int = 10000):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[SlideKey, bytes]' = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls) -> 'SlideRenderCache':
+        return cls(
+            max_bytes=int(float(os.getenv('SLIDE_CACHE_MAX_MB', '64')) * 1024 * 1024),
+            max_entries=int(os.getenv('SLIDE_CACHE_MAX_ENTRIES', '10000')),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 and self.max_entries > 0
+
+    def get(self, key: SlideKey) -> Optional[bytes]:
+        with self._lock:
+            blob = self._entries.get(key)
+            if blob is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return blob
+
+    def put(self, key: SlideKey, blob: bytes):
+        if not self.enabled or len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = blob
+            self._size += len(blob)
+            while self._size > self.max_bytes or len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._size,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+# Shared by every TemplateHandler in the process
+slide_render_cache = SlideRenderCache.from_env()
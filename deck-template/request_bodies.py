@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Compact request bodies for deck creation
+
+Deck requests with long generated `content` strings run to several MB of
+JSON. Clients may compress them (`Content-Encoding: gzip` or `zstd`) and/or
+encode them as MessagePack (`Content-Type: application/msgpack`). The
+decoded payload is checked in place and its slide dicts are used directly as
+TemplateHandler's slide data, so nothing is copied per slide into a model
+and back into dicts.
+
+zstd and MessagePack need the `zstandard` and `msgpack` packages; without
+them those bodies are answered with 415.
+
+Environment:
+    REQUEST_BODY_MAX_MB: Largest accepted body after decompression (default 64)
+"""
+
+import io
+import json
+import os
+import zlib
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from fastapi import HTTPException
+
+try:
+    import msgpack
+except ImportError:  # MessagePack bodies are rejected with 415
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:  # zstd bodies are rejected with 415
+    zstandard = None
+
+REQUEST_BODY_MAX_BYTES = int(float(os.getenv("REQUEST_BODY_MAX_MB", "64")) * 1024 * 1024)
+
+MSGPACK_MEDIA_TYPES = {'application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack'}
+
+# Fields of a slide payload; anything else is dropped like pydantic ignores extra fields
+_SLIDE_FIELDS = {'type': str, 'title': str, 'content': str, 'order': int, 'data': dict}
+_REQUIRED_SLIDE_FIELDS = ('type', 'title', 'content', 'order')
+
+
+class DeckRequest(NamedTuple):
+    """A decoded PresentationRequest; `slides_data` is ready for TemplateHandler."""
+    slides_data: List[Dict[str, Any]]
+    deck_config: Dict[str, Any]
+    template_id: Optional[str]
+    stream: bool
+
+
+def decompress_body(body: bytes, content_encoding: Optional[str],
+                    max_bytes: int = REQUEST_BODY_MAX_BYTES) -> bytes:
+    """
+    Undo the request's Content-Encoding.
+
+    Raises:
+        HTTPException: 415 for unsupported encodings, 400 for corrupt data,
+            413 when the decompressed body exceeds `max_bytes`
+    """
+    encoding = (content_encoding or 'identity').strip().lower()
+    if encoding == 'identity':
+        data = body
+    elif encoding in ('gzip', 'x-gzip'):
+        decompressor = zlib.decompressobj(wbits=31)
+        try:
+            data = decompressor.decompress(body, max_bytes + 1)
+        except zlib.error as e:
+            raise HTTPException(status_code=400, detail=f"Invalid gzip body: {e}")
+        # Output stopped at the limit is oversized (413 below), not truncated
+        if len(data) <= max_bytes:
+            if not decompressor.eof:
+                raise HTTPException(status_code=400, detail="Invalid gzip body: truncated")
+            if decompressor.unused_data:
+                raise HTTPException(status_code=400, detail="Invalid gzip body: data after the end of the stream")
+    elif encoding == 'zstd':
+        if zstandard is None:
+            raise HTTPException(status_code=415, detail="zstd request bodies need the zstandard package")
+        try:
+            with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)) as reader:
+                data = reader.read(max_bytes + 1)
+            # The reader returns what it has for a truncated frame and ignores what follows the
+            # frame; decode again, now known to fit, with an object that reports both
+            if len(data) <= max_bytes:
+                decompressor = zstandard.ZstdDecompressor().decompressobj()
+                data = decompressor.decompress(body)
+                if not decompressor.eof:
+                    raise HTTPException(status_code=400, detail="Invalid zstd body: truncated")
+                if decompressor.unused_data:
+                    raise HTTPException(status_code=400, detail="Invalid zstd body: data after the end of the frame")
+        except zstandard.ZstdError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid zstd body: {e}")
+    else:
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding '{content_encoding}'")
+
+    if len(data) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Request body exceeds {max_bytes} bytes")
+    return data
+
+
+def decode_body(body: bytes, content_type: Optional[str], content_encoding: Optional[str]) -> Any:
+    """Decompress and parse a JSON or MessagePack request body."""
+    data = decompress_body(body, content_encoding)
+    media_type = (content_type or 'application/json').split(';', 1)[0].strip().lower()
+    if media_type in MSGPACK_MEDIA_TYPES:
+        if msgpack is None:
+            raise HTTPException(status_code=415, detail="MessagePack bodies need the msgpack package")
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except (ValueError, msgpack.UnpackException) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid MessagePack body: {e}")
+    if media_type != 'application/json':
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Type '{content_type}'")
+    try:
+        return json.loads(data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON body: {e}")
+
+
+def _invalid(location: str, message: str) -> HTTPException:
+    # Same status and detail shape as FastAPI's own validation errors
+    loc = ['body'] + (location.split('.') if location else [])
+    return HTTPException(status_code=422, detail=[{'loc': loc, 'msg': message}])
+
+
+def parse_presentation_request(payload: Any) -> DeckRequest:
+    """
+    Check a decoded PresentationRequest and turn it into TemplateHandler input.
+
+    Slide dicts are validated and trimmed in place rather than copied, then
+    sorted by `order`.
+
+    Raises:
+        HTTPException: 422 naming the first invalid field
+    """
+    if not isinstance(payload, dict):
+        raise _invalid('', "Request body must be an object")
+    slides = payload.get('slides')
+    if not isinstance(slides, list):
+        raise _invalid('slides', "Field required and must be a list")
+    deck_config = payload.get('deck_config')
+    if not isinstance(deck_config, dict):
+        raise _invalid('deck_config', "Field required and must be an object")
+    template_id = payload.get('template_id')
+    if template_id is not None and not isinstance(template_id, str):
+        raise _invalid('template_id', "Must be a string")
+    stream = payload.get('stream', False)
+    if not isinstance(stream, bool):
+        raise _invalid('stream', "Must be a boolean")
+
+    for i, slide in enumerate(slides):
+        if not isinstance(slide, dict):
+            raise _invalid(f'slides.{i}', "Must be an object")
+        for name in _REQUIRED_SLIDE_FIELDS:
+            if name not in slide:
+                raise _invalid(f'slides.{i}.{name}', "Field required")
+        for name in [name for name in slide if name not in _SLIDE_FIELDS]:
+            del slide[name]
+        if slide.get('data', ...) is None:
+            del slide['data']
+        for name, value in slide.items():
+            expected = _SLIDE_FIELDS[name]
+            # bool is an int subclass but not a valid order
+            if not isinstance(value, expected) or (expected is int and isinstance(value, bool)):
+                raise _invalid(f'slides.{i}.{name}', f"Must be of type {expected.__name__}")
+
+    slides.sort(key=lambda slide: slide['order'])
+    return DeckRequest(slides, deck_config, template_id, stream)
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Streaming ZIP writer
+
+Office documents are ZIP packages. `iter_zip` writes package entries with
+`zipfile` into a write-only sink and yields the compressed bytes as they are
+produced, so a response can start before the package is complete and only
+one entry is held in memory at a time. Because the sink cannot seek,
+`zipfile` writes sizes in data descriptors after each entry instead of going
+back to patch local headers.
+"""
+
+import zipfile
+from typing import Iterable, Iterator, List, Tuple, Union
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# (member name, bytes or an iterable of byte pieces)
+ZipEntry = Tuple[str, Union[bytes, Iterable[bytes]]]
+
+
+class ChunkSink:
+    """Write-only file object that buffers written bytes until drained."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.size = 0
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        """Return and forget everything written since the last drain."""
+        data = b''.join(self._chunks)
+        self._chunks = []
+        self.size = 0
+        return data
+
+
+def iter_zip(entries: Iterable[ZipEntry], chunk_size: int = DEFAULT_CHUNK_SIZE,
+             compresslevel: int = 6, force_zip64: bool = False) -> Iterator[bytes]:
+    """
+    Write `entries` to a ZIP archive and yield it in chunks.
+
+    Args:
+        entries: Members in archive order; streamed members are written piece by piece
+        chunk_size: Yield once at least this many compressed bytes are buffered
+        compresslevel: Deflate level
+        force_zip64: Write streamed members with ZIP64 headers (needed above 4 GB)
+
+    Yields:
+        Consecutive pieces of the archive
+    """
+    sink = ChunkSink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED,
+                         compresslevel=compresslevel) as archive:
+        for name, data in entries:
+            if isinstance(data, (bytes, bytearray)):
+                archive.writestr(name, data)
+            else:
+                with archive.open(name, 'w', force_zip64=force_zip64) as member:
+                    for piece in data:
+                        member.write(piece)
+                        if sink.size >= chunk_size:
+                            yield sink.drain()
+            if sink.size >= chunk_size:
+                yield sink.drain()
+    # Central directory
+    yield sink.drain()
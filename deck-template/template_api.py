@@ -6,18 +6,30 @@ FastAPI endpoint for PowerPoint template processing using python-pptx
 import os
 import tempfile
 import json
+import time
+from itertools import chain
 from typing import List, Dict, Any, Optional
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
-from fastapi.responses import FileResponse
+from fastapi import Depends, FastAPI, HTTPException, Request, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 import boto3
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
-from template_handler import TemplateHandler, process_template_request
+from template_handler import TemplateHandler, process_template_request, template_content_hash
+from structured_logging import configure_logging
+import parallel_render
+from admission import AdmissionRejected, MemoryAdmissionController
+from deck_cache import deck_cache_from_env, deck_cache_key
+from job_scheduler import JobOptions, JobScheduler, ScheduledJob, scheduling_options
+from pipeline_slides import bind_pipeline_data, deck_filters, is_data_slide
+from request_bodies import MSGPACK_MEDIA_TYPES, decode_body, parse_presentation_request
+from template_preload import memory_report, preload_template, preloaded_template
 
 # Load environment variables
 load_dotenv()
+configure_logging()
 
 app = FastAPI(title="PowerPoint Template API", version="1.0.0")
 
@@ -38,8 +50,23 @@ S3_CONFIG = {
     'bucket_name': os.getenv('AWS_S3_BUCKET_NAME', 'new-account-file-upload')
 }
 
+def create_s3_client():
+    """New S3 client for the configured account"""
+    return boto3.client('s3', **{k: v for k, v in S3_CONFIG.items() if k != 'bucket_name'})
+
 # Initialize S3 client
-s3_client = boto3.client('s3', **{k: v for k, v in S3_CONFIG.items() if k != 'bucket_name'})
+s3_client = create_s3_client()
+
+# Memory budget shared by all renders in this worker (RENDER_MEMORY_BUDGET_MB etc.)
+render_admission = MemoryAdmissionController.from_env()
+
+# Interactive decks ahead of batch generation, fair across users (SCHEDULER_* etc.)
+render_scheduler = JobScheduler.from_env()
+
+# Rendered decks for repeated identical requests (DECK_CACHE_BACKEND etc.)
+deck_cache = deck_cache_from_env()
+
+PPTX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
 
 class SlideData(BaseModel):
     """Model for slide data"""
@@ -47,12 +74,16 @@ class SlideData(BaseModel):
     title: str
     content: str
     order: int
+    # Options of data-bound slide types (pipeline_by_stage, top_deals, ...), e.g. {"limit": 10}
+    data: Optional[Dict[str, Any]] = None
 
 class PresentationRequest(BaseModel):
-    """Model for presentation creation request"""
+    """Model for presentation creation request (documents the body; parsed by request_bodies)"""
     slides: List[SlideData]
     deck_config: Dict[str, Any]
     template_id: Optional[str] = None
+    # Stream the .pptx while slides are rendered instead of building it first
+    stream: bool = False
 
 def get_db_connection():
     """Get database connection"""
@@ -64,8 +95,8 @@ def get_db_connection():
         # Return None instead of raising exception to allow graceful fallback
         return None
 
-def download_template_from_s3(s3_key: str) -> str:
-    """Download template from S3 and return local file path"""
+def download_template_from_s3(s3_key: str, client=None) -> str:
+    """Download template from S3 (with `client`, default the shared one) and return local file path"""
     try:
         print(f"🔧 Attempting to download template from S3: bucket={S3_CONFIG['bucket_name']}, key={s3_key}")
         print(f"🔧 AWS credentials: access_key_id={'*' * 10 + S3_CONFIG['aws_access_key_id'][-4:] if S3_CONFIG['aws_access_key_id'] else 'None'}")
@@ -76,7 +107,7 @@ def download_template_from_s3(s3_key: str) -> str:
         temp_file.close()
         
         # Download from S3
-        s3_client.download_file(S3_CONFIG['bucket_name'], s3_key, temp_path)
+        (client or s3_client).download_file(S3_CONFIG['bucket_name'], s3_key, temp_path)
         
         print(f"✅ Successfully downloaded template to: {temp_path}")
         return temp_path
@@ -92,6 +123,70 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "PowerPoint Template API"}
 
+@app.get("/admission/status")
+async def admission_status():
+    """Current render memory usage and queue depth"""
+    return render_admission.status()
+
+@app.get("/scheduler/status")
+async def scheduler_status():
+    """Render slots in use, queued jobs per priority class and rejections"""
+    return render_scheduler.status()
+
+@app.get("/deck-cache/status")
+async def deck_cache_status():
+    """Whole-deck result cache usage"""
+    if deck_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **deck_cache.stats()}
+
+@app.get("/workers/memory")
+async def workers_memory():
+    """RSS, PSS and unique RSS (USS) of the server's processes and the preloaded templates"""
+    return await run_in_threadpool(memory_report)
+
+def preload_hot_templates(template_ids: List[str]) -> int:
+    """Download, parse and keep the given templates; returns how many were preloaded"""
+    conn = get_db_connection()
+    if conn is None:
+        print("⚠️ Database unavailable; no templates preloaded")
+        return 0
+    templates = []
+    try:
+        cursor = conn.cursor(cursor_factory=RealDictCursor)
+        for template_id in template_ids:
+            cursor.execute("""
+                SELECT filename, s3_key
+                FROM company_files
+                WHERE filename = %s AND category = 'templates'
+            """, (template_id,))
+            template = cursor.fetchone()
+            if template:
+                templates.append(template)
+        cursor.close()
+    finally:
+        conn.close()
+    
+    # Downloaded with a client of its own that is closed again, so the pre-fork
+    # workers do not inherit open S3 connections from the master
+    client = create_s3_client()
+    preloaded = 0
+    try:
+        for template in templates:
+            template_path = download_template_from_s3(template['s3_key'], client)
+            if not template_path:
+                continue
+            if preload_template(template['filename'], template['s3_key'], template_path) is None:
+                os.unlink(template_path)
+                continue
+            preloaded += 1
+    finally:
+        client.close()
+    missing = set(template_ids) - {template['filename'] for template in templates}
+    if missing:
+        print(f"⚠️ Templates not found for preloading: {', '.join(sorted(missing))}")
+    return preloaded
+
 @app.get("/templates")
 async def list_templates():
     """List available templates"""
@@ -163,6 +258,14 @@ async def get_template_info(template_id: str):
         if not template:
             raise HTTPException(status_code=404, detail="Template not found")
         
+        preloaded = preloaded_template(template['s3_key'])
+        if preloaded is not None:
+            return {
+                "template_info": preloaded.loaded.get_template_info(),
+                "available_layouts": preloaded.loaded.get_available_layouts(),
+                "original_name": template['original_name']
+            }
+        
         # Download template from S3
         template_path = download_template_from_s3(template['s3_key'])
         
@@ -195,11 +298,132 @@ async def get_template_info(template_id: str):
         print(f"Failed to get template info: {e}")
         raise HTTPException(status_code=500, detail="Failed to get template info")
 
-@app.post("/presentations/create")
-async def create_presentation(request: PresentationRequest):
-    """Create a presentation using a template"""
+def bind_deck_data(slides_data: List[Dict[str, Any]], deck_config: Dict[str, Any]):
+    """Fill the deck's data-bound slides from deals"""
+    try:
+        filters = deck_filters(deck_config)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid pipelineFilters: {e}")
+    conn = get_db_connection()
+    if conn is None:
+        raise HTTPException(status_code=503, detail="Database unavailable for pipeline slides")
+    try:
+        bound = bind_pipeline_data(conn, slides_data, filters)
+    finally:
+        conn.close()
+    print(f"📊 Bound pipeline data to {bound} slide(s)")
+
+def _too_busy(e: AdmissionRejected) -> HTTPException:
+    """The HTTP response for a job the scheduler or the memory budget turned away"""
+    return HTTPException(
+        status_code=e.status_code,
+        detail=e.detail,
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def _tee_into_deck_cache(chunks, cache_key: str):
+    """Yield `chunks` while writing them to a file, then store it if the stream completed."""
+    fd, path = tempfile.mkstemp(suffix='.pptx')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk)
+                yield chunk
+        deck_cache.put(cache_key, path)
+    finally:
+        os.unlink(path)
+
+def _release_after_stream(chunks, estimate: int):
+    """Yield `chunks`, then give back the render reservation however the stream ends."""
+    started = time.monotonic()
+    try:
+        yield from chunks
+    finally:
+        render_admission.release(estimate, time.monotonic() - started)
+
+async def stream_presentation(template_path: str, slides_data: List[Dict[str, Any]], filename: str,
+                              loaded: Optional[TemplateHandler] = None, job: Optional[ScheduledJob] = None,
+                              cache_key: Optional[str] = None):
+    """
+    Render a presentation as a chunked response.
+    
+    The template is parsed before this returns, so the caller may delete the
+    downloaded file. Only one slide is held in memory at a time, so the
+    admission estimate does not grow with the deck. `loaded` is a handler
+    sharing a preloaded template, which then is not loaded again. `job` is
+    scheduled first and holds its slot until the stream ends. With
+    `cache_key`, a deck streamed to the end is stored in the deck cache.
+    """
+    if job is not None:
+        try:
+            await render_scheduler.acquire(job)
+        except AdmissionRejected as e:
+            raise _too_busy(e)
+    
+    estimate = render_admission.estimate(os.path.getsize(template_path), 1)
+    try:
+        await render_admission.acquire(estimate)
+    except AdmissionRejected as e:
+        if job is not None:
+            render_scheduler.release(job, observe=False)
+        raise _too_busy(e)
+    
+    handler = loaded or TemplateHandler(template_path)
+    if loaded is None and not await run_in_threadpool(handler.load_template):
+        render_admission.release(estimate)
+        if job is not None:
+            render_scheduler.release(job, observe=False)
+        raise HTTPException(status_code=500, detail="Failed to load template")
+    
+    # A generator: planning the layouts and parsing a shared template run in the threadpool next() below
+    chunks = _release_after_stream(handler.stream_presentation_from_slides(slides_data), estimate)
+    if job is not None:
+        chunks = render_scheduler.release_after(job, chunks)
+    if cache_key is not None:
+        chunks = _tee_into_deck_cache(chunks, cache_key)
+    # Produce the first chunk (template parts) here so setup errors still get a 500
+    first_chunk = await run_in_threadpool(next, chunks)
+    
+    return StreamingResponse(
+        chain([first_chunk], chunks),
+        media_type=PPTX_MEDIA_TYPE,
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "X-Deck-Cache": "MISS" if cache_key is not None else "BYPASS"
+        }
+    )
+
+def _request_body_schema() -> Dict[str, Any]:
+    """PresentationRequest as an inline JSON schema for the OpenAPI docs"""
+    schema = PresentationRequest.model_json_schema()
+    schema['properties']['slides']['items'] = schema.pop('$defs')['SlideData']
+    return schema
+
+_PRESENTATION_BODY_DOCS = {
+    'requestBody': {
+        'required': True,
+        'content': {media_type: {'schema': _request_body_schema()}
+                    for media_type in ['application/json'] + sorted(MSGPACK_MEDIA_TYPES)},
+    }
+}
+
+@app.post("/presentations/create", openapi_extra=_PRESENTATION_BODY_DOCS)
+async def create_presentation(http_request: Request, job_options: JobOptions = Depends(scheduling_options)):
+    """Create a presentation using a template
+    
+    The body is a PresentationRequest as JSON or MessagePack, optionally
+    gzip- or zstd-compressed (Content-Encoding). Renders are interactive
+    unless `X-Job-Priority: batch` is sent.
+    """
+    # Multi-MB bodies: decompress and parse off the event loop
+    body = await http_request.body()
+    payload = await run_in_threadpool(decode_body, body, http_request.headers.get('content-type'),
+                                      http_request.headers.get('content-encoding'))
+    del body
+    request = parse_presentation_request(payload)
     try:
         template_path = None
+        preloaded = None
         
         try:
             if request.template_id:
@@ -222,46 +446,89 @@ async def create_presentation(request: PresentationRequest):
                 if not template:
                     raise HTTPException(status_code=404, detail="Template not found")
                 
+                # Hot templates were parsed before the workers forked (prefork_server.py)
+                preloaded = preloaded_template(template['s3_key'])
+                
                 # Download template from S3
-                template_path = download_template_from_s3(template['s3_key'])
+                template_path = preloaded.path if preloaded else download_template_from_s3(template['s3_key'])
+                
+                if not template_path:
+                    raise HTTPException(status_code=500, detail="Failed to download template")
             else:
                 # Use default template or create without template
                 raise HTTPException(status_code=400, detail="Template ID is required")
             
-            # Prepare slide data
-            slides_data = []
-            for slide in request.slides:
-                slides_data.append({
-                    'type': slide.type,
-                    'title': slide.title,
-                    'content': slide.content,
-                    'order': slide.order
-                })
+            # Validated and sorted by order while parsing the body
+            slides_data = request.slides_data
+            
+            # Data-bound slides are filled from deals with one query for the whole deck
+            if any(is_data_slide(slide_data) for slide_data in slides_data):
+                await run_in_threadpool(bind_deck_data, slides_data, request.deck_config)
+            
+            filename = f"{request.deck_config.get('deckName', 'presentation')}.pptx"
             
-            # Sort slides by order
-            slides_data.sort(key=lambda x: x['order'])
+            # Identical template bytes and slides produce the same deck
+            cache_key = None
+            if deck_cache is not None:
+                if preloaded is not None:
+                    template_hash = preloaded.content_hash
+                else:
+                    template_hash = await run_in_threadpool(template_content_hash, template_path)
+                cache_key = deck_cache_key(template_hash, slides_data)
+                cached = deck_cache.get(cache_key)
+                if cached is not None:
+                    headers = {"X-Deck-Cache": "HIT"}
+                    if cached.path:
+                        return FileResponse(path=cached.path, filename=filename,
+                                            media_type=PPTX_MEDIA_TYPE, headers=headers)
+                    headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+                    return Response(content=cached.data, media_type=PPTX_MEDIA_TYPE, headers=headers)
+            
+            # Charts add parts to a slide, which the streamed package cannot hold
+            streamed = request.stream and TemplateHandler.can_stream(slides_data)
+            
+            # Queued by priority class and user; the cost model learns per template and slide count
+            job = render_scheduler.job(job_options, f"{'stream' if streamed else 'render'}:{request.template_id}",
+                                       len(slides_data))
+            
+            if streamed:
+                return await stream_presentation(template_path, slides_data, filename,
+                                                 preloaded.handler() if preloaded else None, job, cache_key)
             
             # Create output file
             output_file = tempfile.NamedTemporaryFile(delete=False, suffix='.pptx')
             output_path = output_file.name
             output_file.close()
             
-            # Process template and create presentation
-            result = process_template_request(template_path, slides_data, output_path)
+            # Process template and create presentation once the render fits in the memory budget
+            try:
+                async with render_scheduler.run(job):
+                    # Large decks are split across worker processes that each parse the template
+                    async with render_admission.reserve(os.path.getsize(template_path), len(slides_data),
+                                                        parallel_render.workers_for(len(slides_data))):
+                        result = await run_in_threadpool(process_template_request, template_path, slides_data,
+                                                         output_path, preloaded.handler() if preloaded else None)
+            except AdmissionRejected as e:
+                os.unlink(output_path)
+                raise _too_busy(e)
             
             if not result['success']:
                 raise HTTPException(status_code=500, detail=result.get('error', 'Failed to create presentation'))
             
+            if cache_key is not None:
+                await run_in_threadpool(deck_cache.put, cache_key, output_path)
+            
             # Return the file
             return FileResponse(
                 path=output_path,
-                filename=f"{request.deck_config.get('deckName', 'presentation')}.pptx",
-                media_type="application/vnd.openxmlformats-officedocument.presentationml.presentation"
+                filename=filename,
+                media_type=PPTX_MEDIA_TYPE,
+                headers={"X-Deck-Cache": "MISS" if cache_key is not None else "BYPASS"}
             )
             
         finally:
-            # Clean up temporary files
-            if template_path and os.path.exists(template_path):
+            # Clean up temporary files (preloaded templates are kept)
+            if template_path and preloaded is None and os.path.exists(template_path):
                 os.unlink(template_path)
                 
     except HTTPException:
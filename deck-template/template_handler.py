@@ -8,36 +8,88 @@ Instead, it uses templates as-is and overlays content on top of existing slide l
 
 import os
 import json
+import hashlib
 import tempfile
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+from collections import namedtuple
 from pptx import Presentation
+from pptx.opc.constants import CONTENT_TYPE as CT, RELATIONSHIP_TYPE as RT
+from pptx.opc.oxml import CT_Relationships, serialize_part_xml
+from pptx.opc.packuri import PackURI
+from pptx.opc.serialized import _ContentTypesItem
+from pptx.oxml import parse_xml
+from pptx.parts.slide import SlidePart
 from pptx.slide import Slide
 from pptx.shapes.base import BaseShape
 from pptx.enum.shapes import MSO_SHAPE_TYPE
 from pptx.dml.color import RGBColor
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from structured_logging import RenderTrace, configure_logging, log_event
+from render_cache import SlideRenderCache, slide_content_hash, slide_render_cache
+from pipeline_slides import add_data_shapes, adds_parts
+import parallel_render
+from streaming_zip import iter_zip
+
 logger = logging.getLogger(__name__)
 
+# Stands in for a slide part that is only rendered while the package streams
+_StreamedSlidePart = namedtuple('_StreamedSlidePart', ['partname', 'content_type'])
+
+
+def template_content_hash(template_path: str) -> str:
+    """SHA-256 of a template file's bytes."""
+    digest = hashlib.sha256()
+    with open(template_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
 class TemplateHandler:
     """
     Handles PowerPoint templates using python-pptx.
     Uses templates as-is without style extraction.
     """
     
-    def __init__(self, template_path: str):
+    def __init__(self, template_path: str,
+                 slide_cache: Optional[SlideRenderCache] = slide_render_cache):
         """
         Initialize with a template file path.
         
         Args:
             template_path: Path to the .pptx template file
+            slide_cache: Cache of rendered slides shared across requests (None disables it)
         """
         self.template_path = template_path
         self.presentation = None
         self.slide_layouts = []
         self.template_info = {}
+        self.template_hash = None
+        self.slide_cache = slide_cache
+        self._preferred_layouts = None
+        # Parsed presentation shared with other handlers; never modified
+        self._shared_presentation = False
+    
+    @classmethod
+    def from_loaded(cls, loaded: 'TemplateHandler') -> 'TemplateHandler':
+        """
+        A handler reusing another handler's parsed template and layout analysis.
+        
+        The parsed presentation is shared read-only: renders open their own
+        copy of the template to add slides to.
+        
+        Args:
+            loaded: Handler whose template is already loaded
+        """
+        handler = cls(loaded.template_path, slide_cache=loaded.slide_cache)
+        handler.presentation = loaded.presentation
+        handler.slide_layouts = loaded.slide_layouts
+        handler.template_info = loaded.template_info
+        handler.template_hash = loaded.template_hash
+        handler._preferred_layouts = loaded._preferred_layouts
+        handler._shared_presentation = True
+        return handler
         
     def load_template(self) -> bool:
         """
@@ -47,31 +99,34 @@ class TemplateHandler:
             bool: True if successful, False otherwise
         """
         try:
-            logger.info(f"Loading template: {self.template_path}")
+            log_event(logger, logging.DEBUG, 'template_loading', path=self.template_path)
             self.presentation = Presentation(self.template_path)
+            self.template_hash = template_content_hash(self.template_path)
             
             # Extract basic template information
             self.template_info = {
                 'slide_count': len(self.presentation.slides),
                 'slide_layouts': len(self.presentation.slide_layouts),
                 'slide_masters': len(self.presentation.slide_masters),
-                'file_size': os.path.getsize(self.template_path) if os.path.exists(self.template_path) else 0
+                'file_size': os.path.getsize(self.template_path) if os.path.exists(self.template_path) else 0,
+                'content_hash': self.template_hash
             }
             
             # Analyze available slide layouts
             self._analyze_slide_layouts()
             
-            logger.info(f"Template loaded successfully: {self.template_info}")
+            log_event(logger, logging.INFO, 'template_loaded', path=self.template_path, **self.template_info)
             return True
             
         except Exception as e:
-            logger.error(f"Failed to load template: {e}")
+            log_event(logger, logging.ERROR, 'template_load_failed', path=self.template_path, error=str(e))
             return False
     
     def _analyze_slide_layouts(self):
         """Analyze available slide layouts in the template."""
         try:
             self.slide_layouts = []
+            self._preferred_layouts = None
             
             for i, layout in enumerate(self.presentation.slide_layouts):
                 layout_info = {
@@ -83,10 +138,10 @@ class TemplateHandler:
                 }
                 self.slide_layouts.append(layout_info)
                 
-            logger.info(f"Found {len(self.slide_layouts)} slide layouts")
+            log_event(logger, logging.DEBUG, 'layouts_analyzed', layouts=len(self.slide_layouts))
             
         except Exception as e:
-            logger.error(f"Failed to analyze slide layouts: {e}")
+            log_event(logger, logging.ERROR, 'layout_analysis_failed', error=str(e))
     
     def _get_layout_type(self, layout) -> str:
         """Determine the type of slide layout."""
@@ -114,7 +169,7 @@ class TemplateHandler:
             return "custom"
             
         except Exception as e:
-            logger.error(f"Failed to determine layout type: {e}")
+            log_event(logger, logging.ERROR, 'layout_type_failed', error=str(e))
             return "unknown"
     
     def create_slide_from_layout(self, layout_index: int, content: Dict[str, Any]) -> Optional[Slide]:
@@ -130,11 +185,11 @@ class TemplateHandler:
         """
         try:
             if not self.presentation:
-                logger.error("Template not loaded")
+                log_event(logger, logging.ERROR, 'template_not_loaded')
                 return None
             
             if layout_index >= len(self.presentation.slide_layouts):
-                logger.error(f"Layout index {layout_index} out of range")
+                log_event(logger, logging.ERROR, 'layout_out_of_range', layout=layout_index)
                 return None
             
             # Create new slide using the specified layout
@@ -144,33 +199,32 @@ class TemplateHandler:
             # Fill in content based on placeholders
             self._fill_slide_content(slide, content)
             
-            logger.info(f"Created slide using layout {layout_index}")
+            log_event(logger, logging.DEBUG, 'slide_created', layout=layout_index)
             return slide
             
         except Exception as e:
-            logger.error(f"Failed to create slide: {e}")
+            log_event(logger, logging.ERROR, 'slide_create_failed', layout=layout_index, error=str(e))
             return None
     
-    def _fill_slide_content(self, slide: Slide, content: Dict[str, Any]):
+    def _fill_slide_content(self, slide: Slide, content: Dict[str, Any]) -> Dict[str, Optional[str]]:
         """
         Fill slide content based on available placeholders.
         
         Args:
             slide: The slide to fill
             content: Dictionary containing content to fill
+            
+        Returns:
+            Dict naming the pass that filled the title and the content
+            ('placeholder', 'empty_frame', 'text_frame', the data shapes drawn, or None)
         """
+        fill = {'title': None, 'content': None}
         try:
             # Get content fields
             title = content.get('title', '')
             body_text = content.get('content', '')
             subtitle = content.get('subtitle', '')
             
-            logger.info(f"Filling slide content - Title: '{title[:50]}...', Body: '{body_text[:50]}...'")
-            
-            # Track what we've filled
-            title_filled = False
-            content_filled = False
-            
             # First pass: Fill placeholders with specific types
             for shape in slide.shapes:
                 try:
@@ -180,41 +234,36 @@ class TemplateHandler:
                         if placeholder_type == 1:  # Title
                             if hasattr(shape, 'text_frame'):
                                 shape.text_frame.text = title
-                                title_filled = True
-                                logger.info(f"Filled title placeholder with: '{title[:30]}...'")
+                                fill['title'] = 'placeholder'
                         elif placeholder_type == 2:  # Content
                             if hasattr(shape, 'text_frame'):
                                 shape.text_frame.text = body_text
-                                content_filled = True
-                                logger.info(f"Filled content placeholder with: '{body_text[:30]}...'")
+                                fill['content'] = 'placeholder'
                         elif placeholder_type == 3:  # Section Header
                             if hasattr(shape, 'text_frame'):
                                 shape.text_frame.text = subtitle or title
-                                title_filled = True
-                                logger.info(f"Filled section header placeholder with: '{(subtitle or title)[:30]}...'")
+                                fill['title'] = 'placeholder'
                 except ValueError:
                     # Shape is not a placeholder, skip
                     continue
             
             # Second pass: Fill empty text frames or frames with placeholder text
-            if not title_filled or not content_filled:
+            if not fill['title'] or not fill['content']:
                 for shape in slide.shapes:
                     if hasattr(shape, 'text_frame'):
                         current_text = shape.text_frame.text.strip()
                         
                         # Fill empty text frames or frames with placeholder text
                         if not current_text or current_text.lower() in ['click to edit master title style', 'click to edit master subtitle style', 'click to add text', 'click to edit master text styles']:
-                            if not title_filled:
+                            if not fill['title']:
                                 shape.text_frame.text = title
-                                title_filled = True
-                                logger.info(f"Filled empty text frame with title: '{title[:30]}...'")
-                            elif not content_filled and body_text:
+                                fill['title'] = 'empty_frame'
+                            elif not fill['content'] and body_text:
                                 shape.text_frame.text = body_text
-                                content_filled = True
-                                logger.info(f"Filled empty text frame with content: '{body_text[:30]}...'")
+                                fill['content'] = 'empty_frame'
             
             # Third pass: Fill any remaining text frames (more aggressive)
-            if not title_filled or not content_filled:
+            if not fill['title'] or not fill['content']:
                 text_frames = []
                 for shape in slide.shapes:
                     if hasattr(shape, 'text_frame'):
@@ -223,20 +272,22 @@ class TemplateHandler:
                 # Sort text frames by position (top to bottom, left to right)
                 text_frames.sort(key=lambda s: (s.top, s.left))
                 
-                for i, shape in enumerate(text_frames):
-                    if not title_filled:
+                for shape in text_frames:
+                    if not fill['title']:
                         shape.text_frame.text = title
-                        title_filled = True
-                        logger.info(f"Filled text frame {i} with title: '{title[:30]}...'")
-                    elif not content_filled and body_text:
+                        fill['title'] = 'text_frame'
+                    elif not fill['content'] and body_text:
                         shape.text_frame.text = body_text
-                        content_filled = True
-                        logger.info(f"Filled text frame {i} with content: '{body_text[:30]}...'")
+                        fill['content'] = 'text_frame'
             
-            logger.info(f"Content filling complete - Title filled: {title_filled}, Content filled: {content_filled}")
+            # Data-bound slides: table and chart in the body area
+            drawn = add_data_shapes(slide, content)
+            if drawn:
+                fill['content'] = drawn
                                 
         except Exception as e:
-            logger.error(f"Failed to fill slide content: {e}")
+            log_event(logger, logging.ERROR, 'slide_fill_failed', error=str(e))
+        return fill
     
     def get_template_info(self) -> Dict[str, Any]:
         """
@@ -268,15 +319,15 @@ class TemplateHandler:
         """
         try:
             if not self.presentation:
-                logger.error("No presentation to save")
+                log_event(logger, logging.ERROR, 'presentation_missing')
                 return False
             
             self.presentation.save(output_path)
-            logger.info(f"Presentation saved to: {output_path}")
+            log_event(logger, logging.DEBUG, 'presentation_saved', path=output_path)
             return True
             
         except Exception as e:
-            logger.error(f"Failed to save presentation: {e}")
+            log_event(logger, logging.ERROR, 'presentation_save_failed', path=output_path, error=str(e))
             return False
     
     def create_presentation_from_slides(self, slides_data: List[Dict[str, Any]], 
@@ -293,7 +344,7 @@ class TemplateHandler:
         """
         try:
             if not self.presentation:
-                logger.error("Template not loaded")
+                log_event(logger, logging.ERROR, 'template_not_loaded')
                 return False
             
             # Clear existing slides (keep the template structure)
@@ -301,50 +352,238 @@ class TemplateHandler:
             new_presentation = Presentation(self.template_path)
             
             # Remove any existing slides (keep only the template structure)
-            while len(new_presentation.slides) > 0:
-                rId = new_presentation.slides._sldIdLst[0].rId
-                new_presentation.part.drop_rel(rId)
-                new_presentation.slides._sldIdLst.remove(new_presentation.slides._sldIdLst[0])
+            self._remove_slides(new_presentation)
             
-            # Create slides based on data
+            # Per-slide events are collected here and logged once for the whole deck
+            trace = RenderTrace(logger)
+            
+            use_cache = self.slide_cache is not None and self.slide_cache.enabled and self.template_hash
+            cache_hits = 0
+            
+            # Plan every slide first: layout choice depends on position, and
+            # slides already in the cache do not need rendering
+            plan = []
             for i, slide_data in enumerate(slides_data):
                 # Determine appropriate layout based on slide type
-                layout_index = self._get_appropriate_layout(slide_data.get('type', 'content'), i)
-                
-                # Create slide
+                slide_type = slide_data.get('type', 'content')
+                layout_index = self._get_appropriate_layout(slide_type, i)
+            
+                # Reuse the slide if this exact content was rendered on this layout before
+                cache_key = None
+                cached_xml = None
+                if use_cache:
+                    cache_key = (self.template_hash, layout_index, slide_content_hash(slide_data))
+                    cached_xml = self.slide_cache.get(cache_key)
+                plan.append((slide_type, layout_index, cache_key, cached_xml))
+            
+            # Large decks are rendered on worker processes (RENDER_PARALLEL_THRESHOLD)
+            to_render = [(i, layout_index, slides_data[i])
+                         for i, (_, layout_index, _, cached_xml) in enumerate(plan)
+                         if cached_xml is None]
+            rendered = {}
+            if parallel_render.should_render_in_parallel(len(to_render)):
+                rendered = parallel_render.render_slides_parallel(self.template_path, to_render)
+            
+            # Assemble slides in deck order
+            for i, (slide_type, layout_index, cache_key, cached_xml) in enumerate(plan):
                 slide_layout = new_presentation.slide_layouts[layout_index]
+            
+                if cached_xml is not None:
+                    self._add_rendered_slide(new_presentation, slide_layout, cached_xml)
+                    cache_hits += 1
+                    trace.slide(i, layout_index, slide_type, {'title': 'cache', 'content': 'cache'})
+                    continue
+            
+                worker_xml = rendered[i][1] if i in rendered else None
+                if worker_xml is not None:
+                    self._add_rendered_slide(new_presentation, slide_layout, worker_xml)
+                    trace.slide(i, layout_index, slide_type, rendered[i][2])
+                    if cache_key:
+                        self.slide_cache.put(cache_key, worker_xml)
+                    continue
+            
+                # Create slide
                 slide = new_presentation.slides.add_slide(slide_layout)
-                
+            
                 # Fill content
-                self._fill_slide_content(slide, slide_data)
+                fill = self._fill_slide_content(slide, slides_data[i])
+                trace.slide(i, layout_index, slide_type, fill)
+            
+                # Only slides whose sole relationship is their layout can be re-attached elsewhere
+                if cache_key and len(slide.part.rels) == 1:
+                    self.slide_cache.put(cache_key, slide.part.blob)
             
             # Save the presentation
             new_presentation.save(output_path)
-            logger.info(f"Created presentation with {len(slides_data)} slides")
+            trace.emit(template=self.template_path, cache_hits=cache_hits,
+                       parallel_slides=sum(1 for entry in rendered.values() if entry[1] is not None))
             return True
             
         except Exception as e:
-            logger.error(f"Failed to create presentation: {e}")
+            log_event(logger, logging.ERROR, 'presentation_create_failed', error=str(e))
             return False
     
-    def _get_appropriate_layout(self, slide_type: str, slide_index: int = 0) -> int:
+    def _add_rendered_slide(self, presentation, slide_layout, slide_xml: bytes):
         """
-        Get the most appropriate layout index for a slide type.
+        Append a slide from previously rendered XML.
         
         Args:
-            slide_type: Type of slide (title, content, etc.)
-            slide_index: Index of the slide for variety
-            
+            presentation: Presentation to add the slide to
+            slide_layout: Layout the slide was rendered from
+            slide_xml: Serialized slide part
+        """
+        presentation_part = presentation.part
+        slide_part = SlidePart(presentation_part._next_slide_partname, CT.PML_SLIDE,
+                               presentation_part.package, parse_xml(slide_xml))
+        slide_part.relate_to(slide_layout.part, RT.SLIDE_LAYOUT)
+        rId = presentation_part.relate_to(slide_part, RT.SLIDE)
+        presentation.slides._sldIdLst.add_sldId(rId)
+
+    def _remove_slides(self, presentation):
+        """Remove all slides from a presentation, keeping masters and layouts."""
+        while len(presentation.slides) > 0:
+            rId = presentation.slides._sldIdLst[0].rId
+            presentation.part.drop_rel(rId)
+            presentation.slides._sldIdLst.remove(presentation.slides._sldIdLst[0])
+
+    @staticmethod
+    def can_stream(slides_data: List[Dict[str, Any]]) -> bool:
+        """
+        Whether a deck can be streamed.
+
+        The package's part list is written before the first slide, so slides
+        that add parts of their own (charts) cannot be streamed; check this
+        before a response starts rather than failing halfway through the file.
+        """
+        return not any(adds_parts(slide_data) for slide_data in slides_data)
+
+    def stream_presentation_from_slides(self, slides_data: List[Dict[str, Any]]) -> Iterator[bytes]:
+        """
+        Create a presentation from slide data and stream it as .pptx bytes.
+
+        Template parts and the slide index are written first, then slides are
+        rendered one at a time and written as soon as each is done. Memory
+        stays at the template plus one slide regardless of deck length. The
+        loaded template serves as the scratch presentation, so the handler
+        cannot be reused afterwards (a shared template is opened again instead).
+
+        A generator: layout planning and opening a shared template happen on
+        the first next(), so callers can run that off the event loop.
+
+        Args:
+            slides_data: List of slide data dictionaries
+
         Returns:
-            int: Layout index to use
+            Iterator over consecutive chunks of the .pptx file
+
+        Raises:
+            ValueError: On the first next(), if the template is not loaded or
+                the deck cannot be streamed (see can_stream)
         """
-        # Only the first slide (slide_index 0) should use layout 0 (title layout)
-        if slide_index == 0:
-            selected_layout = 0
-            logger.info(f"TITLE SLIDE: Using layout 0 ({self.slide_layouts[0]['name']}) for slide {slide_index + 1} (type: '{slide_type}')")
-            return selected_layout
+        if not self.presentation:
+            raise ValueError("Template not loaded")
+        if not self.can_stream(slides_data):
+            raise ValueError("Deck has slides with charts and cannot be streamed")
+
+        # Layout choice depends on slide position, so it is made up front
+        layout_indices = [self._get_appropriate_layout(slide_data.get('type', 'content'), i)
+                          for i, slide_data in enumerate(slides_data)]
+        presentation = Presentation(self.template_path) if self._shared_presentation else self.presentation
+        yield from iter_zip(self._iter_streamed_package(presentation, slides_data, layout_indices))
+
+    def _iter_streamed_package(self, presentation, slides_data: List[Dict[str, Any]],
+                               layout_indices: List[int]) -> Iterator[Tuple[str, bytes]]:
+        """Yield (member name, bytes) for every part of the streamed package."""
+        presentation_part = presentation.part
+        package = presentation_part.package
+        self._remove_slides(presentation)
+        template_parts = list(package.iter_parts())
+
+        # Slide parts do not exist yet; reserve their names, rIds and ids now
+        slide_partnames = [PackURI(f'/ppt/slides/slide{n}.xml') for n in range(1, len(slides_data) + 1)]
+        presentation_rels = parse_xml(presentation_part.rels.xml)
+        sldIdLst = presentation.slides._sldIdLst
+        used_rIds = set(presentation_part.rels.keys())
+        next_rId = 1
+        for offset, partname in enumerate(slide_partnames):
+            while f'rId{next_rId}' in used_rIds:
+                next_rId += 1
+            rId = f'rId{next_rId}'
+            next_rId += 1
+            presentation_rels.add_rel(rId, RT.SLIDE, partname.relative_ref(presentation_part.partname.baseURI))
+            sldIdLst._add_sldId(id=256 + offset, rId=rId)
+        presentation_xml = presentation_part.blob
+        for sldId in list(sldIdLst.sldId_lst):
+            sldIdLst.remove(sldId)
+
+        content_types = _ContentTypesItem.xml_for(
+            template_parts + [_StreamedSlidePart(partname, CT.PML_SLIDE) for partname in slide_partnames]
+        )
+        yield '[Content_Types].xml', serialize_part_xml(content_types)
+        yield '_rels/.rels', package._rels.xml
+        for part in template_parts:
+            if part is presentation_part:
+                yield part.partname.membername, presentation_xml
+                yield part.partname.rels_uri.membername, presentation_rels.xml_file_bytes
+                continue
+            yield part.partname.membername, part.blob
+            if len(part.rels):
+                yield part.partname.rels_uri.membername, part.rels.xml
+
+        trace = RenderTrace(logger)
+        use_cache = self.slide_cache is not None and self.slide_cache.enabled and self.template_hash
+        cache_hits = 0
+
+        for i, (slide_data, layout_index, partname) in enumerate(zip(slides_data, layout_indices, slide_partnames)):
+            slide_type = slide_data.get('type', 'content')
+            slide_layout = presentation.slide_layouts[layout_index]
+
+            cache_key = None
+            slide_xml = None
+            if use_cache:
+                cache_key = (self.template_hash, layout_index, slide_content_hash(slide_data))
+                slide_xml = self.slide_cache.get(cache_key)
+
+            if slide_xml is not None:
+                cache_hits += 1
+                trace.slide(i, layout_index, slide_type, {'title': 'cache', 'content': 'cache'})
+                slide_rels = CT_Relationships.new()
+                slide_rels.add_rel('rId1', RT.SLIDE_LAYOUT, slide_layout.part.partname.relative_ref(partname.baseURI))
+                rels_xml = slide_rels.xml_file_bytes
+            else:
+                # Render on a scratch slide, serialize it and drop it again
+                slide = presentation.slides.add_slide(slide_layout)
+                fill = self._fill_slide_content(slide, slide_data)
+                trace.slide(i, layout_index, slide_type, fill)
+
+                # can_stream() rules these out up front; the file is already half sent here
+                if any(not rel.is_external and rel.reltype != RT.SLIDE_LAYOUT
+                       for rel in slide.part.rels.values()):
+                    raise ValueError(f"Slide {i + 1} references parts that cannot be streamed")
+                slide_xml = slide.part.blob
+                rels_xml = slide.part.rels.xml
+                if cache_key and len(slide.part.rels) == 1:
+                    self.slide_cache.put(cache_key, slide_xml)
+                self._remove_slides(presentation)
+
+            yield partname.membername, slide_xml
+            yield partname.rels_uri.membername, rels_xml
+
+        trace.emit(template=self.template_path, cache_hits=cache_hits, streamed=True)
+
+    def _find_preferred_layouts(self) -> Tuple[List[int], List[int]]:
+        """
+        Find non-title layouts suitable for content slides.
+        
+        The scan only depends on the template, so it runs once per loaded
+        template rather than once per slide.
+        
+        Returns:
+            Tuple of (layouts with content placeholders, layouts with multiple text frames)
+        """
+        if self._preferred_layouts is not None:
+            return self._preferred_layouts
         
-        # For all other slides, avoid title-like layouts and use content layouts
         # Find layouts that have content placeholders (type 2)
         content_layouts = []
         for i, layout_info in enumerate(self.slide_layouts):
@@ -367,7 +606,7 @@ class TemplateHandler:
             if has_content_placeholder:
                 content_layouts.append(i)
         
-        logger.info(f"Found {len(content_layouts)} layouts with content placeholders: {content_layouts}")
+        log_event(logger, logging.DEBUG, 'content_layouts_found', layouts=content_layouts)
         
         # Find layouts with multiple text frames (good for content), excluding title layouts
         text_frame_layouts = []
@@ -386,7 +625,31 @@ class TemplateHandler:
             if text_frame_count >= 2:
                 text_frame_layouts.append(i)
         
-        logger.info(f"Found {len(text_frame_layouts)} layouts with multiple text frames: {text_frame_layouts}")
+        log_event(logger, logging.DEBUG, 'text_frame_layouts_found', layouts=text_frame_layouts)
+        
+        self._preferred_layouts = (content_layouts, text_frame_layouts)
+        return self._preferred_layouts
+    
+    def _get_appropriate_layout(self, slide_type: str, slide_index: int = 0) -> int:
+        """
+        Get the most appropriate layout index for a slide type.
+        
+        Args:
+            slide_type: Type of slide (title, content, etc.)
+            slide_index: Index of the slide for variety
+            
+        Returns:
+            int: Layout index to use
+        """
+        # Only the first slide (slide_index 0) should use layout 0 (title layout)
+        if slide_index == 0:
+            selected_layout = 0
+            log_event(logger, logging.DEBUG, 'layout_selected', rule='title', slide=slide_index + 1,
+                      layout=selected_layout, type=slide_type)
+            return selected_layout
+        
+        # For all other slides, avoid title-like layouts and use content layouts
+        content_layouts, text_frame_layouts = self._find_preferred_layouts()
         
         # Create a combined list prioritizing content layouts, then text frame layouts
         preferred_layouts = content_layouts + [layout for layout in text_frame_layouts if layout not in content_layouts]
@@ -395,9 +658,9 @@ class TemplateHandler:
             # Use progressive selection from preferred layouts
             layout_index = slide_index % len(preferred_layouts)
             selected_layout = preferred_layouts[layout_index]
-            layout_name = self.slide_layouts[selected_layout]['name']
-            layout_type = "CONTENT" if selected_layout in content_layouts else "TEXT FRAME"
-            logger.info(f"{layout_type} LAYOUT: Slide {slide_index + 1} using layout {selected_layout} ({layout_name}) for type '{slide_type}'")
+            log_event(logger, logging.DEBUG, 'layout_selected',
+                      rule='content' if selected_layout in content_layouts else 'text_frame',
+                      slide=slide_index + 1, layout=selected_layout, type=slide_type)
             return selected_layout
         
         # Final fallback: use progressive distribution from all layouts except title layout
@@ -406,16 +669,18 @@ class TemplateHandler:
             # Use slide_index to select from non-title layouts
             layout_index = slide_index % len(all_layouts)
             selected_layout = all_layouts[layout_index]
-            logger.info(f"PROGRESSIVE FALLBACK: Slide {slide_index + 1} using layout {selected_layout} ({self.slide_layouts[selected_layout]['name']}) for type '{slide_type}'")
+            log_event(logger, logging.DEBUG, 'layout_selected', rule='progressive_fallback',
+                      slide=slide_index + 1, layout=selected_layout, type=slide_type)
             return selected_layout
         
         # Final fallback to first available layout (should never happen)
-        logger.info(f"FINAL FALLBACK: Using layout 1 for slide type '{slide_type}'")
+        log_event(logger, logging.DEBUG, 'layout_selected', rule='final_fallback',
+                  slide=slide_index + 1, type=slide_type)
         return 1 if len(self.slide_layouts) > 1 else 0
 
 
 def process_template_request(template_path: str, slides_data: List[Dict[str, Any]], 
-                           output_path: str) -> Dict[str, Any]:
+                           output_path: str, handler: Optional[TemplateHandler] = None) -> Dict[str, Any]:
     """
     Process a template request and create a presentation.
     
@@ -423,16 +688,18 @@ def process_template_request(template_path: str, slides_data: List[Dict[str, Any
         template_path: Path to the template file
         slides_data: List of slide data
         output_path: Path where to save the output
+        handler: Handler with the template already loaded (e.g. a preloaded one)
         
     Returns:
         Dict containing success status and metadata
     """
     try:
         # Initialize template handler
-        handler = TemplateHandler(template_path)
+        if handler is None:
+            handler = TemplateHandler(template_path)
         
         # Load template
-        if not handler.load_template():
+        if not handler.presentation and not handler.load_template():
             return {
                 'success': False,
                 'error': 'Failed to load template'
@@ -460,7 +727,7 @@ def process_template_request(template_path: str, slides_data: List[Dict[str, Any
             }
             
     except Exception as e:
-        logger.error(f"Template processing failed: {e}")
+        log_event(logger, logging.ERROR, 'template_processing_failed', error=str(e))
         return {
             'success': False,
             'error': str(e)
@@ -468,6 +735,8 @@ def process_template_request(template_path: str, slides_data: List[Dict[str, Any
 
 
 if __name__ == "__main__":
+    configure_logging()
+    
     # Example usage
     template_path = "example_template.pptx"
     slides_data = [
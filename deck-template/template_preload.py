@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Hot templates parsed before the server forks
+
+Under the pre-fork server (prefork_server.py) the master process downloads,
+parses and analyzes the hot templates once and then forks its workers, so
+every worker starts with them already in memory. The pages stay shared
+copy-on-write between the workers as long as nothing writes to them. The
+master freezes the collector's view of them (gc.freeze) before forking, so
+garbage collections in the workers do not touch their object headers.
+
+A preloaded template is used read-only. Its parsed presentation and layout
+analysis answer layout questions and the template info endpoint, and its
+bytes stay in a local file, so requests for it skip the S3 download. That is
+the limit of the sharing: every render still parses the template file again
+(Presentation(template_path)) into a private package to add slides to, so
+the memory of a render in progress is not shared between workers. What the
+workers share is the loaded handler, not the render inputs.
+
+Memory is reported per process as RSS, PSS and USS (unique set size, the
+pages no other process maps) from /proc/<pid>/smaps_rollup. Worker USS is
+what each additional worker costs.
+
+Environment:
+    PRELOAD_TEMPLATES: Comma-separated ids of the templates the pre-fork master preloads
+"""
+
+import gc
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from structured_logging import log_event
+from template_handler import TemplateHandler
+
+logger = logging.getLogger(__name__)
+
+PRELOAD_TEMPLATES = [template_id.strip() for template_id in os.getenv("PRELOAD_TEMPLATES", "").split(",")
+                     if template_id.strip()]
+
+# Set in the pre-fork master before it forks, so workers can find their siblings
+prefork_master_pid: Optional[int] = None
+
+_SMAPS_FIELDS = {'Rss', 'Pss', 'Private_Clean', 'Private_Dirty', 'Shared_Clean', 'Shared_Dirty'}
+
+
+class PreloadedTemplate:
+    """A template parsed and analyzed once, shared read-only by every request."""
+
+    def __init__(self, template_id: str, s3_key: str, path: str, handler: TemplateHandler):
+        self.template_id = template_id
+        self.s3_key = s3_key
+        self.path = path
+        self.loaded = handler
+
+    @property
+    def content_hash(self) -> str:
+        return self.loaded.template_hash
+
+    def handler(self) -> TemplateHandler:
+        """A request's handler, sharing the parsed template and layout analysis."""
+        return TemplateHandler.from_loaded(self.loaded)
+
+
+# s3_key -> preloaded template; filled before forking, read-only afterwards
+_preloaded: Dict[str, PreloadedTemplate] = {}
+_lock = threading.Lock()
+
+
+def preload_template(template_id: str, s3_key: str, path: str) -> Optional[PreloadedTemplate]:
+    """
+    Parse and analyze a downloaded template and keep it for later requests.
+
+    Args:
+        template_id: Template id (company_files.filename)
+        s3_key: S3 key the template was downloaded from; requests look it up by this
+        path: Local copy of the template, kept until clear_preloaded()
+
+    Returns:
+        The preloaded template, or None if it could not be loaded
+    """
+    handler = TemplateHandler(path)
+    if not handler.load_template():
+        return None
+    # Computed once here instead of on the first content slide of every request
+    handler._find_preferred_layouts()
+    preloaded = PreloadedTemplate(template_id, s3_key, path, handler)
+    with _lock:
+        _preloaded[s3_key] = preloaded
+    log_event(logger, logging.INFO, 'template_preloaded', template_id=template_id,
+              layouts=len(handler.slide_layouts), file_size=handler.template_info.get('file_size'))
+    return preloaded
+
+
+def preloaded_template(s3_key: str) -> Optional[PreloadedTemplate]:
+    """The preloaded template downloaded from `s3_key`, if any."""
+    return _preloaded.get(s3_key)
+
+
+def preloaded_templates() -> List[PreloadedTemplate]:
+    with _lock:
+        return list(_preloaded.values())
+
+
+def clear_preloaded():
+    """Forget the preloaded templates and delete their local files."""
+    with _lock:
+        templates = list(_preloaded.values())
+        _preloaded.clear()
+    for template in templates:
+        try:
+            os.unlink(template.path)
+        except OSError:
+            pass
+
+
+def freeze_for_fork() -> int:
+    """
+    Move every object allocated so far out of the collector's generations.
+
+    Called in the master right before forking. Frozen objects are never
+    traversed by collections, so the workers do not write to the pages
+    holding the parsed templates.
+
+    Returns:
+        Number of frozen objects
+    """
+    gc.collect()
+    gc.freeze()
+    return gc.get_freeze_count()
+
+
+def process_memory(pid: Optional[int] = None) -> Optional[Dict[str, float]]:
+    """
+    RSS, PSS and USS of a process in MB.
+
+    Returns:
+        Dict with rss_mb, pss_mb, uss_mb and shared_mb, or None where
+        /proc/<pid>/smaps_rollup is not available
+    """
+    values = {}
+    try:
+        with open(f"/proc/{pid or os.getpid()}/smaps_rollup") as f:
+            for line in f:
+                name, _, rest = line.partition(':')
+                if name in _SMAPS_FIELDS:
+                    values[name] = int(rest.split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    if not values:
+        return None
+    to_mb = lambda kb: round(kb / 1024, 1)
+    return {
+        'rss_mb': to_mb(values.get('Rss', 0)),
+        'pss_mb': to_mb(values.get('Pss', 0)),
+        'uss_mb': to_mb(values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)),
+        'shared_mb': to_mb(values.get('Shared_Clean', 0) + values.get('Shared_Dirty', 0)),
+    }
+
+
+def child_pids(pid: int) -> List[int]:
+    """Child processes of `pid` (Linux only; empty elsewhere)."""
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except (OSError, ValueError):
+        return []
+
+
+def memory_report() -> Dict[str, Any]:
+    """
+    Memory of this server's processes.
+
+    Under the pre-fork server this covers the master and every worker;
+    otherwise only the current process.
+    """
+    master = prefork_master_pid
+    worker_pids = child_pids(master) if master else [os.getpid()]
+    workers = [{'pid': pid, **(process_memory(pid) or {})} for pid in worker_pids]
+    uss = [worker['uss_mb'] for worker in workers if 'uss_mb' in worker]
+    return {
+        'prefork': master is not None,
+        'pid': os.getpid(),
+        'master': {'pid': master, **(process_memory(master) or {})} if master else None,
+        'workers': workers,
+        'worker_uss_total_mb': round(sum(uss), 1) if uss else None,
+        'preloaded_templates': [template.template_id for template in preloaded_templates()],
+        'gc_frozen_objects': gc.get_freeze_count(),
+    }
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for render admission control: a full queue gets 429, a wait that
+times out gets 503, and a job bigger than the budget runs alone
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from admission import AdmissionRejected, MemoryAdmissionController
+
+
+def _controller(**kwargs) -> MemoryAdmissionController:
+    options = {'budget_bytes': 100, 'max_queue': 1, 'queue_timeout': 5.0}
+    options.update(kwargs)
+    return MemoryAdmissionController(**options)
+
+
+async def _queued(controller, count: int = 1):
+    while controller.status()['queue_depth'] < count:
+        await asyncio.sleep(0.001)
+
+
+def test_full_queue_is_rejected():
+    async def run():
+        controller = _controller()
+        await controller.acquire(100)
+        waiting = asyncio.ensure_future(controller.acquire(50))
+        await _queued(controller)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire(50)
+        assert rejected.value.status_code == 429
+        assert rejected.value.retry_after >= 1
+
+        controller.release(100)
+        await waiting
+        return controller.status()
+
+    status = asyncio.run(run())
+    assert status['running'] == 1
+    assert status['rejected_total'] == 1
+
+
+def test_queue_timeout_is_rejected():
+    async def run():
+        controller = _controller(queue_timeout=0.05)
+        await controller.acquire(100)
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire(50)
+        return controller, rejected.value
+
+    controller, rejected = asyncio.run(run())
+    assert rejected.status_code == 503
+    assert rejected.retry_after >= 1
+    assert controller.status()['queue_depth'] == 0
+    assert controller.status()['in_use_bytes'] == 100
+
+
+def test_oversized_job_runs_alone():
+    async def run():
+        controller = _controller(max_queue=4)
+        # Bigger than the whole budget, but nothing else is running
+        await controller.acquire(500)
+        assert controller.status()['running'] == 1
+
+        small = asyncio.ensure_future(controller.acquire(10))
+        await _queued(controller)
+        assert not small.done()
+
+        controller.release(500)
+        await small
+        # Behind a running job, the oversized job waits until it is alone
+        big = asyncio.ensure_future(controller.acquire(500))
+        await _queued(controller)
+        controller.release(10)
+        await big
+        return controller.status()
+
+    status = asyncio.run(run())
+    assert status['running'] == 1
+    assert status['in_use_bytes'] == 500
+
+
+def test_queued_jobs_start_in_order():
+    async def run():
+        controller = _controller(max_queue=4)
+        await controller.acquire(100)
+        started = []
+
+        async def job(name, estimate):
+            await controller.acquire(estimate)
+            started.append(name)
+
+        first = asyncio.ensure_future(job('first', 80))
+        await _queued(controller, 1)
+        second = asyncio.ensure_future(job('second', 10))
+        await _queued(controller, 2)
+        # The small job fits after the first one but does not overtake it
+        controller.release(100)
+        await asyncio.gather(first, second)
+        return started
+
+    assert asyncio.run(run()) == ['first', 'second']
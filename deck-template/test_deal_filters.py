@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Tests for export filters: the WHERE clause and its parameters, request
+validation and the cache key options
+"""
+
+import os
+import re
+import sys
+from datetime import date, datetime
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+from deal_filters import DealFilters, deal_filters
+
+EVERY_FILTER = DealFilters(stage=['Proposal', 'Negotiation'], ae_assigned=3, sales_manager=4, company_id=7,
+                           expected_close_from=date(2025, 1, 1), expected_close_to=date(2025, 12, 31),
+                           updated_since=datetime(2025, 6, 1, 12))
+
+
+def test_no_filters_no_where():
+    assert DealFilters().where() == ('', {})
+    assert DealFilters().where(paramstyle='format') == ('', [])
+
+
+def test_conditions_follow_the_index_columns():
+    where, params = EVERY_FILTER.where()
+    assert where == (' WHERE company_id = :company_id AND stage IN (:stage_0, :stage_1)'
+                     ' AND ae_assigned = :ae_assigned AND sales_manager = :sales_manager'
+                     ' AND expected_close_date >= :expected_close_from'
+                     ' AND expected_close_date <= :expected_close_to AND updated_at >= :updated_since')
+    assert set(re.findall(r':(\w+)', where)) == set(params)
+    assert params['stage_1'] == 'Negotiation'
+
+
+def test_format_paramstyle_matches_named():
+    named, params = EVERY_FILTER.where()
+    positional, values = EVERY_FILTER.where(paramstyle='format')
+    assert positional == re.sub(r':\w+', '%s', named)
+    assert values == [params[name] for name in re.findall(r':(\w+)', named)]
+
+    with pytest.raises(ValueError):
+        EVERY_FILTER.where(paramstyle='qmark')
+
+
+def test_values_are_never_inlined():
+    hostile = DealFilters(stage=["Won'; DROP TABLE deals; --"])
+    where, params = hostile.where()
+    assert 'DROP' not in where
+    assert params == {'stage_0': "Won'; DROP TABLE deals; --"}
+
+
+def _dependency(**kwargs) -> DealFilters:
+    options = {'stage': None, 'ae_assigned': None, 'sales_manager': None, 'company_id': None,
+               'expected_close_from': None, 'expected_close_to': None, 'updated_since': None}
+    options.update(kwargs)
+    return deal_filters(**options)
+
+
+def test_dependency_validates_the_close_window():
+    with pytest.raises(HTTPException) as rejected:
+        _dependency(expected_close_from=date(2025, 2, 1), expected_close_to=date(2025, 1, 1))
+    assert rejected.value.status_code == 400
+    assert _dependency(expected_close_from=date(2025, 1, 1), expected_close_to=date(2025, 1, 1))
+    # Empty stage values do not filter
+    assert _dependency(stage=['', 'Won']).stage == ['Won']
+
+
+def test_cache_options_ignore_stage_order_and_repeats():
+    a = DealFilters(stage=['Won', 'Lost', 'Won'])
+    b = DealFilters(stage=['Lost', 'Won'])
+    assert a.cache_options() == b.cache_options()
+    assert a.cache_options() != DealFilters(stage=['Won']).cache_options()
+
+
+def test_filters_select_the_matching_rows(tmp_path):
+    from local_stack import StackConfig, make_engine
+    from synthetic_deals import create_schema, seed_deals
+
+    engine = make_engine(StackConfig(work_dir=str(tmp_path)))
+    create_schema(engine)
+    seed_deals(engine, 200)
+    with engine.connect() as conn:
+        stage = conn.execute(text("SELECT stage FROM deals LIMIT 1")).scalar_one()
+        expected = conn.execute(text("SELECT COUNT(*) FROM deals WHERE stage = :stage"),
+                                {'stage': stage}).scalar_one()
+        where, params = DealFilters(stage=[stage]).where()
+        assert conn.execute(text("SELECT COUNT(*) FROM deals" + where), params).scalar_one() == expected
+        where, params = DealFilters(company_id=-1).where()
+        assert conn.execute(text("SELECT COUNT(*) FROM deals" + where), params).scalar_one() == 0
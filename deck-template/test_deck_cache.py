@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for the disk deck cache shared by several workers through one directory
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from deck_cache import DiskDeckCache
+
+
+def _deck(tmp_path, size=100):
+    path = tmp_path / 'deck.pptx'
+    path.write_bytes(b'x' * size)
+    return str(path)
+
+
+def test_workers_find_each_others_decks(tmp_path):
+    directory = str(tmp_path / 'cache')
+    first = DiskDeckCache(directory, 10_000, 60)
+    second = DiskDeckCache(directory, 10_000, 60)
+
+    first.put('deck', _deck(tmp_path))
+    cached = second.get('deck')
+    assert cached is not None
+    assert cached.path == os.path.join(directory, 'deck.pptx')
+
+
+def test_size_bound_counts_every_workers_decks(tmp_path):
+    directory = str(tmp_path / 'cache')
+    first = DiskDeckCache(directory, 250, 60)
+    second = DiskDeckCache(directory, 250, 60)
+    deck = _deck(tmp_path)
+
+    first.put('a', deck)
+    time.sleep(0.01)
+    second.put('b', deck)
+    time.sleep(0.01)
+    first.put('c', deck)
+
+    # The oldest deck goes, whichever worker stored it
+    assert sorted(os.listdir(directory)) == ['b.pptx', 'c.pptx']
+    assert second.get('a') is None
+    assert second.get('c') is not None
+
+
+def test_eviction_keeps_recently_used_decks(tmp_path):
+    directory = str(tmp_path / 'cache')
+    first = DiskDeckCache(directory, 250, 60)
+    second = DiskDeckCache(directory, 250, 60)
+    deck = _deck(tmp_path)
+
+    first.put('a', deck)
+    time.sleep(0.01)
+    first.put('b', deck)
+    time.sleep(0.01)
+    # Another worker's hit counts as a use
+    assert second.get('a') is not None
+    time.sleep(0.01)
+    first.put('c', deck)
+
+    assert sorted(os.listdir(directory)) == ['a.pptx', 'c.pptx']
+    # The hit did not extend the TTL
+    assert os.path.getmtime(os.path.join(directory, 'a.pptx')) < os.path.getatime(os.path.join(directory, 'a.pptx'))
+
+
+def test_put_without_other_writers_does_not_rescan(tmp_path, monkeypatch):
+    cache = DiskDeckCache(str(tmp_path / 'cache'), 10_000, 60)
+    deck = _deck(tmp_path)
+    cache.put('a', deck)
+
+    def rescan():
+        raise AssertionError("directory was rescanned")
+    monkeypatch.setattr(cache, '_rebuild_index', rescan)
+    cache.put('b', deck)
+    assert cache.stats()['entries'] == 2
+    assert cache.stats()['bytes'] == 200
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Tests for the export snapshot cache: concurrent requests share one build,
+failed or abandoned builds are not cached, and ETags turn repeats into 304s
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+from export_cache import ExportSnapshotCache, etag_for, etag_matches
+
+
+def _waiters(cache, key, count):
+    """Start `count` threads acquiring `key`; returns their results list and threads."""
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.acquire(key))) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()['coalesced'] < count:
+        assert time.monotonic() < deadline, "requests did not wait for the build"
+        time.sleep(0.001)
+    return results, threads
+
+
+def test_concurrent_requests_share_one_build():
+    cache = ExportSnapshotCache(1024)
+    assert cache.acquire('k') == (None, True)
+    results, threads = _waiters(cache, 'k', 3)
+
+    cache.release('k', b'workbook')
+    for thread in threads:
+        thread.join(5)
+    assert results == [(b'workbook', False)] * 3
+    assert cache.acquire('k') == (b'workbook', False)
+    assert cache.stats()['misses'] == 1
+
+
+def test_failed_build_is_not_cached():
+    cache = ExportSnapshotCache(1024)
+    cache.acquire('k')
+    results, threads = _waiters(cache, 'k', 2)
+
+    cache.release('k', None)
+    for thread in threads:
+        thread.join(5)
+    # Waiters build without caching; the next request owns a new build
+    assert results == [(None, False)] * 2
+    assert cache.acquire('k') == (None, True)
+
+
+def test_tee_stores_only_complete_streams_within_the_bound():
+    cache = ExportSnapshotCache(10)
+    cache.acquire('done')
+    assert b''.join(cache.tee('done', [b'abc', b'def'])) == b'abcdef'
+    assert cache.acquire('done') == (b'abcdef', False)
+
+    cache.acquire('abandoned')
+    body = cache.tee('abandoned', [b'abc', b'def'])
+    next(body)
+    body.close()
+    assert cache.acquire('abandoned') == (None, True)
+
+    cache.acquire('big')
+    assert b''.join(cache.tee('big', [b'x' * 6, b'x' * 6])) == b'x' * 12
+    assert cache.acquire('big') == (None, True)
+
+
+def test_etag_matching():
+    etag = etag_for('a' * 64)
+    assert etag == '"' + 'a' * 32 + '"'
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches('*', etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from local_stack import StackConfig, configure_export_api, make_engine
+    from synthetic_deals import create_schema, seed_deals
+
+    config = StackConfig(work_dir=str(tmp_path))
+    engine = make_engine(config)
+    create_schema(engine)
+    seed_deals(engine, 50)
+    app = configure_export_api(config)
+    import export_pivot_api
+    monkeypatch.setattr(export_pivot_api, 'engine', engine)
+    monkeypatch.setattr(export_pivot_api, 'export_cache', ExportSnapshotCache(64 * 1024 * 1024))
+    return TestClient(app), engine
+
+
+@pytest.mark.parametrize('stream', [False, True])
+def test_repeat_exports_hit_the_cache_and_revalidate(client, stream):
+    client, engine = client
+    url = f'/export-pipeline-template?stream={str(stream).lower()}'
+
+    first = client.get(url)
+    assert first.status_code == 200
+    assert first.headers['X-Export-Cache'] == 'MISS'
+    etag = first.headers['ETag']
+
+    second = client.get(url)
+    assert second.headers['X-Export-Cache'] == 'HIT'
+    assert second.headers['ETag'] == etag
+    assert second.content == first.content
+
+    not_modified = client.get(url, headers={'If-None-Match': etag})
+    assert not_modified.status_code == 304
+    assert not not_modified.content
+
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE deals SET updated_at = '2999-01-01 00:00:00' WHERE id = 1"))
+    changed = client.get(url, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['X-Export-Cache'] == 'MISS'
+    assert changed.headers['ETag'] != etag
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Tests for background export jobs: only the submitting user sees a job, and
+results are kept while downloads run and swept when left behind
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+from export_jobs import ExportJobManager
+
+
+def _wait(manager, job, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while job.status in ('queued', 'running'):
+        assert time.monotonic() < deadline, "export job did not finish"
+        time.sleep(0.01)
+    return manager.get(job.id)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    return ExportJobManager(str(tmp_path), workers=1, per_user_limit=2, ttl_seconds=60)
+
+
+def _finished_job(manager, user='ann'):
+    job = manager.submit(user, lambda job: iter([b'deal,value\n', b'a,1\n']), 'deals.csv', 'text/csv')
+    return _wait(manager, job)
+
+
+def _expire_now(job):
+    job.expires_at = time.time() - 1
+
+
+def test_jobs_are_only_visible_to_their_user(manager):
+    job = _finished_job(manager)
+    assert manager.get(job.id, 'ann') is job
+    assert manager.get(job.id, 'bob') is None
+    assert manager.start_download(job.id, 'bob') is None
+    assert [listed.id for listed in manager.list('bob')] == []
+
+
+def test_expiry_waits_for_running_downloads(manager):
+    job = _finished_job(manager)
+    assert manager.start_download(job.id, 'ann') is job
+    _expire_now(job)
+
+    manager.expire()
+    assert manager.get(job.id) is job
+    assert os.path.exists(job.path)
+
+    manager.finish_download(job)
+    manager.expire()
+    assert manager.get(job.id) is None
+    assert job.status == 'expired'
+    assert not os.path.exists(job.path)
+
+
+def test_abandoned_download_holds_the_file_for_one_ttl(manager):
+    job = _finished_job(manager)
+    manager.start_download(job.id, 'ann')
+    _expire_now(job)
+    job.last_download_at = time.time() - manager.ttl_seconds - 1
+
+    manager.expire()
+    assert manager.get(job.id) is None
+    assert not os.path.exists(job.path)
+
+
+def test_constructor_sweeps_old_results(tmp_path):
+    old = tmp_path / 'old-deals.csv'
+    partial = tmp_path / 'tmp123.tmp'
+    recent = tmp_path / 'recent-deals.csv'
+    for path in (old, partial, recent):
+        path.write_bytes(b'x')
+    stale = time.time() - 120
+    os.utime(old, (stale, stale))
+    os.utime(partial, (stale, stale))
+
+    ExportJobManager(str(tmp_path), workers=1, ttl_seconds=60)
+    assert sorted(os.listdir(tmp_path)) == ['recent-deals.csv']
+
+
+def test_api_returns_404_for_another_users_job(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+    from local_stack import StackConfig, configure_export_api, make_engine
+    from synthetic_deals import create_schema, seed_deals
+
+    config = StackConfig(work_dir=str(tmp_path))
+    engine = make_engine(config)
+    create_schema(engine)
+    seed_deals(engine, 50)
+    app = configure_export_api(config)
+    import export_pivot_api
+    manager = ExportJobManager(str(tmp_path / 'jobs'), workers=1, ttl_seconds=60)
+    monkeypatch.setattr(export_pivot_api, 'export_jobs', manager)
+
+    client = TestClient(app)
+    response = client.post('/export-jobs?export_format=csv', headers={'X-User-Id': 'ann'})
+    assert response.status_code == 202
+    job = _wait(manager, manager.get(response.json()['job_id']))
+    assert job.status == 'done'
+
+    for url in (f'/export-jobs/{job.id}', f'/export-jobs/{job.id}/download'):
+        assert client.get(url, headers={'X-User-Id': 'bob'}).status_code == 404
+        assert client.get(url).status_code == 404
+    assert client.get(f'/export-jobs/{job.id}', headers={'X-User-Id': 'ann'}).status_code == 200
+
+    download = client.get(f'/export-jobs/{job.id}/download', headers={'X-User-Id': 'ann'})
+    assert download.status_code == 200
+    assert download.content
+    # The finished response released the file for expiry
+    assert job.downloads == 0
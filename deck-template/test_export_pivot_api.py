@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the export endpoints: exports queued by the scheduler wait on the
+event loop, not on threadpool threads
+"""
+
+import asyncio
+import os
+import sys
+
+import anyio
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+from job_scheduler import JobOptions, JobScheduler
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    from local_stack import StackConfig, configure_export_api, make_engine
+    from synthetic_deals import create_schema, seed_deals
+
+    config = StackConfig(work_dir=str(tmp_path))
+    engine = make_engine(config)
+    create_schema(engine)
+    seed_deals(engine, 50)
+    configure_export_api(config)
+    import export_pivot_api
+    monkeypatch.setattr(export_pivot_api, 'engine', engine)
+    monkeypatch.setattr(export_pivot_api, 'export_cache', None)
+    monkeypatch.setattr(export_pivot_api, 'export_scheduler',
+                        JobScheduler(slots=1, max_queue=8, interactive_deadline=None))
+    return export_pivot_api
+
+
+def test_queued_exports_do_not_hold_threads(api):
+    scheduler = api.export_scheduler
+    urls = ['/export-pipeline-template', '/export-pipeline-template?stream=true', '/export-pipeline-data/csv']
+
+    async def run():
+        blocker = scheduler.job(JobOptions('blocker'), 'test', 1)
+        await scheduler.acquire(blocker)
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url='http://test') as client:
+            requests = [asyncio.ensure_future(client.get(url)) for url in urls]
+            while sum(scheduler.status()['queued'].values()) < len(urls):
+                await asyncio.sleep(0.01)
+            threads_in_use = anyio.to_thread.current_default_thread_limiter().borrowed_tokens
+            scheduler.release(blocker, observe=False)
+            responses = await asyncio.gather(*requests)
+        return threads_in_use, responses
+
+    threads_in_use, responses = asyncio.run(run())
+    assert threads_in_use == 0
+    assert [response.status_code for response in responses] == [200, 200, 200]
+    assert all(response.content for response in responses)
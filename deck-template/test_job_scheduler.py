@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Tests for the render and export job scheduler: fair ordering between
+tenants, batch jobs not starved by interactive ones and up-front deadline
+rejection
+"""
+
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from admission import AdmissionRejected
+from job_scheduler import BATCH, INTERACTIVE, CostModel, JobOptions, JobScheduler
+
+
+def _scheduler(**kwargs) -> JobScheduler:
+    options = {'slots': 1, 'max_queue': 32, 'interactive_deadline': None}
+    options.update(kwargs)
+    return JobScheduler(**options)
+
+
+def _queued(scheduler) -> int:
+    return sum(scheduler.status()['queued'].values())
+
+
+def _start_order(scheduler, jobs):
+    """
+    Queue `jobs` (name, tenant, priority) behind a running job, in order,
+    then let them run one at a time and return the names in start order.
+    """
+    blocker = scheduler.job(JobOptions('blocker'), 'test', 1)
+    scheduler.acquire_blocking(blocker)
+
+    order = []
+
+    def run(name, job):
+        scheduler.acquire_blocking(job)
+        order.append(name)
+        scheduler.release(job, observe=False)
+
+    threads = []
+    for name, tenant, priority in jobs:
+        job = scheduler.job(JobOptions(tenant, priority), 'test', 1)
+        thread = threading.Thread(target=run, args=(name, job))
+        queued = _queued(scheduler)
+        thread.start()
+        threads.append(thread)
+        # Queue one at a time so ties go to the earlier job
+        deadline = time.monotonic() + 5
+        while _queued(scheduler) == queued:
+            assert time.monotonic() < deadline, "job was not queued"
+            time.sleep(0.001)
+
+    scheduler.release(blocker, observe=False)
+    for thread in threads:
+        thread.join(5)
+    return order
+
+
+def test_tenants_share_slots_fairly():
+    order = _start_order(_scheduler(), [
+        ('a1', 'ann', INTERACTIVE), ('a2', 'ann', INTERACTIVE), ('a3', 'ann', INTERACTIVE),
+        ('b1', 'bob', INTERACTIVE),
+    ])
+    # Bob's single job is not queued behind all of Ann's
+    assert order == ['a1', 'b1', 'a2', 'a3']
+
+
+def test_tenant_weights_scale_the_share():
+    order = _start_order(_scheduler(tenant_weights={'ann': 2.0}), [
+        ('a1', 'ann', INTERACTIVE), ('a2', 'ann', INTERACTIVE), ('a3', 'ann', INTERACTIVE),
+        ('b1', 'bob', INTERACTIVE), ('b2', 'bob', INTERACTIVE),
+    ])
+    assert order == ['a1', 'a2', 'b1', 'a3', 'b2']
+
+
+def test_interactive_first_but_batch_not_starved():
+    order = _start_order(_scheduler(interactive_burst=2), [
+        ('b1', 'ann', BATCH), ('b2', 'ann', BATCH),
+        ('i1', 'bob', INTERACTIVE), ('i2', 'bob', INTERACTIVE),
+        ('i3', 'bob', INTERACTIVE), ('i4', 'bob', INTERACTIVE),
+    ])
+    assert order == ['i1', 'i2', 'b1', 'i3', 'i4', 'b2']
+
+
+def _slow_model(seconds: float = 10.0) -> CostModel:
+    model = CostModel()
+    model.observe('slow', 1, seconds)
+    return model
+
+
+def test_infeasible_deadline_is_rejected_up_front():
+    scheduler = _scheduler(cost_model=_slow_model())
+    running = scheduler.job(JobOptions('ann'), 'slow', 1)
+    scheduler.acquire_blocking(running)
+
+    late = scheduler.job(JobOptions('bob', deadline_seconds=5), 'slow', 1)
+    started = time.monotonic()
+    with pytest.raises(AdmissionRejected) as rejected:
+        scheduler.acquire_blocking(late)
+    assert rejected.value.status_code == 503
+    assert rejected.value.retry_after >= 1
+    assert time.monotonic() - started < 1
+    assert scheduler.status()['rejected_deadline'] == 1
+    assert _queued(scheduler) == 0
+
+
+def test_idle_scheduler_never_rejects():
+    scheduler = _scheduler(cost_model=_slow_model())
+    job = scheduler.job(JobOptions('ann', deadline_seconds=1), 'slow', 1)
+    scheduler.acquire_blocking(job)
+    assert job.state == 'running'
+    scheduler.release(job)
+
+
+def test_full_queue_is_rejected():
+    scheduler = _scheduler(max_queue=0)
+    running = scheduler.job(JobOptions('ann'), 'test', 1)
+    scheduler.acquire_blocking(running)
+    with pytest.raises(AdmissionRejected) as rejected:
+        scheduler.acquire_blocking(scheduler.job(JobOptions('bob'), 'test', 1))
+    assert rejected.value.status_code == 429
+
+
+def test_unknown_size_predicts_the_average():
+    model = CostModel()
+    model.observe('export:csv', 100, 1.0)
+    model.observe('export:csv', 300, 3.0)
+    assert model.predict('export:csv', 200) == pytest.approx(2.0)
+    assert model.predict('export:csv', None) == pytest.approx(2.0, rel=0.1)
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for joined export sheets: an export that ends early must return the
+sheets' shared connection to the pool
+"""
+
+import os
+import sys
+
+import pytest
+from sqlalchemy import text
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+from joined_sheets import joined_sheets
+
+
+@pytest.fixture
+def engine(tmp_path):
+    from local_stack import StackConfig, configure_export_api, make_engine
+    from synthetic_deals import create_schema, seed_deals, seed_users
+
+    config = StackConfig(work_dir=str(tmp_path))
+    engine = make_engine(config)
+    create_schema(engine)
+    seed_users(engine)
+    seed_deals(engine, 50)
+    # The harness schema has no companies table; the joins only need it to exist
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE companies (id INTEGER PRIMARY KEY, name TEXT)"))
+    configure_export_api(config)
+    import export_pivot_api
+    export_pivot_api.engine = engine
+    return engine
+
+
+def test_abandoned_export_returns_the_connection(engine):
+    import export_pivot_api
+
+    sheets = joined_sheets(engine, ['owners'])
+    body = export_pivot_api._closing_sheets(iter([b'deals', b'owners']), sheets)
+    next(body)
+    # The writer reached the first joined sheet, then the client went away
+    next(sheets[0][2])
+    assert engine.pool.checkedout() == 1
+
+    body.close()
+    assert engine.pool.checkedout() == 0
+
+
+def test_unstarted_sheets_hold_no_connection(engine):
+    import export_pivot_api
+
+    sheets = joined_sheets(engine, ['owners'])
+    body = export_pivot_api._closing_sheets(iter([b'deals']), sheets)
+    next(body)
+    body.close()
+    assert engine.pool.checkedout() == 0
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Tests for parallel slide rendering: a broken or hung worker pool must not
+break later renders
+"""
+
+import os
+import signal
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+import parallel_render
+from synthetic_templates import build_synthetic_template
+
+
+@pytest.fixture
+def template_path(tmp_path):
+    path = str(tmp_path / 'template.pptx')
+    build_synthetic_template(path)
+    return path
+
+
+@pytest.fixture
+def two_workers(monkeypatch):
+    monkeypatch.setattr(parallel_render, 'WORKER_COUNT', 2)
+    parallel_render.shutdown_pool()
+    yield
+    parallel_render.shutdown_pool()
+
+
+def _jobs(count=4):
+    return [(i, 1, {'type': 'content', 'title': f'Slide {i}', 'content': 'Body', 'order': i})
+            for i in range(count)]
+
+
+def test_renders_every_slide(template_path, two_workers):
+    rendered = parallel_render.render_slides_parallel(template_path, _jobs())
+    assert sorted(rendered) == [0, 1, 2, 3]
+    assert all(entry[1] for entry in rendered.values())
+
+
+def test_broken_pool_is_replaced(template_path, two_workers):
+    parallel_render.render_slides_parallel(template_path, _jobs())
+    pool = parallel_render._pool
+    worker = next(iter(pool._processes.values()))
+    os.kill(worker.pid, signal.SIGKILL)
+    worker.join()
+
+    # The broken pool yields nothing, so the caller renders every slide itself
+    assert parallel_render.render_slides_parallel(template_path, _jobs()) == {}
+    assert parallel_render._pool is None
+
+    rendered = parallel_render.render_slides_parallel(template_path, _jobs())
+    assert sorted(rendered) == [0, 1, 2, 3]
+    assert parallel_render._pool is not pool
+
+
+def test_hung_range_times_out(template_path, two_workers, monkeypatch):
+    monkeypatch.setattr(parallel_render, 'WORKER_TIMEOUT', 0.001)
+    assert parallel_render.render_slides_parallel(template_path, _jobs()) == {}
+    assert parallel_render._pool is None
+
+
+def test_admission_counts_a_template_per_worker(two_workers, monkeypatch):
+    from admission import MemoryAdmissionController
+
+    monkeypatch.setattr(parallel_render, 'PARALLEL_THRESHOLD', 4)
+    assert parallel_render.workers_for(3) == 0
+    assert parallel_render.workers_for(4) == 2
+
+    controller = MemoryAdmissionController(budget_bytes=1 << 30, base_bytes=0, template_factor=5,
+                                           per_slide_bytes=0)
+    serial = controller.estimate(1000, 4)
+    assert controller.estimate(1000, 4, parallel_render.workers_for(4)) == 3 * serial
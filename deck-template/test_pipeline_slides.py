@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for drawing data-bound pipeline slides: the table and chart must not
+cover the slide's own text
+"""
+
+import os
+import sys
+
+import pytest
+from pptx import Presentation
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+from deal_filters import DealFilters
+from pipeline_slides import add_data_shapes, deck_query
+from synthetic_templates import build_synthetic_template
+
+TITLE_AND_CONTENT = 1
+
+CONTENT = {
+    'table': {'header': ['Stage', 'Deals', 'Pipeline', 'Weighted'],
+              'rows': [['Proposal', '3', '30,000', '15,000'], ['Total', '3', '30,000', '15,000']]},
+    'chart': {'categories': ['Proposal'], 'series': {'Pipeline': [30000.0], 'Weighted': [15000.0]}},
+}
+
+
+@pytest.fixture
+def slide(tmp_path):
+    path = str(tmp_path / 'template.pptx')
+    build_synthetic_template(path)
+    presentation = Presentation(path)
+    return presentation.slides.add_slide(presentation.slide_layouts[TITLE_AND_CONTENT])
+
+
+def _body(slide):
+    return [shape for shape in slide.placeholders if shape.placeholder_format.type in (2, 7)]
+
+
+def _overlaps(a, b) -> bool:
+    return (a.left < b.left + b.width and b.left < a.left + a.width
+            and a.top < b.top + b.height and b.top < a.top + a.height)
+
+
+def test_empty_body_is_replaced(slide):
+    body = _body(slide)[0]
+    area = (body.left, body.top, body.width, body.height)
+
+    assert add_data_shapes(slide, CONTENT) == 'table+chart'
+    assert _body(slide) == []
+    table = next(shape for shape in slide.shapes if shape.has_table)
+    assert (table.left, table.top) == area[:2]
+
+
+def test_body_text_stays_above_data(slide):
+    body = _body(slide)[0]
+    body.text_frame.text = 'Pipeline as of this week\nExcludes closed deals'
+    bottom = body.top + body.height
+
+    assert add_data_shapes(slide, CONTENT) == 'table+chart'
+    caption = _body(slide)[0]
+    assert caption.text_frame.text == 'Pipeline as of this week\nExcludes closed deals'
+
+    data = [shape for shape in slide.shapes if shape.has_table or shape.has_chart]
+    assert len(data) == 2
+    for shape in data:
+        assert not _overlaps(caption, shape)
+        assert shape.top + shape.height <= bottom
+
+
+def test_deck_query_binds_filters_in_placeholder_order():
+    filters = DealFilters(stage=['Proposal', 'Won'], company_id=7, ae_assigned=3)
+    sql, values = deck_query(['stage'], 5, filters)
+    assert sql.count('%s') == len(values)
+    assert values == [7, 'Proposal', 'Won', 3, 5]
+    assert ':' not in sql.replace('::', '')
@@ -0,0 +1,29 @@
+#!/usr/bin/env python3
+"""
+Tests for the pre-fork server: workers share the host's render budget and
+render pool instead of each taking all of it
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import parallel_render
+from admission import MemoryAdmissionController
+from prefork_server import share_render_limits
+
+
+def test_workers_split_the_render_limits(monkeypatch):
+    monkeypatch.setattr(parallel_render, 'WORKER_COUNT', 8)
+    admission = MemoryAdmissionController(budget_bytes=1024)
+
+    assert share_render_limits(admission, 4) == {'budget_bytes': 256, 'render_workers': 2}
+    assert admission.budget_bytes == 256
+
+
+def test_more_workers_than_cpus_render_in_process(monkeypatch):
+    monkeypatch.setattr(parallel_render, 'WORKER_COUNT', 2)
+    share_render_limits(MemoryAdmissionController(budget_bytes=1024), 8)
+    assert parallel_render.WORKER_COUNT == 1
+    assert not parallel_render.should_render_in_parallel(10_000)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-slide render cache: what the key covers, LRU eviction
+within the byte and entry bounds, and reuse of slides across renders
+"""
+
+import os
+import sys
+
+import pytest
+from pptx import Presentation
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+from render_cache import SlideRenderCache, slide_content_hash
+from synthetic_templates import build_synthetic_template
+from template_handler import TemplateHandler
+
+SLIDE = {'type': 'content', 'title': 'Q3', 'content': 'Pipeline is up', 'order': 1}
+
+
+def test_key_ignores_position_and_field_order():
+    moved = {'order': 7, 'content': 'Pipeline is up', 'title': 'Q3', 'type': 'content'}
+    assert slide_content_hash(moved) == slide_content_hash(SLIDE)
+    assert slide_content_hash({**SLIDE, 'title': 'Q4'}) != slide_content_hash(SLIDE)
+    assert slide_content_hash({**SLIDE, 'chart': {'categories': ['a']}}) != slide_content_hash(SLIDE)
+
+
+def test_evicts_least_recently_used_by_bytes():
+    cache = SlideRenderCache(max_bytes=30)
+    cache.put(('t', 1, 'a'), b'x' * 10)
+    cache.put(('t', 1, 'b'), b'x' * 10)
+    cache.put(('t', 1, 'c'), b'x' * 10)
+    assert cache.get(('t', 1, 'a')) is not None
+
+    cache.put(('t', 1, 'd'), b'x' * 10)
+    assert cache.get(('t', 1, 'b')) is None
+    assert all(cache.get(('t', 1, key)) for key in 'acd')
+    assert cache.stats()['bytes'] == 30
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entry_bound_and_oversized_slides():
+    cache = SlideRenderCache(max_bytes=100, max_entries=2)
+    for key in 'abc':
+        cache.put(('t', 1, key), b'x')
+    assert cache.stats()['entries'] == 2
+    assert cache.get(('t', 1, 'a')) is None
+
+    cache.put(('t', 1, 'big'), b'x' * 101)
+    assert cache.get(('t', 1, 'big')) is None
+    assert not SlideRenderCache(max_bytes=0).enabled
+
+
+@pytest.fixture
+def template_path(tmp_path):
+    path = str(tmp_path / 'template.pptx')
+    build_synthetic_template(path)
+    return path
+
+
+def _render(template_path, cache, slides, output_path):
+    handler = TemplateHandler(template_path, slide_cache=cache)
+    assert handler.load_template()
+    assert handler.create_presentation_from_slides(slides, output_path)
+    return [slide.shapes.title.text for slide in Presentation(output_path).slides]
+
+
+def test_unchanged_slides_are_reused(template_path, tmp_path):
+    cache = SlideRenderCache(max_bytes=1024 * 1024)
+    slides = [{**SLIDE, 'title': f'Slide {i}', 'order': i} for i in range(3)]
+    output = str(tmp_path / 'deck.pptx')
+
+    assert _render(template_path, cache, slides, output) == ['Slide 0', 'Slide 1', 'Slide 2']
+    assert cache.stats()['hits'] == 0
+
+    slides[1] = {**slides[1], 'title': 'Edited'}
+    assert _render(template_path, cache, slides, output) == ['Slide 0', 'Edited', 'Slide 2']
+    assert cache.stats()['hits'] == 2
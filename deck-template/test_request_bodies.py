@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Tests for compressed deck request bodies: truncated, padded and oversized
+bodies are rejected before they are parsed
+"""
+
+import gzip
+import json
+import os
+import sys
+
+import pytest
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from request_bodies import decode_body, decompress_body
+
+PAYLOAD = json.dumps({'slides': [{'type': 'content', 'title': 'Q3', 'content': 'x' * 1000, 'order': 1}],
+                      'deck_config': {}}).encode('utf-8')
+
+
+def _status(body, encoding, **kwargs) -> int:
+    with pytest.raises(HTTPException) as raised:
+        decompress_body(body, encoding, **kwargs)
+    return raised.value.status_code
+
+
+def test_gzip_body_round_trips():
+    assert decode_body(gzip.compress(PAYLOAD), 'application/json', 'gzip') == json.loads(PAYLOAD)
+
+
+def test_truncated_gzip_body_is_rejected():
+    body = gzip.compress(PAYLOAD)
+    assert _status(body[:len(body) // 2], 'gzip') == 400
+    # Only the trailer (CRC and size) missing
+    assert _status(body[:-4], 'gzip') == 400
+
+
+def test_data_after_gzip_stream_is_rejected():
+    assert _status(gzip.compress(PAYLOAD) + b'junk', 'gzip') == 400
+    assert _status(gzip.compress(PAYLOAD) * 2, 'gzip') == 400
+
+
+def test_oversized_bodies_are_rejected():
+    assert _status(gzip.compress(PAYLOAD), 'gzip', max_bytes=len(PAYLOAD) - 1) == 413
+    assert decompress_body(gzip.compress(PAYLOAD), 'gzip', max_bytes=len(PAYLOAD)) == PAYLOAD
+    assert _status(PAYLOAD, None, max_bytes=100) == 413
+
+
+def _zstd(data: bytes) -> bytes:
+    zstandard = pytest.importorskip('zstandard')
+    return zstandard.ZstdCompressor().compress(data)
+
+
+def test_zstd_body_round_trips():
+    assert decode_body(_zstd(PAYLOAD), 'application/json', 'zstd') == json.loads(PAYLOAD)
+
+
+def test_truncated_zstd_body_is_rejected():
+    body = _zstd(PAYLOAD)
+    assert _status(body[:len(body) // 2], 'zstd') == 400
+    assert _status(body[:-1], 'zstd') == 400
+
+
+def test_data_after_zstd_frame_is_rejected():
+    assert _status(_zstd(PAYLOAD) + b'garbage', 'zstd') == 400
+    assert _status(_zstd(PAYLOAD) * 2, 'zstd') == 400
+
+
+def test_oversized_zstd_body_is_rejected():
+    assert _status(_zstd(PAYLOAD), 'zstd', max_bytes=len(PAYLOAD) - 1) == 413
+    assert decompress_body(_zstd(PAYLOAD), 'zstd', max_bytes=len(PAYLOAD)) == PAYLOAD
+
+
+def test_unknown_encoding_is_unsupported():
+    assert _status(PAYLOAD, 'br') == 415
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Tests for structured logging: the pipeline export backend's copy of the
+module must not drift from this one
+"""
+
+import ast
+import os
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+COPY = os.path.join(HERE, '..', 'virgil-sap-dashboard', 'pipeline-export-backend', 'structured_logging.py')
+
+
+def _code(path: str) -> str:
+    """The module's code without its docstring."""
+    with open(path) as f:
+        module = ast.parse(f.read())
+    module.body = module.body[1:] if ast.get_docstring(module) is not None else module.body
+    return ast.dump(module)
+
+
+def test_backend_copy_matches():
+    assert _code(os.path.join(HERE, 'structured_logging.py')) == _code(COPY)
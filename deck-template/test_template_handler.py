@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tests for streamed decks: the work happens on the first chunk, and decks
+that cannot be streamed are turned away before any bytes are written
+"""
+
+import io
+import os
+import sys
+
+import pytest
+from pptx import Presentation
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+from synthetic_templates import build_synthetic_template
+from template_handler import TemplateHandler
+
+SLIDES = [{'type': 'content', 'title': f'Slide {i}', 'content': 'Body', 'order': i} for i in range(3)]
+CHART = {'categories': ['Proposal'], 'series': {'Pipeline': [1.0]}}
+
+
+@pytest.fixture
+def handler(tmp_path):
+    path = str(tmp_path / 'template.pptx')
+    build_synthetic_template(path)
+    handler = TemplateHandler(path)
+    assert handler.load_template()
+    return handler
+
+
+def test_streamed_deck_opens(handler):
+    data = b''.join(handler.stream_presentation_from_slides(SLIDES))
+    assert [slide.shapes.title.text for slide in Presentation(io.BytesIO(data)).slides] == \
+        ['Slide 0', 'Slide 1', 'Slide 2']
+
+
+def test_stream_does_no_work_until_first_chunk(tmp_path):
+    handler = TemplateHandler(str(tmp_path / 'missing.pptx'))
+    chunks = handler.stream_presentation_from_slides(SLIDES)
+    with pytest.raises(ValueError):
+        next(chunks)
+
+
+def test_decks_with_charts_cannot_stream(handler):
+    slides = SLIDES + [{'type': 'pipeline_by_stage', 'title': 'Stage', 'content': '', 'order': 9, 'chart': CHART}]
+    assert TemplateHandler.can_stream(SLIDES)
+    assert not TemplateHandler.can_stream(slides)
+    # An empty chart draws nothing and streams
+    assert TemplateHandler.can_stream([{**SLIDES[0], 'chart': {'categories': [], 'series': {}}}])
+
+    chunks = handler.stream_presentation_from_slides(slides)
+    with pytest.raises(ValueError):
+        next(chunks)
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the streaming workbook writer: text from the database must stay
+cell text and never become sheet XML
+"""
+
+import io
+import os
+import sys
+
+import openpyxl
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from xlsx_export import EXCEL_MAX_CELL_CHARS, TemplateWorkbook
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pivot_template.xlsx')
+
+HOSTILE = [
+    '</t></is></c><c r="A1"><v>666</v></c><c><is><t>',
+    '<script>alert(1)</script> & "quotes" \'too\'',
+    ']]><!-- comment --><![CDATA[',
+    '&amp; already escaped &lt;',
+    '  leading and trailing  ',
+    'bell\x07 and nul\x00 and escape\x1b',
+]
+
+
+@pytest.fixture(scope='module')
+def template():
+    return TemplateWorkbook.load(TEMPLATE)
+
+
+def _deals(notes):
+    header = openpyxl.load_workbook(TEMPLATE, read_only=True)['Deals']
+    columns = [cell.value for cell in next(header.iter_rows(max_row=1))]
+    frame = pd.DataFrame({column: [None] * len(notes) for column in columns})
+    frame['id'] = range(1, len(notes) + 1)
+    frame['deal_name'] = notes
+    frame['notes'] = pd.Series(notes, dtype=object)
+    return frame
+
+
+def _cleaned(text: str) -> str:
+    return text.replace('\x07', '').replace('\x00', '').replace('\x1b', '')
+
+
+def _open(data: bytes):
+    return openpyxl.load_workbook(io.BytesIO(data))
+
+
+def test_data_sheet_text_stays_text(template):
+    data = b''.join(template.stream([_deals(HOSTILE)]))
+    sheet = _open(data)['Deals']
+    rows = list(sheet.iter_rows(min_row=2, values_only=True))
+    header = [cell.value for cell in sheet[1]]
+    assert len(rows) == len(HOSTILE)
+    assert [row[header.index('notes')] for row in rows] == [_cleaned(text) for text in HOSTILE]
+    assert [row[header.index('deal_name')] for row in rows] == [_cleaned(text) for text in HOSTILE]
+    assert [row[header.index('id')] for row in rows] == list(range(1, len(HOSTILE) + 1))
+
+
+def test_mixed_column_is_escaped_cell_by_cell(template):
+    frame = _deals(HOSTILE[:2])
+    # Mixed types take the per-cell path
+    frame['notes'] = pd.Series([HOSTILE[0], 5], dtype=object)
+    sheet = _open(b''.join(template.stream([frame])))['Deals']
+    header = [cell.value for cell in sheet[1]]
+    assert [row[header.index('notes')] for row in sheet.iter_rows(min_row=2, values_only=True)] == \
+        [HOSTILE[0], 5]
+
+
+def test_extra_and_streamed_sheets_escape_text(template):
+    extra = [('Summary <&>', ['Stage <b>', 'Deals'], [(HOSTILE[0], 1), (HOSTILE[1], 2)])]
+    streamed = [('Owners & "co"', ['name'], [pd.DataFrame({'name': HOSTILE[:3]})])]
+    workbook = _open(b''.join(template.stream([_deals(['x'])], extra, streamed)))
+
+    assert workbook.sheetnames[-2:] == ['Summary <&>', 'Owners & "co"']
+    summary = list(workbook['Summary <&>'].iter_rows(values_only=True))
+    assert summary == [('Stage <b>', 'Deals'), (HOSTILE[0], 1), (HOSTILE[1], 2)]
+    owners = [row[0] for row in workbook['Owners & "co"'].iter_rows(min_row=2, values_only=True)]
+    assert owners == HOSTILE[:3]
+
+
+def test_overlong_text_is_truncated_to_the_cell_limit(template):
+    text = '<' * (EXCEL_MAX_CELL_CHARS + 10)
+    sheet = _open(b''.join(template.stream([_deals([text])])))['Deals']
+    header = [cell.value for cell in sheet[1]]
+    assert sheet.cell(row=2, column=header.index('notes') + 1).value == '<' * EXCEL_MAX_CELL_CHARS
@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+"""
+Streaming writer for the pipeline pivot workbook
+
+An export is the pivot template with the rows of its data sheet replaced.
+Instead of loading the template into openpyxl and saving it again, the
+template archive is copied member by member, and only the data sheet XML is
+generated, row by row, from DataFrame chunks. Strings are written inline
+(no shared string table), so nothing accumulates per row and memory stays
+flat however many rows are exported. The data table's range can only be set
+once the row count is known, so the table part is written last.
+
+Each chunk is converted column by column before any XML is written:
+numbers become float64/int64 arrays, dates and timestamps become Excel
+serial numbers (timestamps tz-naive), strings are escaped in bulk and nulls
+become masks. Cells are then assembled with array operations, not a Python
+type check per cell. Columns of mixed or unknown types are written cell by
+cell.
+
+Parsing the template is done once per process: `load_template_workbook`
+keeps the parsed package and reuses it until the file on disk changes.
+Pivot caches in the template are marked refreshOnLoad, so Excel rebuilds
+pivot tables from the new rows when the export is opened. Small, fully
+computed sheets (such as pipeline summaries) and sheets streamed from
+DataFrame chunks (such as joined lookups) can be appended to an export;
+they are added to the workbook, its relationships and the content types.
+"""
+
+import os
+import posixpath
+import re
+import threading
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from lxml import etree
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+from streaming_zip import iter_zip
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+NS_MAIN = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+NS_REL = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+NS_PKG_REL = 'http://schemas.openxmlformats.org/package/2006/relationships'
+NS_CONTENT_TYPES = 'http://schemas.openxmlformats.org/package/2006/content-types'
+CT_WORKSHEET = 'application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml'
+CONTENT_TYPES_PATH = '[Content_Types].xml'
+RT_WORKSHEET = NS_REL + '/worksheet'
+RT_TABLE = NS_REL + '/table'
+RT_STYLES = NS_REL + '/styles'
+RT_PIVOT_CACHE = NS_REL + '/pivotCacheDefinition'
+
+EXCEL_EPOCH = datetime(1899, 12, 30)
+EXCEL_MAX_CELL_CHARS = 32767
+DATE_FORMAT = 'yyyy-mm-dd'
+DATETIME_FORMAT = 'yyyy-mm-dd h:mm:ss'
+VALUE_FORMAT = '#,##0.00'
+SUMMARY_COLUMN_WIDTHS = (28, 16)
+
+# (sheet name, header, rows) of a sheet appended to an export
+ExtraSheet = Tuple[str, List[str], List[tuple]]
+# (sheet name, header, DataFrame chunks) of a sheet streamed into an export
+StreamedSheet = Tuple[str, List[str], Iterable[pd.DataFrame]]
+
+_ILLEGAL_XML_CHARS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_REF_ATTR = re.compile(rb'(\sref=")[^"]*(")')
+
+
+def _finite_text(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Cell text of a float64 array, with integral columns written without '.0'."""
+    empty = ~np.isfinite(values)
+    present = values[~empty]
+    if np.all(present == np.floor(present)) and (present.size == 0 or np.abs(present).max() < 2 ** 53):
+        text = np.where(empty, 0, values).astype(np.int64).astype(str)
+    else:
+        text = values.astype(str)
+    return text.astype(object), empty
+
+
+def _escape_strings(series: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Escaped inline-string text (with the <t> tag's attributes) of a string column."""
+    values = series.astype(object)
+    empty = values.isna().to_numpy()
+    items = ['' if missing else str(value) for value, missing in zip(values.to_numpy(), empty)]
+    if not items:
+        return np.array([], dtype=object), empty
+    # Escape the whole column as one string; NUL never survives cleaning, so it can separate values
+    joined = '\0'.join(items)
+    if joined.count('\0') != len(items) - 1 or _ILLEGAL_XML_CHARS.search(joined):
+        items = [_ILLEGAL_XML_CHARS.sub('', item) for item in items]
+        joined = '\0'.join(items)
+    if items and max(map(len, items)) > EXCEL_MAX_CELL_CHARS:
+        joined = '\0'.join(item[:EXCEL_MAX_CELL_CHARS] for item in items)
+    joined = joined.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+    text = np.array([('>' if item == item.strip() else ' xml:space="preserve">') + item
+                     for item in joined.split('\0')], dtype=object)
+    return text, empty
+
+
+def _serials(timestamps: pd.Series, unit: str) -> Tuple[np.ndarray, np.ndarray]:
+    """Excel serial numbers ('d': whole days, 't': fractional days) of a datetime64 column."""
+    if timestamps.dt.tz is not None:
+        # Excel has no time zones; keep the wall-clock time
+        timestamps = timestamps.dt.tz_localize(None)
+    empty = timestamps.isna().to_numpy()
+    days = ((timestamps - EXCEL_EPOCH) / pd.Timedelta(days=1)).to_numpy(dtype='float64', na_value=np.nan)
+    if unit == 'd':
+        days = np.floor(days)
+    return _finite_text(days)[0], empty
+
+
+def excel_column(series: pd.Series) -> Tuple[str, Optional[np.ndarray], np.ndarray]:
+    """
+    Convert one column into the text of its cells.
+
+    Returns:
+        Tuple of (kind, cell text, empty mask). Kind is 'n' (number), 'b'
+        (boolean), 'd' (date), 't' (timestamp), 's' (inline string) or 'o'
+        (mixed; the original values are returned for per-cell writing).
+    """
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype) and dtype != object:
+        values = series.to_numpy(dtype=object, na_value=None)
+        empty = pd.isna(series).to_numpy()
+        return 'b', np.where(values == True, '1', '0').astype(object), empty  # noqa: E712
+    if pd.api.types.is_numeric_dtype(dtype):
+        text, empty = _finite_text(series.to_numpy(dtype='float64', na_value=np.nan))
+        if pd.api.types.is_integer_dtype(dtype) and not isinstance(dtype, pd.api.extensions.ExtensionDtype):
+            # int64 beyond 2**53 keeps its exact digits
+            text = series.to_numpy().astype(str).astype(object)
+        return 'n', text, empty
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        text, empty = _serials(series, 't')
+        return 't', text, empty
+    if dtype != object and pd.api.types.is_string_dtype(dtype):
+        text, empty = _escape_strings(series)
+        return 's', text, empty
+    if dtype != object:
+        return 'o', series.to_numpy(dtype=object), np.zeros(len(series), dtype=bool)
+
+    inferred = pd.api.types.infer_dtype(series, skipna=True)
+    if inferred in ('string', 'empty'):
+        text, empty = _escape_strings(series)
+        return 's', text, empty
+    if inferred in ('decimal', 'integer', 'floating', 'mixed-integer-float'):
+        return excel_column(pd.to_numeric(series, errors='coerce').astype('float64'))
+    if inferred == 'boolean':
+        return excel_column(series.astype('boolean'))
+    try:
+        if inferred == 'date':
+            text, empty = _serials(pd.to_datetime(series), 'd')
+            return 'd', text, empty
+        if inferred == 'datetime':
+            return excel_column(pd.to_datetime(series))
+    except (TypeError, ValueError):
+        pass
+    return 'o', series.to_numpy(dtype=object), np.zeros(len(series), dtype=bool)
+
+
+def _rels_path(part_path: str) -> str:
+    directory, name = posixpath.split(part_path)
+    return posixpath.join(directory, '_rels', name + '.rels')
+
+
+def _resolve(part_path: str, target: str) -> str:
+    """Resolve a relationship target relative to the part that owns it."""
+    if target.startswith('/'):
+        return target.lstrip('/')
+    return posixpath.normpath(posixpath.join(posixpath.dirname(part_path), target))
+
+
+def _rel_targets(members: Dict[str, bytes], part_path: str) -> Dict[str, Tuple[str, str]]:
+    """Map rId -> (relationship type, resolved target path) for a part."""
+    rels = members.get(_rels_path(part_path))
+    if rels is None:
+        return {}
+    root = etree.fromstring(rels)
+    return {
+        rel.get('Id'): (rel.get('Type'), _resolve(part_path, rel.get('Target')))
+        for rel in root.iter(f'{{{NS_PKG_REL}}}Relationship')
+    }
+
+
+def ensure_number_styles(styles_xml: bytes, format_codes: List[str]) -> Tuple[bytes, List[int]]:
+    """
+    Find (or add) cell formats with the given number formats in styles.xml.
+
+    Returns:
+        Tuple of (styles XML, cell format index per format code)
+    """
+    root = etree.fromstring(styles_xml)
+    main = f'{{{NS_MAIN}}}'
+    num_fmts = root.find(f'{main}numFmts')
+    cell_xfs = root.find(f'{main}cellXfs')
+    changed = False
+
+    def num_fmt_id(format_code: str) -> int:
+        nonlocal num_fmts, changed
+        existing = []
+        if num_fmts is not None:
+            for num_fmt in num_fmts.findall(f'{main}numFmt'):
+                existing.append(int(num_fmt.get('numFmtId')))
+                if num_fmt.get('formatCode', '').replace('\\', '') == format_code:
+                    return int(num_fmt.get('numFmtId'))
+        if num_fmts is None:
+            # numFmts must be the first child of styleSheet
+            num_fmts = etree.Element(f'{main}numFmts')
+            root.insert(0, num_fmts)
+        new_id = max([163] + existing) + 1
+        etree.SubElement(num_fmts, f'{main}numFmt', numFmtId=str(new_id), formatCode=format_code)
+        num_fmts.set('count', str(len(num_fmts)))
+        changed = True
+        return new_id
+
+    def xf_index(format_id: int) -> int:
+        nonlocal changed
+        for index, xf in enumerate(cell_xfs.findall(f'{main}xf')):
+            if (xf.get('numFmtId') == str(format_id) and xf.get('fontId', '0') == '0'
+                    and xf.get('fillId', '0') == '0' and xf.get('borderId', '0') == '0'):
+                return index
+        etree.SubElement(cell_xfs, f'{main}xf', numFmtId=str(format_id), fontId='0', fillId='0',
+                         borderId='0', xfId='0', applyNumberFormat='1')
+        cell_xfs.set('count', str(len(cell_xfs)))
+        changed = True
+        return len(cell_xfs) - 1
+
+    styles = [xf_index(num_fmt_id(format_code)) for format_code in format_codes]
+    if changed:
+        styles_xml = etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+    return styles_xml, styles
+
+
+def refresh_on_load(pivot_cache_xml: bytes) -> bytes:
+    """Mark a pivot cache definition to be refreshed when the workbook is opened."""
+    root = etree.fromstring(pivot_cache_xml)
+    if root.get('refreshOnLoad') == '1':
+        return pivot_cache_xml
+    root.set('refreshOnLoad', '1')
+    return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+
+class TemplateWorkbook:
+    """
+    A workbook template split into the parts an export copies and the data
+    sheet it regenerates.
+    """
+
+    def __init__(self, members: List[Tuple[str, bytes]], sheet_name: str = 'Deals'):
+        """
+        Args:
+            members: (name, bytes) of every archive member, in archive order
+            sheet_name: Sheet whose rows are replaced by exported data
+        """
+        self.members = members
+        by_name = dict(members)
+
+        package_rels = _rel_targets(by_name, '')
+        workbook_path = next(target for rel_type, target in package_rels.values()
+                             if rel_type.endswith('/officeDocument'))
+        workbook_rels = _rel_targets(by_name, workbook_path)
+
+        workbook = etree.fromstring(by_name[workbook_path])
+        sheet = next(s for s in workbook.iter(f'{{{NS_MAIN}}}sheet') if s.get('name') == sheet_name)
+        self.sheet_path = workbook_rels[sheet.get(f'{{{NS_REL}}}id')][1]
+        self.table_path = next(target for rel_type, target in _rel_targets(by_name, self.sheet_path).values()
+                               if rel_type == RT_TABLE)
+        self.styles_path = next(target for rel_type, target in workbook_rels.values()
+                                if rel_type == RT_STYLES)
+
+        self.styles_xml, (self.date_style, self.datetime_style, self.value_style) = ensure_number_styles(
+            by_name[self.styles_path], [DATE_FORMAT, DATETIME_FORMAT, VALUE_FORMAT])
+        self.table_xml = by_name[self.table_path]
+        self.workbook_path = workbook_path
+        self.workbook_xml = by_name[workbook_path]
+        self.workbook_rels_path = _rels_path(workbook_path)
+        self.content_types_xml = by_name[CONTENT_TYPES_PATH]
+        # Parts copied with changes; everything else is copied as-is
+        self.replaced_parts = {self.styles_path: self.styles_xml}
+        for rel_type, target in workbook_rels.values():
+            if rel_type == RT_PIVOT_CACHE:
+                self.replaced_parts[target] = refresh_on_load(by_name[target])
+        self._split_sheet(by_name[self.sheet_path].decode('utf-8'))
+
+    @classmethod
+    def load(cls, path: str, sheet_name: str = 'Deals') -> 'TemplateWorkbook':
+        """Read a template .xlsx from disk."""
+        with zipfile.ZipFile(path) as archive:
+            members = [(info.filename, archive.read(info)) for info in archive.infolist()]
+        return cls(members, sheet_name)
+
+    def _split_sheet(self, sheet_xml: str):
+        """Keep the sheet around its rows, plus the header row, and drop the rest."""
+        table = etree.fromstring(self.table_xml)
+        start_ref, end_ref = table.get('ref').split(':')
+        start_column = re.match(r'[A-Z]+', start_ref).group()
+        self.header_row = int(start_ref[len(start_column):])
+        first = column_index_from_string(start_column)
+        last = column_index_from_string(re.match(r'[A-Z]+', end_ref).group())
+        self.column_letters = [get_column_letter(i) for i in range(first, last + 1)]
+
+        # The row count is unknown while streaming; <dimension> is optional, so drop it
+        sheet_xml = re.sub(r'<dimension [^>]*/>', '', sheet_xml)
+        if '<sheetData/>' in sheet_xml:
+            head, tail = sheet_xml.split('<sheetData/>')
+            rows = ''
+        else:
+            head, rest = sheet_xml.split('<sheetData>', 1)
+            rows, tail = rest.split('</sheetData>', 1)
+
+        # Rows above and including the table header are kept as they are (with their styles)
+        kept = [row for row in re.findall(r'<row [^>]*?(?:/>|>.*?</row>)', rows, re.S)
+                if int(re.search(r'\sr="(\d+)"', row).group(1)) <= self.header_row]
+        self.sheet_head = (head + '<sheetData>' + ''.join(kept)).encode('utf-8')
+        header_style = re.search(r'<c [^>]*?\ss="(\d+)"', kept[-1]) if kept else None
+        self.header_style = int(header_style.group(1)) if header_style else None
+        self.sheet_tail = ('</sheetData>' + tail).encode('utf-8')
+
+    def _cell(self, ref: str, value, number_style: Optional[int] = None) -> str:
+        """XML for one cell, or '' for an empty value."""
+        if value is None or value is pd.NaT:
+            return ''
+        if isinstance(value, (bool, np.bool_)):
+            return f'<c r="{ref}" t="b"><v>{int(value)}</v></c>'
+        if isinstance(value, (int, np.integer)):
+            return f'<c r="{ref}"><v>{int(value)}</v></c>'
+        if isinstance(value, (float, np.floating)):
+            if not np.isfinite(value):
+                return ''
+            style = f' s="{number_style}"' if number_style is not None else ''
+            return f'<c r="{ref}"{style}><v>{float(value)!r}</v></c>'
+        if isinstance(value, Decimal):
+            if not value.is_finite():
+                return ''
+            style = f' s="{number_style}"' if number_style is not None else ''
+            return f'<c r="{ref}"{style}><v>{value}</v></c>'
+        if isinstance(value, datetime):
+            if value.tzinfo is not None:
+                value = value.replace(tzinfo=None)
+            serial = (value - EXCEL_EPOCH).total_seconds() / 86400
+            return f'<c r="{ref}" s="{self.datetime_style}"><v>{serial!r}</v></c>'
+        if isinstance(value, date):
+            serial = (value - EXCEL_EPOCH.date()).days
+            return f'<c r="{ref}" s="{self.date_style}"><v>{serial}</v></c>'
+
+        text = _ILLEGAL_XML_CHARS.sub('', str(value))[:EXCEL_MAX_CELL_CHARS]
+        text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+        space = ' xml:space="preserve"' if text != text.strip() else ''
+        return f'<c r="{ref}" t="inlineStr"><is><t{space}>{text}</t></is></c>'
+
+    def _chunk_rows(self, chunk: pd.DataFrame, first_row: int,
+                    column_letters: Optional[List[str]] = None) -> str:
+        """Row XML of one chunk, built column by column."""
+        # (text before the value, text after it) per column kind
+        cell_parts = {
+            'n': ('"><v>', '</v></c>'),
+            'b': ('" t="b"><v>', '</v></c>'),
+            'd': (f'" s="{self.date_style}"><v>', '</v></c>'),
+            't': (f'" s="{self.datetime_style}"><v>', '</v></c>'),
+            's': ('" t="inlineStr"><is><t', '</t></is></c>'),
+        }
+        row_numbers = np.arange(first_row, first_row + len(chunk)).astype(str).astype(object)
+        row_cells = np.full(len(chunk), '', dtype=object)
+        for letter, (_, series) in zip(column_letters or self.column_letters, chunk.items()):
+            kind, text, empty = excel_column(series)
+            if kind == 'o':
+                cells = np.array([self._cell(f'{letter}{row}', value)
+                                  for row, value in zip(row_numbers, text)], dtype=object)
+            else:
+                before, after = cell_parts[kind]
+                cells = ('<c r="' + letter) + row_numbers + before + text + after
+                cells[empty] = ''
+            row_cells = row_cells + cells
+        return ''.join(('<row r="' + row_numbers + '">' + row_cells + '</row>').tolist())
+
+    def _iter_sheet(self, chunks: Iterable[pd.DataFrame], counter: Dict[str, int]) -> Iterator[bytes]:
+        """Yield the data sheet XML, one piece per DataFrame chunk."""
+        yield self.sheet_head
+        row_number = self.header_row
+        for chunk in chunks:
+            if len(chunk):
+                yield self._chunk_rows(chunk, row_number + 1).encode('utf-8')
+            row_number += len(chunk)
+            counter['rows'] = row_number - self.header_row
+        yield self.sheet_tail
+
+    def _table(self, row_count: int) -> bytes:
+        """Table part with its range covering the header and `row_count` rows."""
+        # A table needs at least one data row
+        last_row = self.header_row + max(row_count, 1)
+        ref = f'{self.column_letters[0]}{self.header_row}:{self.column_letters[-1]}{last_row}'
+        return _REF_ATTR.sub(rb'\g<1>' + ref.encode('ascii') + rb'\g<2>', self.table_xml)
+
+    def _sheet_head(self, header: List[str]) -> str:
+        """Start of an appended worksheet, up to and including its header row."""
+        first_width, other_width = SUMMARY_COLUMN_WIDTHS
+        cols = (f'<cols><col min="1" max="1" width="{first_width}" customWidth="1"/>'
+                f'<col min="2" max="{len(header)}" width="{other_width}" customWidth="1"/></cols>')
+        header_style = f' s="{self.header_style}"' if self.header_style is not None else ''
+        # Headings are styled like the data sheet's header row
+        cells = ''.join(self._cell(f'{get_column_letter(i)}1', heading).replace('<c ', f'<c{header_style} ', 1)
+                        for i, heading in enumerate(header, start=1))
+        return (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                f'<worksheet xmlns="{NS_MAIN}" xmlns:r="{NS_REL}">{cols}'
+                f'<sheetData><row r="1">{cells}</row>')
+
+    def _extra_sheet(self, header: List[str], rows: List[tuple]) -> bytes:
+        """Worksheet XML for a small, fully computed sheet."""
+        letters = [get_column_letter(i) for i in range(1, len(header) + 1)]
+        parts = [self._sheet_head(header)]
+        for row_number, values in enumerate(rows, start=2):
+            cells = ''.join(self._cell(f'{letter}{row_number}', value, self.value_style)
+                            for letter, value in zip(letters, values))
+            parts.append(f'<row r="{row_number}">{cells}</row>')
+        parts.append('</sheetData></worksheet>')
+        return ''.join(parts).encode('utf-8')
+
+    def _iter_streamed_sheet(self, header: List[str], chunks: Iterable[pd.DataFrame]) -> Iterator[bytes]:
+        """Yield worksheet XML for a sheet of DataFrame chunks, one piece per chunk."""
+        letters = [get_column_letter(i) for i in range(1, len(header) + 1)]
+        yield self._sheet_head(header).encode('utf-8')
+        row_number = 1
+        for chunk in chunks:
+            if len(chunk):
+                yield self._chunk_rows(chunk, row_number + 1, letters).encode('utf-8')
+            row_number += len(chunk)
+        yield b'</sheetData></worksheet>'
+
+    def _add_sheets(self, names: List[str]) -> Tuple[Dict[str, bytes], List[str]]:
+        """
+        Register extra worksheets in the package.
+
+        Returns:
+            Tuple of (updated workbook, rels and content type parts, path of each new sheet)
+        """
+        workbook = etree.fromstring(self.workbook_xml)
+        sheets = workbook.find(f'{{{NS_MAIN}}}sheets')
+        rels = etree.fromstring(dict(self.members)[self.workbook_rels_path])
+        content_types = etree.fromstring(self.content_types_xml)
+
+        sheet_id = max(int(sheet.get('sheetId')) for sheet in sheets)
+        rel_ids = {rel.get('Id') for rel in rels}
+        part_names = {name for name, _ in self.members}
+        sheet_dir = posixpath.dirname(self.sheet_path)
+        paths = []
+        for name in names:
+            number = len(paths) + 1
+            while posixpath.join(sheet_dir, f'sheet{number}.xml') in part_names:
+                number += 1
+            path = posixpath.join(sheet_dir, f'sheet{number}.xml')
+            part_names.add(path)
+            rel_number = len(rel_ids) + 1
+            while f'rId{rel_number}' in rel_ids:
+                rel_number += 1
+            rel_id = f'rId{rel_number}'
+            rel_ids.add(rel_id)
+            sheet_id += 1
+
+            etree.SubElement(sheets, f'{{{NS_MAIN}}}sheet',
+                             {'name': name, 'sheetId': str(sheet_id), f'{{{NS_REL}}}id': rel_id})
+            etree.SubElement(rels, f'{{{NS_PKG_REL}}}Relationship', Id=rel_id, Type=RT_WORKSHEET,
+                             Target=posixpath.relpath(path, posixpath.dirname(self.workbook_path)))
+            etree.SubElement(content_types, f'{{{NS_CONTENT_TYPES}}}Override',
+                             PartName='/' + path, ContentType=CT_WORKSHEET)
+            paths.append(path)
+
+        def serialize(root) -> bytes:
+            return etree.tostring(root, xml_declaration=True, encoding='UTF-8', standalone=True)
+
+        return {
+            self.workbook_path: serialize(workbook),
+            self.workbook_rels_path: serialize(rels),
+            CONTENT_TYPES_PATH: serialize(content_types),
+        }, paths
+
+    def iter_entries(self, chunks: Iterable[pd.DataFrame],
+                     extra_sheets: Optional[List[ExtraSheet]] = None,
+                     streamed_sheets: Optional[List[StreamedSheet]] = None) -> Iterator[Tuple[str, object]]:
+        """
+        Archive members of an export filled from `chunks`, in write order.
+
+        Args:
+            chunks: DataFrames of data sheet rows, in column order
+            extra_sheets: Sheets appended after the template's own sheets
+            streamed_sheets: Sheets appended after `extra_sheets`, written chunk by chunk
+        """
+        counter = {'rows': 0}
+        replaced_parts = self.replaced_parts
+        extra_parts = []
+        extra_sheets = extra_sheets or []
+        streamed_sheets = streamed_sheets or []
+        if extra_sheets or streamed_sheets:
+            package_parts, paths = self._add_sheets([name for name, _, _ in extra_sheets + streamed_sheets])
+            replaced_parts = {**replaced_parts, **package_parts}
+            extra_parts = [(path, self._extra_sheet(header, rows))
+                           for path, (_, header, rows) in zip(paths, extra_sheets)]
+            extra_parts += [(path, self._iter_streamed_sheet(header, sheet_chunks))
+                            for path, (_, header, sheet_chunks) in zip(paths[len(extra_sheets):], streamed_sheets)]
+
+        for name, data in self.members:
+            if name in (self.sheet_path, self.table_path):
+                continue
+            yield name, replaced_parts.get(name, data)
+        yield from extra_parts
+        yield self.sheet_path, self._iter_sheet(chunks, counter)
+        # The sheet has been fully written by the time the next entry is requested
+        yield self.table_path, self._table(counter['rows'])
+
+    def stream(self, chunks: Iterable[pd.DataFrame],
+               extra_sheets: Optional[List[ExtraSheet]] = None,
+               streamed_sheets: Optional[List[StreamedSheet]] = None) -> Iterator[bytes]:
+        """Yield an export workbook filled from `chunks` as consecutive .xlsx bytes."""
+        return iter_zip(self.iter_entries(chunks, extra_sheets, streamed_sheets), force_zip64=True)
+
+
+# (absolute path, sheet name) -> ((mtime_ns, size), TemplateWorkbook)
+_template_cache: Dict[Tuple[str, str], Tuple[Tuple[int, int], TemplateWorkbook]] = {}
+_template_cache_lock = threading.Lock()
+
+
+def load_template_workbook(path: str, sheet_name: str = 'Deals') -> TemplateWorkbook:
+    """
+    Parsed template for `path`, shared by all requests of the process.
+
+    The template is parsed again only when its modification time or size
+    changes. TemplateWorkbook is not modified by exports, so one instance
+    can serve concurrent requests.
+    """
+    key = (os.path.abspath(path), sheet_name)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    with _template_cache_lock:
+        cached = _template_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    template = TemplateWorkbook.load(path, sheet_name)
+    with _template_cache_lock:
+        _template_cache[key] = (version, template)
+    return template
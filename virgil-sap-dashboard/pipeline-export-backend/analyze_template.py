@@ -1,63 +1,337 @@
 #!/usr/bin/env python3
+"""
+Batch template analysis
 
-import boto3
+Analyzes every .pptx template under an S3 prefix or a local directory with
+a bounded pool of worker processes and writes a JSON report of layouts,
+placeholders, sizes and parse times. Results are cached by content hash, so
+templates that did not change since the last run are not parsed again. S3
+objects whose ETag and size are unchanged are not even downloaded.
+
+    python analyze_template.py --s3-prefix templates/
+    python analyze_template.py --dir ./templates --workers 8 --output report.json
+    python analyze_template.py --s3-prefix templates/ 1753232308602_Organic_presentation.pptx
+"""
+
+import argparse
+import hashlib
+import json
 import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import boto3
 from dotenv import load_dotenv
 from template_handler import TemplateHandler
+from structured_logging import configure_logging
+
+DEFAULT_BUCKET = 'new-account-file-upload'
+DEFAULT_CACHE = '.template_analysis_cache.json'
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+CACHE_VERSION = 1
+
+# S3 client of the current worker process
+_s3_client = None
 
-def analyze_template(template_id):
+
+def make_s3_client(endpoint_url: Optional[str] = None):
+    """S3 client from the AWS_* environment (optionally against an S3-compatible endpoint)."""
+    return boto3.client('s3',
+                        endpoint_url=endpoint_url,
+                        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+                        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+                        region_name=os.getenv('AWS_REGION'))
+
+
+def _init_worker(use_s3: bool, endpoint_url: Optional[str], log_level: str):
+    global _s3_client
     load_dotenv()
-    
-    # Download template from S3
-    s3 = boto3.client('s3', 
-                      aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-                      aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-                      region_name=os.getenv('AWS_REGION'))
-    
+    configure_logging(level=log_level)
+    if use_s3:
+        _s3_client = make_s3_client(endpoint_url)
+
+
+def list_s3_templates(s3, bucket: str, prefix: str, names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    List .pptx objects under an S3 prefix.
+
+    Args:
+        names: Only include these filenames (relative to the prefix)
+    """
+    sources = []
+    paginator = s3.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get('Contents', []):
+            key = obj['Key']
+            if not key.lower().endswith('.pptx'):
+                continue
+            if names and key[len(prefix):].lstrip('/') not in names:
+                continue
+            sources.append({
+                'kind': 's3',
+                'bucket': bucket,
+                'key': key,
+                'size': obj['Size'],
+                'etag': obj.get('ETag', '').strip('"')
+            })
+    return sources
+
+
+def list_local_templates(directory: str, names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """List .pptx files under a local directory (recursively)."""
+    sources = []
+    for root, _, files in os.walk(directory):
+        for filename in sorted(files):
+            if not filename.lower().endswith('.pptx') or filename.startswith('~$'):
+                continue
+            if names and filename not in names:
+                continue
+            path = os.path.join(root, filename)
+            stat = os.stat(path)
+            sources.append({
+                'kind': 'local',
+                'key': os.path.relpath(path, directory),
+                'path': path,
+                'size': stat.st_size,
+                # Local files have no ETag; size and mtime play the same role
+                'etag': f"{int(stat.st_mtime_ns)}-{stat.st_size}"
+            })
+    return sources
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _download(source: Dict[str, Any], target_path: str) -> str:
+    """Stream an S3 object to disk, hashing it on the way. Returns the content hash."""
+    digest = hashlib.sha256()
+    body = _s3_client.get_object(Bucket=source['bucket'], Key=source['key'])['Body']
+    with open(target_path, 'wb') as f:
+        for chunk in iter(lambda: body.read(DOWNLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            f.write(chunk)
+    return digest.hexdigest()
+
+
+def analyze_file(path: str) -> Dict[str, Any]:
+    """
+    Load a template with TemplateHandler and describe its layouts.
+
+    Returns:
+        Dict with template info, per-layout placeholders and parse time
+    """
+    handler = TemplateHandler(path)
+    started = time.perf_counter()
+    if not handler.load_template():
+        raise ValueError("Failed to load template")
+    parse_seconds = time.perf_counter() - started
+
+    layouts = []
+    for layout_info, layout in zip(handler.get_available_layouts(), handler.presentation.slide_layouts):
+        placeholders = []
+        text_frames = 0
+        for shape in layout.shapes:
+            if shape.is_placeholder:
+                placeholder_format = shape.placeholder_format
+                placeholders.append({
+                    'idx': placeholder_format.idx,
+                    'type': int(placeholder_format.type),
+                    'type_name': str(placeholder_format.type),
+                    'name': shape.name
+                })
+            elif shape.has_text_frame:
+                text_frames += 1
+        layouts.append({
+            **layout_info,
+            'title_placeholders': sum(1 for p in placeholders if p['type'] == 1),
+            'content_placeholders': sum(1 for p in placeholders if p['type'] == 2),
+            'text_frames': text_frames,
+            'placeholder_details': placeholders
+        })
+
+    return {
+        'template': handler.get_template_info(),
+        'layouts': layouts,
+        'parse_seconds': round(parse_seconds, 4)
+    }
+
+
+def analyze_source(source: Dict[str, Any], known_hashes: frozenset) -> Dict[str, Any]:
+    """
+    Fetch and analyze one template. Runs in a worker process.
+
+    Templates whose content hash is in `known_hashes` are not parsed; the
+    caller fills in the cached analysis.
+    """
+    result = {'key': source['key'], 'size': source['size'], 'etag': source['etag']}
+    started = time.perf_counter()
     try:
-        response = s3.get_object(Bucket='new-account-file-upload', 
-                                Key=f'templates/{template_id}')
-        
-        with open('temp_template.pptx', 'wb') as f:
-            f.write(response['Body'].read())
-        
-        # Analyze template
-        handler = TemplateHandler('temp_template.pptx')
-        
-        print(f"\n=== Template Analysis: {template_id} ===")
-        print(f"Total layouts: {len(handler.presentation.slide_layouts)}")
-        
-        for i, layout in enumerate(handler.presentation.slide_layouts):
-            print(f"\nLayout {i}: {layout.name}")
-            print(f"  Type: {layout.type}")
-            print(f"  Shapes: {len(layout.shapes)}")
-            
-            # Analyze shapes and placeholders
-            content_placeholders = 0
-            title_placeholders = 0
-            
-            for j, shape in enumerate(layout.shapes):
-                if hasattr(shape, 'placeholder_format'):
-                    placeholder_type = shape.placeholder_format.type
-                    if placeholder_type == 1:  # Title
-                        title_placeholders += 1
-                    elif placeholder_type == 2:  # Content
-                        content_placeholders += 1
-                    print(f"    Shape {j}: Placeholder type {placeholder_type}")
-                elif hasattr(shape, 'text_frame'):
-                    print(f"    Shape {j}: Text frame with '{shape.text_frame.text[:50]}...'")
-                else:
-                    print(f"    Shape {j}: Other shape type")
-            
-            print(f"  Title placeholders: {title_placeholders}")
-            print(f"  Content placeholders: {content_placeholders}")
-        
-        # Clean up
-        os.remove('temp_template.pptx')
-        
+        with tempfile.TemporaryDirectory() as work_dir:
+            if source['kind'] == 's3':
+                path = os.path.join(work_dir, 'template.pptx')
+                content_hash = _download(source, path)
+            else:
+                path = source['path']
+                content_hash = _hash_file(path)
+            result['content_hash'] = content_hash
+            result['fetch_seconds'] = round(time.perf_counter() - started, 4)
+
+            if content_hash in known_hashes:
+                result['status'] = 'cached'
+                return result
+
+            result.update(analyze_file(path))
+            result['status'] = 'analyzed'
     except Exception as e:
-        print(f"Error analyzing template: {e}")
+        result['status'] = 'failed'
+        result['error'] = str(e)
+    return result
+
+
+def load_cache(path: str) -> Dict[str, Any]:
+    """Load the analysis cache, starting fresh if it is missing or from another version."""
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+        if cache.get('version') == CACHE_VERSION:
+            return cache
+    except (OSError, ValueError):
+        pass
+    return {'version': CACHE_VERSION, 'by_hash': {}, 'by_key': {}}
+
+
+def save_cache(path: str, cache: Dict[str, Any]):
+    """Write the cache atomically so an interrupted run leaves the old one intact."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(cache, f)
+    os.replace(temp_path, path)
+
+
+def run_batch(sources: List[Dict[str, Any]], cache: Dict[str, Any], workers: int,
+              endpoint_url: Optional[str] = None, log_level: str = 'WARNING') -> List[Dict[str, Any]]:
+    """
+    Analyze `sources` on a worker pool, reusing and updating `cache`.
+
+    Returns:
+        One report entry per source, in listing order
+    """
+    by_hash, by_key = cache['by_hash'], cache['by_key']
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = []
+
+    for source in sources:
+        # Unchanged ETag and size: reuse the cached analysis without downloading
+        previous = by_key.get(source['key'])
+        if (previous and previous['etag'] == source['etag'] and previous['size'] == source['size']
+                and previous['content_hash'] in by_hash):
+            results[source['key']] = {
+                'key': source['key'], 'size': source['size'], 'etag': source['etag'],
+                'content_hash': previous['content_hash'], 'status': 'unchanged'
+            }
+        else:
+            pending.append(source)
+
+    known_hashes = frozenset(by_hash)
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(any(source['kind'] == 's3' for source in pending),
+                                           endpoint_url, log_level)) as pool:
+            futures = [pool.submit(analyze_source, source, known_hashes) for source in pending]
+            for future in as_completed(futures):
+                result = future.result()
+                results[result['key']] = result
+                marker = '❌' if result['status'] == 'failed' else '✅'
+                print(f"{marker} {result['key']}: {result['status']}", file=sys.stderr)
+
+    report = []
+    for source in sources:
+        result = results[source['key']]
+        content_hash = result.get('content_hash')
+        if result['status'] == 'analyzed':
+            by_hash[content_hash] = {k: result[k] for k in ('template', 'layouts', 'parse_seconds')}
+        if result['status'] in ('cached', 'unchanged'):
+            result.update(by_hash[content_hash])
+        if content_hash and result['status'] != 'failed':
+            by_key[source['key']] = {'etag': source['etag'], 'size': source['size'],
+                                     'content_hash': content_hash}
+        report.append(result)
+    return report
+
+
+def main() -> int:
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Analyze PowerPoint templates in bulk")
+    source_group = parser.add_mutually_exclusive_group(required=True)
+    source_group.add_argument('--s3-prefix', help="Analyze every .pptx under this S3 prefix")
+    source_group.add_argument('--dir', help="Analyze every .pptx under this local directory")
+    parser.add_argument('names', nargs='*', help="Only analyze these template filenames")
+    parser.add_argument('--bucket', default=DEFAULT_BUCKET)
+    parser.add_argument('--s3-endpoint', help="S3-compatible endpoint URL (e.g. MinIO)")
+    parser.add_argument('--workers', type=int, default=min(8, os.cpu_count() or 1))
+    parser.add_argument('--output', default='template_analysis.json',
+                        help="Report path, or '-' for stdout")
+    parser.add_argument('--cache', default=DEFAULT_CACHE, help="Content-hash cache file")
+    parser.add_argument('--no-cache', action='store_true', help="Analyze everything again")
+    parser.add_argument('--verbose', action='store_true', help="Log template loading")
+    args = parser.parse_args()
+
+    log_level = 'INFO' if args.verbose else os.getenv('LOG_LEVEL', 'WARNING')
+    configure_logging(level=log_level)
+
+    if args.s3_prefix is not None:
+        s3 = make_s3_client(args.s3_endpoint)
+        sources = list_s3_templates(s3, args.bucket, args.s3_prefix, args.names)
+        source_info = {'bucket': args.bucket, 'prefix': args.s3_prefix}
+    else:
+        sources = list_local_templates(args.dir, args.names)
+        source_info = {'dir': os.path.abspath(args.dir)}
+    print(f"🔧 Found {len(sources)} template(s)", file=sys.stderr)
+
+    cache = load_cache(args.cache) if not args.no_cache else load_cache(os.devnull)
+    started = time.perf_counter()
+    templates = run_batch(sources, cache, max(1, args.workers), args.s3_endpoint, log_level)
+    elapsed = time.perf_counter() - started
+    save_cache(args.cache, cache)
+
+    statuses = [t['status'] for t in templates]
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(),
+        'source': source_info,
+        'workers': args.workers,
+        'summary': {
+            'templates': len(templates),
+            'analyzed': statuses.count('analyzed'),
+            'cached': statuses.count('cached'),
+            'unchanged': statuses.count('unchanged'),
+            'failed': statuses.count('failed'),
+            'total_bytes': sum(t['size'] for t in templates),
+            'elapsed_seconds': round(elapsed, 3)
+        },
+        'templates': templates
+    }
+
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Report written to {args.output}", file=sys.stderr)
+
+    return 1 if report['summary']['failed'] else 0
+
 
 if __name__ == "__main__":
-    # Analyze the most recent Organic template
-    analyze_template('1753232308602_Organic_presentation.pptx') 
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Structured logging for the template service
+
+Events carry their fields on the log record and are only formatted by the
+handler that emits them, so disabled levels cost one `isEnabledFor` check.
+Per-slide events are collected by `RenderTrace` and logged as one summary
+record per request; a sampled fraction of requests also logs every slide.
+
+This is a copy of deck-template/structured_logging.py. The two backends are
+built and deployed separately: each Docker image is built from its own
+directory (`COPY . .`), so neither can import a module that lives outside
+it. Change both copies together.
+
+Environment:
+    LOG_LEVEL: Root log level (default INFO)
+    LOG_FORMAT: 'text' (default) or 'json'
+    TEMPLATE_LOG_SAMPLE_RATE: Fraction of requests that log per-slide detail (default 0)
+"""
+
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+DEFAULT_SAMPLE_RATE = float(os.getenv('TEMPLATE_LOG_SAMPLE_RATE', '0'))
+
+
+class JsonFormatter(logging.Formatter):
+    """Render records as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': record.getMessage(),
+        }
+        payload.update(getattr(record, 'fields', {}))
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class KeyValueFormatter(logging.Formatter):
+    """Render records as `LEVEL:logger:event key=value ...`."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = f"{record.levelname}:{record.name}:{record.getMessage()}"
+        fields = getattr(record, 'fields', None)
+        if fields:
+            message += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        if record.exc_info:
+            message += '\n' + self.formatException(record.exc_info)
+        return message
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None):
+    """
+    Configure the root logger once for a service entrypoint.
+
+    Library modules only create loggers; the process that owns stdout decides
+    levels and format.
+    """
+    root = logging.getLogger()
+    if getattr(root, '_structured_logging_configured', False):
+        return
+
+    handler = logging.StreamHandler()
+    log_format = (fmt or os.getenv('LOG_FORMAT', 'text')).lower()
+    handler.setFormatter(JsonFormatter() if log_format == 'json' else KeyValueFormatter())
+    root.addHandler(handler)
+    root.setLevel((level or os.getenv('LOG_LEVEL', 'INFO')).upper())
+    root._structured_logging_configured = True
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields: Any):
+    """
+    Log `event` with structured `fields` if `level` is enabled.
+
+    Field values are stored as-is and only rendered by the formatter.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={'fields': fields})
+
+
+class RenderTrace:
+    """
+    Per-request collector for slide-level events.
+
+    Counts are always kept; individual slide events are logged only when the
+    request was sampled or the logger is at DEBUG.
+    """
+
+    def __init__(self, logger: logging.Logger, request_id: Optional[str] = None,
+                 sample_rate: Optional[float] = None):
+        self.logger = logger
+        self.request_id = request_id or uuid.uuid4().hex[:12]
+        rate = DEFAULT_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.sampled = rate > 0 and random.random() < rate
+        self.detail_level = logging.INFO if self.sampled else logging.DEBUG
+        self.started = time.perf_counter()
+        self.slides = 0
+        self.layouts: Counter = Counter()
+        self.fills: Counter = Counter()
+
+    def slide(self, index: int, layout_index: int, slide_type: str, fill: Dict[str, Optional[str]]):
+        """
+        Record one rendered slide.
+
+        Args:
+            index: Position of the slide in the deck
+            layout_index: Template layout used
+            slide_type: Slide type from the request
+            fill: Which pass filled each field, e.g. {'title': 'placeholder', 'content': None}
+        """
+        self.slides += 1
+        self.layouts[layout_index] += 1
+        for field, filled_by in fill.items():
+            self.fills[f"{field}_{filled_by or 'unfilled'}"] += 1
+
+        log_event(self.logger, self.detail_level, 'slide_rendered',
+                  request_id=self.request_id, slide=index + 1, layout=layout_index,
+                  type=slide_type, **fill)
+
+    def detail(self, event: str, **fields: Any):
+        """Log a sampled detail event for this request."""
+        log_event(self.logger, self.detail_level, event, request_id=self.request_id, **fields)
+
+    def emit(self, event: str = 'presentation_rendered', level: int = logging.INFO, **fields: Any):
+        """Log the single summary record for this request."""
+        log_event(self.logger, level, event,
+                  request_id=self.request_id,
+                  slides=self.slides,
+                  duration_ms=round((time.perf_counter() - self.started) * 1000, 1),
+                  layouts=dict(self.layouts),
+                  fills=dict(self.fills),
+                  sampled=self.sampled,
+                  **fields)
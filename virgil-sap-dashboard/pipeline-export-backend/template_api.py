@@ -15,9 +15,11 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 from dotenv import load_dotenv
 from template_handler import TemplateHandler, process_template_request
+from structured_logging import configure_logging
 
 # Load environment variables
 load_dotenv()
+configure_logging()
 
 app = FastAPI(title="PowerPoint Template API", version="1.0.0")
 
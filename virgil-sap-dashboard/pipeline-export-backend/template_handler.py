@@ -17,8 +17,8 @@ from pptx.enum.shapes import MSO_SHAPE_TYPE
 from pptx.dml.color import RGBColor
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from structured_logging import RenderTrace, configure_logging, log_event
+
 logger = logging.getLogger(__name__)
 
 class TemplateHandler:
@@ -47,7 +47,7 @@ class TemplateHandler:
             bool: True if successful, False otherwise
         """
         try:
-            logger.info(f"Loading template: {self.template_path}")
+            log_event(logger, logging.DEBUG, 'template_loading', path=self.template_path)
             self.presentation = Presentation(self.template_path)
             
             # Extract basic template information
@@ -61,11 +61,11 @@ class TemplateHandler:
             # Analyze available slide layouts
             self._analyze_slide_layouts()
             
-            logger.info(f"Template loaded successfully: {self.template_info}")
+            log_event(logger, logging.INFO, 'template_loaded', path=self.template_path, **self.template_info)
             return True
             
         except Exception as e:
-            logger.error(f"Failed to load template: {e}")
+            log_event(logger, logging.ERROR, 'template_load_failed', path=self.template_path, error=str(e))
             return False
     
     def _analyze_slide_layouts(self):
@@ -83,16 +83,12 @@ class TemplateHandler:
                     'shapes': len(layout.shapes)
                 }
                 self.slide_layouts.append(layout_info)
-                logger.info(f"Layout {i}: {layout.name or f'Layout {i}'} - Type: {layout_type} - Placeholders: {len(layout.placeholders)}")
-                
-                # Debug: Log layout types distribution
-                if i < 10:  # Only log first 10 layouts to avoid spam
-                    logger.info(f"DEBUG: Layout {i} type '{layout_type}' for '{layout.name}'")
                 
-            logger.info(f"Found {len(self.slide_layouts)} slide layouts")
+            log_event(logger, logging.DEBUG, 'layouts_analyzed', layouts=len(self.slide_layouts),
+                      types=[layout_info['type'] for layout_info in self.slide_layouts])
             
         except Exception as e:
-            logger.error(f"Failed to analyze slide layouts: {e}")
+            log_event(logger, logging.ERROR, 'layout_analysis_failed', error=str(e))
     
     def _get_layout_type(self, layout) -> str:
         """Determine the type of slide layout."""
@@ -133,7 +129,7 @@ class TemplateHandler:
         except Exception as e:
             # Only log the error if it's not the expected attribute error
             if "placeholder_type" not in str(e):
-                logger.error(f"Failed to determine layout type: {e}")
+                log_event(logger, logging.ERROR, 'layout_type_failed', error=str(e))
             # Don't log the placeholder_type error as it's expected for some layouts
             
             # Fallback based on layout name
@@ -161,11 +157,11 @@ class TemplateHandler:
         """
         try:
             if not self.presentation:
-                logger.error("Template not loaded")
+                log_event(logger, logging.ERROR, 'template_not_loaded')
                 return None
             
             if layout_index >= len(self.presentation.slide_layouts):
-                logger.error(f"Layout index {layout_index} out of range")
+                log_event(logger, logging.ERROR, 'layout_out_of_range', layout=layout_index)
                 return None
             
             # Create new slide using the specified layout
@@ -175,33 +171,32 @@ class TemplateHandler:
             # Fill in content based on placeholders
             self._fill_slide_content(slide, content)
             
-            logger.info(f"Created slide using layout {layout_index}")
+            log_event(logger, logging.DEBUG, 'slide_created', layout=layout_index)
             return slide
             
         except Exception as e:
-            logger.error(f"Failed to create slide: {e}")
+            log_event(logger, logging.ERROR, 'slide_create_failed', layout=layout_index, error=str(e))
             return None
     
-    def _fill_slide_content(self, slide: Slide, content: Dict[str, Any]):
+    def _fill_slide_content(self, slide: Slide, content: Dict[str, Any]) -> Dict[str, Optional[str]]:
         """
         Fill slide content based on available placeholders.
         
         Args:
             slide: The slide to fill
             content: Dictionary containing content to fill
+            
+        Returns:
+            Dict naming the pass that filled the title and the content
+            ('placeholder', 'empty_frame', 'final_fallback' or None)
         """
+        fill = {'title': None, 'content': None}
         try:
             # Get content fields
             title = content.get('title', '')
             body_text = content.get('content', '')
             subtitle = content.get('subtitle', '')
             
-            logger.info(f"Filling slide content - Title: '{title[:50]}...', Body: '{body_text[:50]}...'")
-            
-            # Track what we've filled
-            title_filled = False
-            content_filled = False
-            
             # Fill placeholders with specific types first
             for shape in slide.shapes:
                 if hasattr(shape, 'placeholder_format'):
@@ -210,53 +205,45 @@ class TemplateHandler:
                     if placeholder_type == 1:  # Title
                         if hasattr(shape, 'text_frame'):
                             shape.text_frame.text = title
-                            title_filled = True
-                            logger.info(f"Filled title placeholder with: '{title[:30]}...'")
+                            fill['title'] = 'placeholder'
                     elif placeholder_type == 2:  # Content
                         if hasattr(shape, 'text_frame'):
                             shape.text_frame.text = body_text
-                            content_filled = True
-                            logger.info(f"Filled content placeholder with: '{body_text[:30]}...'")
+                            fill['content'] = 'placeholder'
                     elif placeholder_type == 3:  # Section Header
                         if hasattr(shape, 'text_frame'):
                             shape.text_frame.text = subtitle or title
-                            title_filled = True
-                            logger.info(f"Filled section header placeholder with: '{(subtitle or title)[:30]}...'")
+                            fill['title'] = 'placeholder'
             
             # If we haven't filled title or content, try to fill any text shape
-            if not title_filled or not content_filled:
+            if not fill['title'] or not fill['content']:
                 for shape in slide.shapes:
                     if hasattr(shape, 'text_frame'):
                         current_text = shape.text_frame.text.strip()
                         
                         # Fill empty text frames or frames with placeholder text
                         if not current_text or current_text.lower() in ['click to edit master title style', 'click to edit master subtitle style', 'click to add text']:
-                            if not title_filled:
+                            if not fill['title']:
                                 shape.text_frame.text = title
-                                title_filled = True
-                                logger.info(f"Filled empty text frame with title: '{title[:30]}...'")
-                            elif not content_filled and body_text:
+                                fill['title'] = 'empty_frame'
+                            elif not fill['content'] and body_text:
                                 shape.text_frame.text = body_text
-                                content_filled = True
-                                logger.info(f"Filled empty text frame with content: '{body_text[:30]}...'")
+                                fill['content'] = 'empty_frame'
             
             # Final fallback: fill any remaining text frames
-            if not title_filled or not content_filled:
+            if not fill['title'] or not fill['content']:
                 for shape in slide.shapes:
                     if hasattr(shape, 'text_frame') and shape.text_frame.text.strip() == '':
-                        if not title_filled:
+                        if not fill['title']:
                             shape.text_frame.text = title
-                            title_filled = True
-                            logger.info(f"FINAL FALLBACK: Filled with title: '{title[:30]}...'")
-                        elif not content_filled and body_text:
+                            fill['title'] = 'final_fallback'
+                        elif not fill['content'] and body_text:
                             shape.text_frame.text = body_text
-                            content_filled = True
-                            logger.info(f"FINAL FALLBACK: Filled with content: '{body_text[:30]}...'")
-            
-            logger.info(f"Content filling complete - Title filled: {title_filled}, Content filled: {content_filled}")
+                            fill['content'] = 'final_fallback'
                                 
         except Exception as e:
-            logger.error(f"Failed to fill slide content: {e}")
+            log_event(logger, logging.ERROR, 'slide_fill_failed', error=str(e))
+        return fill
     
     def get_template_info(self) -> Dict[str, Any]:
         """
@@ -288,15 +275,15 @@ class TemplateHandler:
         """
         try:
             if not self.presentation:
-                logger.error("No presentation to save")
+                log_event(logger, logging.ERROR, 'presentation_missing')
                 return False
             
             self.presentation.save(output_path)
-            logger.info(f"Presentation saved to: {output_path}")
+            log_event(logger, logging.DEBUG, 'presentation_saved', path=output_path)
             return True
             
         except Exception as e:
-            logger.error(f"Failed to save presentation: {e}")
+            log_event(logger, logging.ERROR, 'presentation_save_failed', path=output_path, error=str(e))
             return False
     
     def create_presentation_from_slides(self, slides_data: List[Dict[str, Any]], 
@@ -313,7 +300,7 @@ class TemplateHandler:
         """
         try:
             if not self.presentation:
-                logger.error("Template not loaded")
+                log_event(logger, logging.ERROR, 'template_not_loaded')
                 return False
             
             # Clear existing slides (keep the template structure)
@@ -326,34 +313,30 @@ class TemplateHandler:
                 new_presentation.part.drop_rel(rId)
                 new_presentation.slides._sldIdLst.remove(new_presentation.slides._sldIdLst[0])
             
+            # Per-slide events are collected here and logged once for the whole deck
+            trace = RenderTrace(logger)
+            
             # Create slides based on data
             for i, slide_data in enumerate(slides_data):
                 slide_type = slide_data.get('type', 'content')
                 # Determine appropriate layout based on slide type and position
                 layout_index = self._get_appropriate_layout(slide_type, i)
                 
-                # Log layout selection for debugging
-                layout_name = new_presentation.slide_layouts[layout_index].name if layout_index < len(new_presentation.slide_layouts) else "Unknown"
-                logger.info(f"Slide {i+1} ({slide_type}) using layout {layout_index} ({layout_name})")
-                
-                # Debug: Log what layouts were available for this slide type
-                available_layouts = [l for l in self.slide_layouts if l['type'] in ['content', 'two_content', 'section_header', 'title']]
-                logger.info(f"DEBUG: Available layouts for slide type '{slide_type}': {[l['index'] for l in available_layouts[:5]]}...")
-                
                 # Create slide
                 slide_layout = new_presentation.slide_layouts[layout_index]
                 slide = new_presentation.slides.add_slide(slide_layout)
                 
                 # Fill content
-                self._fill_slide_content(slide, slide_data)
+                fill = self._fill_slide_content(slide, slide_data)
+                trace.slide(i, layout_index, slide_type, fill)
             
             # Save the presentation
             new_presentation.save(output_path)
-            logger.info(f"Created presentation with {len(slides_data)} slides")
+            trace.emit(template=self.template_path)
             return True
             
         except Exception as e:
-            logger.error(f"Failed to create presentation: {e}")
+            log_event(logger, logging.ERROR, 'presentation_create_failed', error=str(e))
             return False
     
     def _get_appropriate_layout(self, slide_type: str, slide_index: int = 0) -> int:
@@ -397,12 +380,13 @@ class TemplateHandler:
             if has_content_placeholder:
                 content_layouts.append(i)
         
-        logger.info(f"Found {len(content_layouts)} layouts with content placeholders: {content_layouts}")
+        log_event(logger, logging.DEBUG, 'content_layouts_found', layouts=content_layouts)
         
         # For title slides, use layout 0 (usually the title layout)
         if slide_type == 'title':
             selected_layout = 0
-            logger.info(f"TITLE SLIDE: Using layout 0 ({self.slide_layouts[0]['name']}) for slide 1")
+            log_event(logger, logging.DEBUG, 'layout_selected', rule='title', slide=slide_index + 1,
+                      layout=selected_layout, type=slide_type)
             return selected_layout
         
         # For non-title slides, prioritize layouts with content placeholders
@@ -410,7 +394,8 @@ class TemplateHandler:
             # Use progressive selection from content layouts
             layout_index = slide_index % len(content_layouts)
             selected_layout = content_layouts[layout_index]
-            logger.info(f"CONTENT LAYOUT: Slide {slide_index + 1} using layout {selected_layout} ({self.slide_layouts[selected_layout]['name']}) for type '{slide_type}'")
+            log_event(logger, logging.DEBUG, 'layout_selected', rule='content',
+                      slide=slide_index + 1, layout=selected_layout, type=slide_type)
             return selected_layout
         
         # Fallback: use progressive distribution from all layouts
@@ -419,11 +404,13 @@ class TemplateHandler:
             # Use slide_index + 1 to start from layout 1 (skip title layout)
             layout_index = (slide_index + 1) % len(all_layouts)
             selected_layout = all_layouts[layout_index]
-            logger.info(f"PROGRESSIVE FALLBACK: Slide {slide_index + 1} using layout {selected_layout} ({self.slide_layouts[selected_layout]['name']}) for type '{slide_type}'")
+            log_event(logger, logging.DEBUG, 'layout_selected', rule='progressive_fallback',
+                      slide=slide_index + 1, layout=selected_layout, type=slide_type)
             return selected_layout
         
         # Final fallback to first available layout
-        logger.info(f"FINAL FALLBACK: Using layout 0 for slide type '{slide_type}'")
+        log_event(logger, logging.DEBUG, 'layout_selected', rule='final_fallback',
+                  slide=slide_index + 1, type=slide_type)
         return 0 if self.slide_layouts else 0
 
 
@@ -473,7 +460,7 @@ def process_template_request(template_path: str, slides_data: List[Dict[str, Any
             }
             
     except Exception as e:
-        logger.error(f"Template processing failed: {e}")
+        log_event(logger, logging.ERROR, 'template_processing_failed', error=str(e))
         return {
             'success': False,
             'error': str(e)
@@ -481,6 +468,8 @@ def process_template_request(template_path: str, slides_data: List[Dict[str, Any
 
 
 if __name__ == "__main__":
+    configure_logging()
+    
     # Example usage
     template_path = "example_template.pptx"
     slides_data = [